@@ -0,0 +1,727 @@
+# api_routes.py
+"""
+Маршруты API, общие для Flask (yfinance_server) и ASGI (yfinance_asgi) режимов:
+разбор запроса, загрузка данных и сборка ответа. Маршрут - функция (req, data),
+где req - werkzeug Request, data - JSON-тело запроса; она возвращает Response
+(бинарные форматы, NDJSON-поток) или (payload, status[, headers]), как view Flask.
+"""
+import os
+import logging
+from flask import Flask, Response
+import pandas as pd
+import yfinance as yf
+from yfinance.data import YfData
+
+import upstream
+import http_session
+import price_store
+import binary_formats
+import options_engine
+import indicators
+import history_views
+import prewarm
+import http_cache
+import json_provider
+from governor import UpstreamBusy
+from serializers import serialize_history, serialize_table, iter_history, format_dates, HISTORY_FORMATS, FRAME_FORMATS, TABLE_FORMATS
+from yfinance_handler import YFinanceHandler, SECTION_METHODS, SECTION_TTLS
+
+logger = logging.getLogger(__name__)
+
+# JSON-провайдер ответов обоих режимов (Flask-приложение использует его же как app.json);
+# своё приложение нужно провайдеру только ради класса ответа (хранит на него слабую ссылку)
+_json_app = Flask(__name__)
+json = json_provider.provider_class()(_json_app)
+
+# Максимальное число тикеров в одном batch-запросе
+MAX_BATCH_SYMBOLS = int(os.environ.get('YF_MAX_BATCH_SYMBOLS', 100))
+
+# Размер куска баров в потоковом (NDJSON) ответе
+STREAM_CHUNK_ROWS = int(os.environ.get('YF_STREAM_CHUNK_ROWS', 1000))
+
+# Batch-котировки Yahoo: один запрос на список тикеров (нужны cookie и crumb)
+QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+
+# Поля info, которыми /api/stocks дополняет тикеры без котировки
+INFO_QUOTE_FIELDS = ('longName', 'shortName', 'currency', 'marketCap', 'exchange')
+
+handler = YFinanceHandler()
+
+# Cache-Control max-age маршрутов API - TTL кэша, из которого отдаются их данные, секунды
+ROUTE_MAX_AGE = {
+    '/api/stock': upstream.RESOURCE_TTLS['info'],
+    '/api/stocks': upstream.RESOURCE_TTLS['quotes'],
+    '/api/history': history_views.BASE_TTL,
+    '/api/history/batch': upstream.RESOURCE_TTLS['download'],
+    '/api/indicators': history_views.BASE_TTL,
+    '/api/profile': min(SECTION_TTLS.values()),
+    '/api/options': options_engine.CHAIN_TTL,
+    '/api/financials': upstream.RESOURCE_TTLS['financials']
+}
+
+def parse_body(body):
+    """JSON-тело запроса (пустое - {}) и текст ошибки, если это не JSON-объект"""
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError as e:
+        return None, f"Invalid JSON body: {str(e)}"
+    if not isinstance(data, dict):
+        return None, "Invalid JSON body: JSON object expected"
+    return data, None
+
+def get_stock(req, data):
+    """Get stock information"""
+    symbol = data.get('symbol')
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    
+    try:
+        logger.info(f"Fetching data for symbol: {symbol}")
+        return build_stock_payload(symbol), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching stock data: {str(e)}")
+        return {"error": str(e), "symbol": symbol}, 500
+
+def get_history(req, data):
+    """Get historical data"""
+    symbol = data.get('symbol')
+    period = data.get('period', '1mo')
+    fmt = data.get('format', 'records')
+    
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    if fmt not in HISTORY_FORMATS:
+        return {"error": f"Unknown format: {fmt}"}, 400
+    view, error = parse_history_view(data)
+    if error:
+        return {"error": error}, 400
+    binary, error = binary_format(req)
+    if error:
+        return {"error": error}, 406
+    
+    try:
+        logger.info(f"Fetching history for {symbol}, period: {period}, view: {view}")
+        hist = fetch_history(symbol, period, **view)
+        if binary:
+            return history_binary_response(symbol, period, hist, view, binary)
+        if wants_stream(req, data):
+            return ndjson_response(iter_history(hist, fmt, chunk_rows=STREAM_CHUNK_ROWS))
+        return build_history_payload(symbol, period, fmt, hist, view), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching history: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_stocks(req, data):
+    """Get stock information for a list of symbols"""
+    symbols, error = parse_symbols(data)
+    if error:
+        return {"error": error}, 400
+    
+    try:
+        logger.info(f"Fetching batch data for {len(symbols)} symbols")
+        records = fetch_stock_records(symbols)
+        if wants_stream(req, data):
+            return ndjson_response([record] for record in records)
+        return batch_payload(records, symbols=symbols), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching batch stock data: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_history_batch(req, data):
+    """Get historical data for a list of symbols"""
+    period = data.get('period', '1mo')
+    fmt = data.get('format', 'records')
+    symbols, error = parse_symbols(data)
+    if error:
+        return {"error": error}, 400
+    if fmt not in HISTORY_FORMATS:
+        return {"error": f"Unknown format: {fmt}"}, 400
+    
+    try:
+        logger.info(f"Fetching batch history for {len(symbols)} symbols, period: {period}")
+        records = fetch_history_records(symbols, period, fmt)
+        if wants_stream(req, data):
+            return ndjson_response([record] for record in records)
+        return batch_payload(records, symbols=symbols, period=period, format=fmt), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching batch history: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_profile(req, data):
+    """Get full ticker profile (all sections of YFinanceHandler)"""
+    symbol = data.get('symbol')
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    options, error = parse_profile_request(data)
+    if error:
+        return {"error": error}, 400
+    
+    try:
+        logger.info(f"Fetching profile for {symbol}, period: {options['period']}, "
+                    f"sections: {options['sections'] or options['fields'] or 'all'}")
+        if wants_stream(req, data):
+            return ndjson_response([record] for record in handler.iter_ticker_info(symbol, **options))
+        result = handler.get_ticker_info(symbol, **options)
+        if not result.get("success"):
+            return result, 500
+        return profile_response(result)
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching profile: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_options(req, data):
+    """Get option chains for all (or selected) expirations with server-side filtering"""
+    symbol = data.get('symbol')
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    options, error = parse_options_request(data)
+    if error:
+        return {"error": error}, 400
+    
+    try:
+        logger.info(f"Fetching options for {symbol}: {options}")
+        return build_options_payload(symbol, **options), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except Exception as e:
+        logger.error(f"Error fetching options: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_indicators(req, data):
+    """Get technical indicators computed over cached daily history"""
+    symbol = data.get('symbol')
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    options, error = parse_indicators_request(data)
+    if error:
+        return {"error": error}, 400
+    
+    try:
+        logger.info(f"Computing indicators for {symbol}: {[i.key for i in options['selected']]}")
+        return build_indicators_payload(symbol, **options), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error computing indicators: {str(e)}")
+        return {"error": str(e)}, 500
+
+def get_financials(req, data):
+    """Get financial statements"""
+    symbol = data.get('symbol')
+    if not symbol:
+        return {"error": "Symbol is required"}, 400
+    binary, error = binary_format(req)
+    if error:
+        return {"error": error}, 406
+    
+    try:
+        logger.info(f"Fetching financials for {symbol}")
+        if binary:
+            return financials_binary_response(symbol, binary)
+        return build_financials_payload(symbol), 200
+    except UpstreamBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error fetching financials: {str(e)}")
+        return {"error": str(e)}, 500
+
+# POST-маршруты API: путь -> функция (req, data)
+ROUTES = {
+    '/api/stock': get_stock,
+    '/api/stocks': get_stocks,
+    '/api/history': get_history,
+    '/api/history/batch': get_history_batch,
+    '/api/profile': get_profile,
+    '/api/financials': get_financials,
+    '/api/options': get_options,
+    '/api/indicators': get_indicators
+}
+
+def build_stock_payload(symbol):
+    """Ответ /api/stock"""
+    # Получаем данные через yfinance (одновременные запросы одного тикера объединяются)
+    ticker = upstream.ticker(symbol)
+    info = upstream.cached_call(symbol, 'info', (), lambda: ticker.info)
+    
+    # Базовая информация
+    return {
+        "success": True,
+        "symbol": symbol,
+        "data": {
+            "price": info.get('currentPrice', info.get('regularMarketPrice')),
+            "previousClose": info.get('previousClose'),
+            "marketCap": info.get('marketCap'),
+            "name": info.get('longName', info.get('shortName')),
+            "currency": info.get('currency'),
+            "exchange": info.get('exchange')
+        }
+    }
+
+def fetch_history(symbol, period='1mo', start=None, end=None, resample=None):
+    """
+    Исторические данные: срез и агрегация дневного базового ряда тикера,
+    поэтому любые period/start/end/resample стоят одной загрузки из upstream
+    """
+    base = history_views.base_period(period, start, end)
+    hist = history_views.base_series(symbol, lambda: _fetch_base_history(symbol, base), base)
+    return history_views.select(hist, period, start, end, resample)
+
+def _fetch_base_history(symbol, period=history_views.BASE_PERIOD):
+    """Базовый дневной ряд через локальное хранилище цен (регулятор - только для его загрузок из Yahoo)"""
+    ticker = upstream.GovernedTicker(upstream.ticker(symbol))
+    return price_store.history(ticker, period)
+
+def parse_history_view(data):
+    """start/end/interval/resample для /api/history из тела запроса и текст ошибки"""
+    period = data.get('period', '1mo')
+    if period not in history_views.PERIODS:
+        return None, f"Unknown period: {period}"
+    interval = data.get('interval', '1d')
+    if interval not in history_views.INTERVALS:
+        return None, f"Unsupported interval: {interval} (available: {', '.join(history_views.INTERVALS)})"
+    resample = data.get('resample') or None
+    if resample is not None and resample not in history_views.RESAMPLE_RULES:
+        return None, f"Unknown resample rule: {resample} (available: {', '.join(history_views.RESAMPLE_RULES)})"
+    if resample is not None and history_views.INTERVALS[interval] not in (None, resample):
+        return None, "Use either interval or resample"
+    try:
+        start = history_views.parse_date(data.get('start'))
+        end = history_views.parse_date(data.get('end'))
+    except ValueError as e:
+        return None, str(e)
+    if start is not None and end is not None and end <= start:
+        return None, "End must be after start"
+    return {"start": start, "end": end, "resample": resample or history_views.INTERVALS[interval]}, None
+
+def build_history_payload(symbol, period, fmt='records', hist=None, view=None):
+    """Ответ /api/history"""
+    view = view or {}
+    if hist is None:
+        hist = fetch_history(symbol, period, **view)
+    payload = {
+        "success": True,
+        "symbol": symbol,
+        "period": period,
+        "format": fmt
+    }
+    payload.update(_view_fields(view))
+    payload["data"] = serialize_history(hist, fmt)
+    return payload
+
+def _view_fields(view):
+    """Заданные параметры представления для ответа (даты - YYYY-MM-DD)"""
+    fields = {}
+    for name in ('start', 'end'):
+        if view.get(name) is not None:
+            fields[name] = view[name].strftime('%Y-%m-%d')
+    if view.get('resample'):
+        fields["resample"] = view['resample']
+    return fields
+
+def fetch_financials(symbol):
+    """Финансовые отчеты тикера: {"income_statement", "balance_sheet", "cash_flow"} -> DataFrame"""
+    ticker = upstream.ticker(symbol)
+    return {
+        "income_statement": upstream.cached_call(symbol, 'financials', (), lambda: ticker.financials),
+        "balance_sheet": upstream.cached_call(symbol, 'balance_sheet', (), lambda: ticker.balance_sheet),
+        "cash_flow": upstream.cached_call(symbol, 'cashflow', (), lambda: ticker.cashflow)
+    }
+
+def parse_options_request(data):
+    """Параметры /api/options из тела запроса и текст ошибки"""
+    fmt = data.get('format', 'records')
+    if fmt not in TABLE_FORMATS:
+        return None, f"Unknown format: {fmt}"
+    contract_type = data.get('type') or None
+    if contract_type == 'both':
+        contract_type = None
+    if contract_type is not None and contract_type not in options_engine.CONTRACT_TYPES:
+        return None, f"Unknown contract type: {contract_type}"
+    
+    options = {
+        "fmt": fmt,
+        "contract_type": contract_type,
+        "expirations": _parse_list(data.get('expirations')),
+        "expiry_from": data.get('expiry_from'),
+        "expiry_to": data.get('expiry_to')
+    }
+    numbers = ('strike_min', 'strike_max', 'moneyness_min', 'moneyness_max', 'min_open_interest', 'max_expirations')
+    for name in numbers:
+        value = data.get(name)
+        if value is None or value == '':
+            options[name] = None
+            continue
+        try:
+            options[name] = float(value)
+        except (TypeError, ValueError):
+            return None, f"Invalid number for {name}: {value}"
+    if options["max_expirations"] is not None:
+        options["max_expirations"] = int(options["max_expirations"])
+    return options, None
+
+def parse_indicators_request(data):
+    """Параметры /api/indicators из тела запроса и текст ошибки"""
+    fmt = data.get('format', 'records')
+    if fmt not in TABLE_FORMATS:
+        return None, f"Unknown format: {fmt}"
+    # Параметры индикатора разделяются запятой, поэтому строкой - через пробел или ';'
+    specs = data.get('indicators') or []
+    if isinstance(specs, str):
+        specs = specs.replace(';', ' ').split()
+    if not specs:
+        return None, f"Indicators are required (available: {', '.join(indicators.INDICATORS)})"
+    try:
+        parsed = {}
+        for spec in specs:
+            indicator = indicators.parse(spec)
+            parsed.setdefault(indicator.key, indicator)
+    except ValueError as e:
+        return None, str(e)
+    try:
+        window = int(data.get('window', indicators.DEFAULT_WINDOW))
+    except (TypeError, ValueError):
+        return None, f"Invalid window: {data.get('window')}"
+    if window < 0:
+        return None, f"Invalid window: {window}"
+    return {"selected": list(parsed.values()), "window": window, "fmt": fmt}, None
+
+def build_indicators_payload(symbol, selected=(), window=indicators.DEFAULT_WINDOW, fmt='records'):
+    """Ответ /api/indicators"""
+    hist = fetch_history(symbol, 'max')
+    values = indicators.calculate_all(symbol, selected, hist, window).round(4)
+    values.insert(0, 'date', format_dates(values.index))
+    return {
+        "success": True,
+        "symbol": symbol,
+        "indicators": [indicator.key for indicator in selected],
+        "window": len(values),
+        "format": fmt,
+        "data": serialize_table(values.reset_index(drop=True), fmt)
+    }
+
+def build_options_payload(symbol, fmt='records', contract_type=None, expirations=None, expiry_from=None,
+                          expiry_to=None, max_expirations=None, **filters):
+    """Ответ /api/options"""
+    ticker = upstream.ticker(symbol)
+    available = options_engine.expirations(ticker)
+    dates = options_engine.select_expirations(available, expirations, expiry_from, expiry_to, max_expirations)
+    chains, errors = options_engine.fetch_chains(ticker, dates)
+    
+    # Цена базового актива - из ответа цепочки, иначе из info
+    spot = next((chain.attrs.get("underlying_price") for chain in chains.values()
+                 if chain.attrs.get("underlying_price")), None)
+    if spot is None and chains:
+        info = upstream.cached_call(symbol, 'info', (), lambda: ticker.info)
+        spot = info.get('currentPrice', info.get('regularMarketPrice'))
+    
+    kinds = [contract_type] if contract_type else list(options_engine.CONTRACT_TYPES)
+    result = {
+        "success": True,
+        "symbol": symbol,
+        "underlying_price": spot,
+        "expirations": list(available),
+        "selected": dates,
+        "format": fmt,
+        "data": {},
+        "errors": errors,
+        "contracts": {"total": 0, "returned": 0}
+    }
+    for date in dates:
+        if date not in chains:
+            continue
+        chain = chains[date]
+        filtered = options_engine.filter_chain(chain, spot, contract_type, **filters)
+        result["contracts"]["total"] += len(chain)
+        result["contracts"]["returned"] += len(filtered)
+        result["data"][date] = {
+            kind: serialize_table(filtered[filtered['type'] == kind].drop(columns='type'), fmt)
+            for kind in kinds
+        }
+    return result
+
+def build_financials_payload(symbol):
+    """Ответ /api/financials"""
+    # Последний отчетный период каждого отчета; NaN и типы NumPy кодирует JSON-провайдер
+    return {
+        "success": True,
+        "symbol": symbol,
+        "data": {
+            name: statement.iloc[:, 0].to_dict() if statement is not None and not statement.empty else {}
+            for name, statement in fetch_financials(symbol).items()
+        }
+    }
+
+def parse_profile_request(data):
+    """Параметры /api/profile из тела запроса и текст ошибки"""
+    frame_format = data.get('frame_format', 'nested')
+    if frame_format not in FRAME_FORMATS:
+        return None, f"Unknown frame format: {frame_format}"
+    sections = _parse_list(data.get('sections'))
+    fields = _parse_list(data.get('fields'))
+    unknown = [name for name in sections + [f.split('.', 1)[0] for f in fields] if name not in SECTION_METHODS]
+    if unknown:
+        return None, f"Unknown sections: {', '.join(dict.fromkeys(unknown))}"
+    return {"period": data.get('period', '1y'), "frame_format": frame_format,
+            "sections": sections, "fields": fields}, None
+
+def profile_response(result):
+    """Ответ /api/profile: JSON с ETag по данным секций"""
+    response = json.response(result)
+    # ETag - по данным секций: timestamp, timings_ms и upstream меняются при каждом запросе
+    response.set_etag(http_cache.etag(json.dumps(result["data"]).encode('utf-8')))
+    return response
+
+def fetch_stock_records(symbols):
+    """Записи /api/stocks: цены - одним bulk-запросом, метаданные - одним batch-запросом котировок"""
+    prices = _download(symbols, period='5d')
+    quotes = _fill_from_info(symbols, _fetch_quotes(symbols))
+    return (_stock_record(symbol, prices, quotes, len(symbols)) for symbol in symbols)
+
+def fetch_history_records(symbols, period, fmt):
+    """Записи /api/history/batch: цены загружаются сразу, сериализация - по записи"""
+    prices = _download(symbols, period=period)
+    return (_history_record(symbol, prices, len(symbols), fmt) for symbol in symbols)
+
+def batch_payload(records, **fields):
+    """Ответ batch-маршрута из записей {"symbol", "data"} / {"symbol", "error"}"""
+    result = {"success": True, **fields, "data": {}, "errors": {}}
+    for record in records:
+        if "error" in record:
+            result["errors"][record["symbol"]] = record["error"]
+        else:
+            result["data"][record["symbol"]] = record["data"]
+    return result
+
+def route_max_age(route, data):
+    """Cache-Control max-age ответа маршрута; для /api/profile - по запрошенным секциям"""
+    if route == '/api/profile' and isinstance(data, dict):
+        options, error = parse_profile_request(data)
+        if not error:
+            names = options["sections"] or [f.split('.', 1)[0] for f in options["fields"]] or SECTION_METHODS
+            return min(SECTION_TTLS.get(name, handler.cache_duration) for name in names)
+    return ROUTE_MAX_AGE.get(route)
+
+def wants_stream(req, data):
+    """Запрошен ли потоковый NDJSON-ответ (stream=true или Accept: application/x-ndjson)"""
+    stream = data.get('stream', req.args.get('stream'))
+    if stream in (True, 1) or str(stream).lower() in ('true', '1'):
+        return True
+    return 'application/x-ndjson' in req.headers.get('Accept', '')
+
+def ndjson_lines(chunks):
+    """Строки NDJSON-ответа: chunks - итератор списков записей, по строке на запись"""
+    try:
+        for records in chunks:
+            yield ''.join(json.dumps(record) + '\n' for record in records)
+    except Exception as e:
+        logger.error(f"Error while streaming response: {str(e)}")
+        yield json.dumps({"error": str(e)}) + '\n'
+
+def ndjson_response(chunks):
+    """Потоковый NDJSON-ответ (генератор дочитывается при отправке и не обращается к запросу)"""
+    return Response(ndjson_lines(chunks), mimetype='application/x-ndjson')
+
+def busy_response(error):
+    """503 с Retry-After, когда регулятор upstream не пропустил запрос"""
+    logger.warning(f"Rejecting request: {str(error)}")
+    return {"error": str(error), "retry_after": error.retry_after}, 503, {'Retry-After': str(error.retry_after)}
+
+def binary_format(req):
+    """Бинарный формат из Accept (None - JSON) и текст ошибки, если он недоступен"""
+    binary = binary_formats.negotiate(req.accept_mimetypes)
+    if binary and not binary_formats.available(binary):
+        return None, f"Format '{binary_formats.MEDIA_TYPES[binary]}' is not available on this server"
+    return binary, None
+
+def history_binary_response(symbol, period, hist, view, binary):
+    """Бинарный ответ /api/history"""
+    return _binary_response(
+        binary_formats.history_frame(hist), binary,
+        f"{symbol}_{period}_history", {"symbol": symbol, "period": period, **_view_fields(view)}
+    )
+
+def financials_binary_response(symbol, binary):
+    """Бинарный ответ /api/financials"""
+    return _binary_response(
+        binary_formats.statements_frame(fetch_financials(symbol)), binary,
+        f"{symbol}_financials", {"symbol": symbol}
+    )
+
+def _binary_response(frame, binary, filename, metadata):
+    """Ответ в бинарном формате прямо из DataFrame (без промежуточного списка словарей)"""
+    response = Response(
+        binary_formats.encode(frame, binary, metadata),
+        mimetype=binary_formats.MEDIA_TYPES[binary]
+    )
+    if binary in binary_formats.DOWNLOAD_FORMATS:
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename="{filename}.{binary_formats.DOWNLOAD_FORMATS[binary]}"'
+        )
+    response.vary.add('Accept')
+    return response
+
+def _stock_record(symbol, prices, quotes, count):
+    """Запись /api/stocks по одному тикеру: {"symbol", "data"} или {"symbol", "error"}"""
+    hist = _symbol_frame(prices, symbol, count)
+    quote = quotes.get(symbol, {})
+    if hist is None and not quote:
+        return {"symbol": symbol, "error": _download_error(symbol)}
+    
+    closes = hist['Close'] if hist is not None else pd.Series(dtype=float)
+    return {
+        "symbol": symbol,
+        "data": {
+            "price": quote.get('regularMarketPrice', float(closes.iloc[-1]) if len(closes) else None),
+            "previousClose": quote.get('regularMarketPreviousClose', float(closes.iloc[-2]) if len(closes) > 1 else None),
+            "marketCap": quote.get('marketCap'),
+            "name": quote.get('longName', quote.get('shortName')),
+            "currency": quote.get('currency'),
+            "exchange": quote.get('exchange')
+        }
+    }
+
+def _history_record(symbol, prices, count, fmt):
+    """Запись /api/history/batch по одному тикеру: {"symbol", "data"} или {"symbol", "error"}"""
+    hist = _symbol_frame(prices, symbol, count)
+    if hist is None:
+        return {"symbol": symbol, "error": _download_error(symbol)}
+    return {"symbol": symbol, "data": serialize_history(hist, fmt)}
+
+def _parse_list(value):
+    """Список строк из запроса (list или строка через запятую)"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def parse_symbols(data):
+    """Список тикеров из запроса (list или строка через запятую) и текст ошибки"""
+    symbols = data.get('symbols')
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    if not symbols or not isinstance(symbols, list):
+        return None, "Symbols list is required"
+    
+    symbols = list(dict.fromkeys(str(s).strip().upper() for s in symbols if str(s).strip()))
+    if not symbols:
+        return None, "Symbols list is required"
+    if len(symbols) > MAX_BATCH_SYMBOLS:
+        return None, f"Too many symbols: {len(symbols)} (max {MAX_BATCH_SYMBOLS})"
+    return symbols, None
+
+def _download(symbols, period):
+    """Цены по всем тикерам одним вызовом yf.download"""
+    return upstream.cached_call(','.join(symbols), 'download', (period,), lambda: yf.download(
+        symbols,
+        period=period,
+        group_by='ticker',
+        threads=True,
+        auto_adjust=True,
+        progress=False,
+        session=http_session.get_session()
+    ))
+
+def _symbol_frame(prices, symbol, count):
+    """Данные одного тикера из результата yf.download (None, если данных нет)"""
+    if prices is None or prices.empty:
+        return None
+    if isinstance(prices.columns, pd.MultiIndex):
+        if symbol not in prices.columns.get_level_values(0):
+            return None
+        hist = prices[symbol]
+    elif count == 1:
+        hist = prices
+    else:
+        return None
+    hist = hist.dropna(how='all')
+    return None if hist.empty else hist
+
+def _download_error(symbol):
+    """Ошибка yf.download по тикеру, если yfinance её сохранил"""
+    errors = getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {}
+    return str(errors.get(symbol, "No data found"))
+
+def _fetch_quotes(symbols):
+    """Котировки по списку тикеров одним запросом; при ошибке - пустой словарь"""
+    def request_quotes():
+        # Через клиент yfinance на общей сессии: он добавляет cookie и crumb, без которых Yahoo отвечает 401
+        data = YfData(session=http_session.get_session()).get_raw_json(
+            QUOTE_URL,
+            params={"symbols": ",".join(symbols), "formatted": "false"},
+            timeout=10
+        )
+        quotes = data.get('quoteResponse', {}).get('result') or []
+        return {q['symbol'].upper(): q for q in quotes if q.get('symbol')}
+
+    try:
+        return upstream.cached_call(','.join(symbols), 'quotes', (), request_quotes)
+    except Exception as e:
+        logger.warning(f"Batch quote request failed, using prices only: {str(e)}")
+        return {}
+
+def _fill_from_info(symbols, quotes):
+    """Тикеры без котировки: название, валюта, капитализация - из info в общем кэше (без запросов к Yahoo)"""
+    for symbol in symbols:
+        if symbol in quotes:
+            continue
+        info = upstream.peek(symbol, 'info', ())
+        if info:
+            quotes[symbol] = {field: info[field] for field in INFO_QUOTE_FIELDS if field in info}
+    return quotes
+
+def request_symbols(data):
+    """Тикеры из тела запроса (symbol и/или symbols)"""
+    if not isinstance(data, dict):
+        return []
+    symbols = _parse_list(data.get('symbols'))
+    if data.get('symbol'):
+        symbols.append(str(data['symbol']))
+    return symbols
+
+def _prewarm_ttl(resource, interval):
+    """TTL прогретого ресурса: не меньше периодичности прогрева (до следующего обновления)"""
+    return max(upstream.RESOURCE_TTLS.get(resource, upstream.DEFAULT_TTL), interval + prewarm.TICK)
+
+def _prewarm_info(symbol):
+    """Прогрев /api/stock: info тикера в общем кэше"""
+    ticker = upstream.ticker(symbol)
+    upstream.refresh(symbol, 'info', (), lambda: ticker.info, ttl=_prewarm_ttl('info', prewarm.QUOTES_INTERVAL))
+
+def _prewarm_history(symbol):
+    """Прогрев /api/history и /api/indicators: базовый дневной ряд в хранилище цен и общем кэше (для всех воркеров)"""
+    base = history_views.base_period()
+    history_views.refresh_base(symbol, lambda: _fetch_base_history(symbol, base), base)
+
+def _prewarm_statement(resource, attribute):
+    """Прогрев /api/financials: один отчет тикера в общем кэше"""
+    def warm(symbol):
+        ticker = upstream.ticker(symbol)
+        upstream.refresh(symbol, resource, (), lambda: getattr(ticker, attribute),
+                         ttl=_prewarm_ttl(resource, prewarm.FINANCIALS_INTERVAL))
+    return warm
+
+prewarm.scheduler.add('quotes', prewarm.QUOTES_INTERVAL, _prewarm_info, market_only=True)
+prewarm.scheduler.add('history', prewarm.HISTORY_INTERVAL, _prewarm_history)
+prewarm.scheduler.add('financials', prewarm.FINANCIALS_INTERVAL, _prewarm_statement('financials', 'financials'))
+prewarm.scheduler.add('balance_sheet', prewarm.FINANCIALS_INTERVAL, _prewarm_statement('balance_sheet', 'balance_sheet'))
+prewarm.scheduler.add('cashflow', prewarm.FINANCIALS_INTERVAL, _prewarm_statement('cashflow', 'cashflow'))
+
+def start_background_tasks():
+    """Фоновые потоки сервера (прогрев). Не при импорте: вызывается из post_fork
+    gunicorn, lifespan ASGI или при первом запросе; повторный вызов в том же
+    процессе ничего не делает"""
+    prewarm.scheduler.start()
+
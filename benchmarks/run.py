@@ -0,0 +1,389 @@
+# benchmarks/run.py
+"""
+Микробенчмарки сериализации и сборки ответов на синтетических данных
+
+    python benchmarks/run.py                               # таблица результатов
+    python benchmarks/run.py --output benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json
+
+Upstream подменяется заглушкой Ticker, кэши и хранилище цен выключены,
+поэтому меряется только собственный код сервера. Для каждого случая -
+медиана и минимум времени и пик памяти (tracemalloc) одного вызова.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+from collections import namedtuple
+
+# До импорта модулей сервера: без кэшей, хранилища и ограничения скорости upstream
+os.environ['YF_SHARED_CACHE_PATH'] = ''
+os.environ['YF_PRICE_STORE_PATH'] = ''
+os.environ['YF_CASSETTE_MODE'] = ''
+os.environ.setdefault('YF_UPSTREAM_RATE', '1000000000')
+os.environ.setdefault('YF_UPSTREAM_BURST', '1000000000')
+os.environ.setdefault('YF_UPSTREAM_MAX_IN_FLIGHT', '1000')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.disable(logging.INFO)
+
+import upstream
+import json_provider
+import api_routes
+import yfinance_server as server
+from flask.json.provider import DefaultJSONProvider
+from yfinance_handler import YFinanceHandler
+
+# Минимальное суммарное время замеров одного случая и пределы числа повторов
+MIN_TIME = 0.3
+MIN_ROUNDS = 3
+MAX_ROUNDS = 500
+
+# Регрессия: медиана выросла больше чем в threshold раз и больше чем на NOISE_MS
+DEFAULT_THRESHOLD = 1.3
+NOISE_MS = 0.05
+
+HISTORY_SIZES = (1, 250, 2500, 10000, 20000)
+PERIOD_BARS = {'1mo': 21, '1y': 252, '5y': 1260, 'max': 10000}
+
+rng = np.random.default_rng(42)
+
+OptionChain = namedtuple('OptionChain', ['calls', 'puts', 'underlying'])
+
+
+def make_bars(rows):
+    """Дневные бары ticker.history(): случайное блуждание, редкие дивиденды"""
+    index = pd.bdate_range(end='2024-06-28', periods=rows, tz='America/New_York', name='Date')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    dividends = np.where(rng.random(rows) < 0.016, 0.24, 0.0)
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.3, rows),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 90_000_000, rows),
+        'Dividends': dividends,
+        'Stock Splits': np.zeros(rows)
+    }, index=index)
+
+
+def make_statement(rows=40, columns=4):
+    """Отчет: строки - статьи, колонки - даты отчетных периодов, часть значений NaN"""
+    # period_range: алиасы Q/Y одинаковы в pandas 2.1 (requirements.txt) и 3.x
+    freq = 'Q' if columns > 4 else 'Y'
+    periods = pd.period_range(end='2023-12-31', periods=columns, freq=freq).to_timestamp(how='end').normalize()[::-1]
+    values = rng.normal(1e9, 5e8, (rows, columns))
+    values[rng.random((rows, columns)) < 0.1] = np.nan
+    return pd.DataFrame(values, index=[f"Line Item {i}" for i in range(rows)], columns=periods)
+
+
+def make_option_side(rows):
+    """Одна сторона цепочки опционов в формате yfinance"""
+    strikes = np.round(np.linspace(50, 300, rows), 1)
+    return pd.DataFrame({
+        'contractSymbol': [f"AAPL240719C{int(s * 1000):08d}" for s in strikes],
+        'lastTradeDate': pd.Timestamp('2024-06-28', tz='UTC') - pd.to_timedelta(rng.integers(0, 86400 * 5, rows), unit='s'),
+        'strike': strikes,
+        'lastPrice': np.abs(rng.normal(10, 5, rows)),
+        'bid': np.abs(rng.normal(10, 5, rows)),
+        'ask': np.abs(rng.normal(10, 5, rows)),
+        'change': rng.normal(0, 1, rows),
+        'percentChange': rng.normal(0, 5, rows),
+        'volume': np.where(rng.random(rows) < 0.2, np.nan, rng.integers(0, 5000, rows)),
+        'openInterest': rng.integers(0, 50000, rows),
+        'impliedVolatility': np.abs(rng.normal(0.3, 0.1, rows)),
+        'inTheMoney': strikes < 200,
+        'contractSize': 'REGULAR',
+        'currency': 'USD'
+    })
+
+
+def make_holders(rows=10):
+    """Таблица институциональных держателей"""
+    return pd.DataFrame({
+        'Holder': [f"Holder {i}" for i in range(rows)],
+        'Shares': rng.integers(1_000_000, 1_000_000_000, rows),
+        'Date Reported': pd.date_range(end='2024-03-31', periods=rows, freq='D'),
+        '% Out': rng.random(rows) / 10,
+        'Value': rng.integers(1_000_000, 100_000_000_000, rows)
+    })
+
+
+def make_info():
+    """Словарь ticker.info примерно реального размера"""
+    info = {f"field{i}": float(i) for i in range(120)}
+    info.update({
+        'longName': 'Synthetic Corp', 'shortName': 'SYN', 'sector': 'Technology',
+        'industry': 'Software', 'country': 'United States', 'currency': 'USD',
+        'exchange': 'NMS', 'quoteType': 'EQUITY', 'currentPrice': 190.5,
+        'previousClose': 189.1, 'marketCap': 2.9e12, 'longBusinessSummary': 'x' * 2000,
+        'companyOfficers': [
+            {'name': f"Officer {i}", 'title': 'VP', 'age': 50, 'yearBorn': 1974, 'totalPay': 1e6}
+            for i in range(10)
+        ]
+    })
+    return info
+
+
+class StubTicker:
+    """Заглушка yf.Ticker с синтетическими данными реалистичных размеров"""
+
+    def __init__(self, symbol, statement_columns=4, option_rows=2000):
+        self.ticker = symbol
+        self.info = make_info()
+        self.financials = make_statement(40, statement_columns)
+        self.quarterly_financials = make_statement(40, max(statement_columns, 5))
+        self.balance_sheet = make_statement(40, statement_columns)
+        self.quarterly_balance_sheet = make_statement(40, max(statement_columns, 5))
+        self.cashflow = make_statement(40, statement_columns)
+        self.quarterly_cashflow = make_statement(40, max(statement_columns, 5))
+        self.earnings = make_statement(2, 4).T
+        self.quarterly_earnings = make_statement(2, 4).T
+        self.calendar = pd.DataFrame({'Earnings Date': [pd.Timestamp('2024-08-01')], 'EPS Estimate': [1.3]})
+        self.dividends = make_bars(1000)['Dividends'].loc[lambda s: s > 0]
+        self.recommendations = pd.DataFrame({
+            'Firm': 'Firm', 'To Grade': 'Buy', 'From Grade': 'Hold', 'Action': 'up'
+        }, index=pd.date_range(end='2024-06-01', periods=200, freq='W'))
+        self.earnings_estimate = make_statement(4, 6)
+        self.revenue_estimate = make_statement(4, 6)
+        self.major_holders = pd.DataFrame([['0.07%', 'Insiders'], ['61%', 'Institutions']])
+        self.institutional_holders = make_holders(10)
+        self.mutualfund_holders = make_holders(10)
+        self.options = ('2024-07-19', '2024-07-26', '2024-08-16')
+        self.news = [
+            {'title': f"News {i}", 'publisher': 'Wire', 'link': 'https://example.com',
+             'providerPublishTime': 1719500000 + i, 'type': 'STORY'}
+            for i in range(8)
+        ]
+        self._option_rows = option_rows
+        self._bars = {}
+        self._chain = None
+
+    def history(self, period='1mo', interval='1d', **kwargs):
+        rows = PERIOD_BARS.get(period, 252)
+        if rows not in self._bars:
+            self._bars[rows] = make_bars(rows)
+        return self._bars[rows]
+
+    def option_chain(self, expiration):
+        if self._chain is None:
+            side = make_option_side(self._option_rows // 2)
+            self._chain = OptionChain(side, side.copy(), {})
+        return self._chain
+
+
+class NoCache:
+    """Кэш секций, который ничего не хранит: каждая секция строится заново"""
+
+    def get_or_load(self, key, loader, **kwargs):
+        return loader()
+
+    def stats(self):
+        return {}
+
+
+class StubPlan:
+    """План запроса с заранее загруженными ресурсами"""
+
+    def __init__(self, resources, params=None):
+        self.resources = resources
+        self.params = params or {}
+
+    def get(self, name, default=None):
+        return self.resources.get(name, default)
+
+
+def build_cases():
+    """Случаи: имя -> функция без аргументов"""
+    handler = YFinanceHandler(cache=NoCache())
+    cases = {}
+
+    for rows, columns in ((40, 4), (40, 16)):
+        statement = make_statement(rows, columns)
+        for orient in ('nested', 'columnar'):
+            cases[f"convert_df_to_dict/statement_{rows}x{columns}/{orient}"] = (
+                lambda df=statement, orient=orient: handler._convert_df_to_dict(df, orient)
+            )
+    for rows in (2000, 10000):
+        chain = make_option_side(rows)
+        cases[f"convert_df_to_dict/option_chain_{rows}"] = lambda df=chain: handler._convert_df_to_dict(df)
+    holders = make_holders(10)
+    cases["convert_df_to_dict/holders_10"] = lambda: handler._convert_df_to_dict(holders)
+
+    for rows in HISTORY_SIZES:
+        plan = StubPlan({"history": make_bars(rows)})
+        cases[f"historical_prices/{rows}"] = lambda plan=plan: handler._get_historical_prices(plan)
+
+    for rows in HISTORY_SIZES:
+        bars = make_bars(rows)
+        for fmt in ('records', 'columnar'):
+            cases[f"api_history/{fmt}/{rows}"] = (
+                lambda bars=bars, fmt=fmt: api_routes.build_history_payload('SYN', '1y', fmt, bars)
+            )
+
+    for columns in (4, 16):
+        statements = {
+            "income_statement": make_statement(40, columns),
+            "balance_sheet": make_statement(40, columns),
+            "cash_flow": make_statement(40, columns)
+        }
+        cases[f"api_financials/40x{columns}"] = (
+            lambda statements=statements: _with_financials(statements, lambda: api_routes.build_financials_payload('SYN'))
+        )
+
+    tickers = {}
+    for period in ('1y', 'max'):
+        cases[f"get_ticker_info/all/{period}"] = (
+            lambda period=period: _with_ticker(tickers, lambda: handler.get_ticker_info('SYN', period, concurrent=False))
+        )
+    cases["get_ticker_info/all_concurrent/1y"] = (
+        lambda: _with_ticker(tickers, lambda: handler.get_ticker_info('SYN', '1y'))
+    )
+
+    # Кодирование готовых ответов в JSON: стандартный провайдер Flask и провайдеры json_provider
+    payloads = {
+        "history_records_2500": api_routes.build_history_payload('SYN', '1y', 'records', make_bars(2500)),
+        "history_columnar_10000": api_routes.build_history_payload('SYN', 'max', 'columnar', make_bars(10000)),
+        "financials_40x16": _with_financials(
+            {name: make_statement(40, 16) for name in ("income_statement", "balance_sheet", "cash_flow")},
+            lambda: api_routes.build_financials_payload('SYN')
+        ),
+        "profile_1y": _with_ticker(tickers, lambda: handler.get_ticker_info('SYN', '1y', concurrent=False))
+    }
+    providers = {"flask": DefaultJSONProvider(server.app), "numpy": json_provider.NumpyJSONProvider(server.app)}
+    if json_provider.orjson is not None:
+        providers["orjson"] = json_provider.OrjsonProvider(server.app)
+    for name, payload in payloads.items():
+        for provider_name, provider in providers.items():
+            if _encodable(provider, payload):
+                cases[f"json_encode/{name}/{provider_name}"] = (
+                    lambda provider=provider, payload=payload: provider.dumps(payload)
+                )
+    return cases
+
+
+def _encodable(provider, payload):
+    """Стандартный провайдер Flask не умеет типы NumPy - такие случаи пропускаются"""
+    try:
+        provider.dumps(payload)
+        return True
+    except TypeError:
+        return False
+
+
+def _with_financials(statements, fn):
+    original = api_routes.fetch_financials
+    api_routes.fetch_financials = lambda symbol: statements
+    try:
+        return fn()
+    finally:
+        api_routes.fetch_financials = original
+
+
+def _with_ticker(tickers, fn):
+    original = upstream.ticker
+    upstream.ticker = lambda symbol: tickers[symbol] if symbol in tickers else tickers.setdefault(symbol, StubTicker(symbol))
+    try:
+        result = fn()
+    finally:
+        upstream.ticker = original
+    if not result.get("success"):
+        raise RuntimeError(result.get("error"))
+    return result
+
+
+def measure(fn):
+    """Медиана/минимум времени (мс) и пик памяти одного вызова (КБ)"""
+    fn()  # прогрев
+
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MIN_ROUNDS or (time.perf_counter() - started < MIN_TIME and len(timings) < MAX_ROUNDS):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "min_ms": round(min(timings), 4),
+        "peak_kb": round(peak / 1024, 1),
+        "rounds": len(timings)
+    }
+
+
+def compare(results, baseline, threshold):
+    """Случаи, которые стали медленнее базовой линии больше чем в threshold раз"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else float('inf')
+        if ratio > threshold and current["median_ms"] - base["median_ms"] > NOISE_MS:
+            regressions.append((name, base["median_ms"], current["median_ms"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help="Только случаи, имя которых содержит строку")
+    parser.add_argument('--output', help="Записать результаты (JSON) в файл")
+    parser.add_argument('--compare', help="Сравнить с базовой линией (JSON); регрессии - код выхода 1")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Допустимый рост медианы, раз (по умолчанию {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<48} {'median ms':>11} {'min ms':>11} {'peak KB':>10} {'rounds':>7}")
+    for name, fn in build_cases().items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn)
+        r = results[name]
+        print(f"{name:<48} {r['median_ms']:>11.3f} {r['min_ms']:>11.3f} {r['peak_kb']:>10.1f} {r['rounds']:>7}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        "cases": results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms (x{ratio:.2f})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (threshold x{args.threshold})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# binary_formats.py
+import io
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed_serialization
+from serializers import PRICE_COLUMNS, ACTION_COLUMNS, format_dates
+
+# Необязательные зависимости: без них соответствующий формат недоступен (406)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = 'application/json'
+
+# Бинарные форматы: имя -> media type
+MEDIA_TYPES = {
+    "arrow": 'application/vnd.apache.arrow.stream',
+    "msgpack": 'application/msgpack',
+    "parquet": 'application/vnd.apache.parquet'
+}
+
+# Форматы, которые отдаются как файл (Content-Disposition: attachment)
+DOWNLOAD_FORMATS = {"parquet": "parquet"}
+
+
+def negotiate(accept):
+    """
+    Выбрать формат ответа по заголовку Accept
+
+    Args:
+        accept: request.accept_mimetypes (werkzeug MIMEAccept)
+
+    Returns:
+        Имя бинарного формата из MEDIA_TYPES или None (JSON)
+    """
+    media_type = accept.best_match([JSON_MEDIA_TYPE] + list(MEDIA_TYPES.values()))
+    for name, value in MEDIA_TYPES.items():
+        if media_type == value:
+            return name
+    return None
+
+
+def available(name):
+    """Установлена ли библиотека для формата"""
+    if name == "msgpack":
+        return msgpack is not None
+    return pa is not None
+
+
+def history_frame(hist):
+    """
+    Исторические данные плоской таблицей с теми же колонками и округлением,
+    что и в JSON: date, open, high, low, close, volume, dividends, stock_splits
+    """
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    columns = {"date": index.normalize()}
+    for key, name in PRICE_COLUMNS:
+        columns[key] = np.round(hist[name].to_numpy(dtype=float), 2)
+    columns["volume"] = hist['Volume'].to_numpy(dtype=float)
+    if not np.isnan(columns["volume"]).any():
+        columns["volume"] = columns["volume"].astype(np.int64)
+    for key, name in ACTION_COLUMNS:
+        columns[key] = hist[name].to_numpy(dtype=float) if name in hist.columns else np.zeros(len(hist))
+    return pd.DataFrame(columns)
+
+
+def statements_frame(statements):
+    """
+    Последняя колонка каждого отчета одной длинной таблицей:
+    statement, item, period, value (как в JSON-ответе /api/financials)
+
+    Args:
+        statements: {имя отчета: DataFrame из ticker.financials/...}
+    """
+    parts = []
+    for name, df in statements.items():
+        if df is None or df.empty:
+            continue
+        parts.append(pd.DataFrame({
+            "statement": name,
+            "item": df.index.astype(str),
+            "period": pd.to_datetime(df.columns[0], errors='coerce'),
+            "value": pd.to_numeric(df.iloc[:, 0], errors='coerce').to_numpy(dtype=float)
+        }))
+    if not parts:
+        return pd.DataFrame({
+            "statement": pd.Series(dtype=object),
+            "item": pd.Series(dtype=object),
+            "period": pd.Series(dtype='datetime64[ns]'),
+            "value": pd.Series(dtype=float)
+        })
+    return pd.concat(parts, ignore_index=True)
+
+
+@timed_serialization('binary')
+def encode(frame, name, metadata=None):
+    """
+    Закодировать плоскую таблицу в бинарный формат
+
+    Args:
+        frame: DataFrame без значимого индекса
+        name: Имя формата из MEDIA_TYPES
+        metadata: Словарь строк (symbol, period, ...) - в схему Arrow/Parquet
+            или рядом с колонками в MessagePack
+
+    Returns:
+        bytes
+    """
+    if not available(name):
+        raise ValueError(f"Format '{name}' is not available on this server")
+
+    if name == "msgpack":
+        return msgpack.packb({
+            "metadata": metadata or {},
+            "columns": {col: _msgpack_column(frame[col]) for col in frame.columns}
+        })
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if metadata:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            **{str(k).encode(): str(v).encode() for k, v in metadata.items()}
+        })
+
+    if name == "parquet":
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        return buffer.getvalue()
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _msgpack_column(series):
+    """Колонка для MessagePack: даты - строками YYYY-MM-DD, числа - как есть (NaN -> None)"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        result = format_dates(pd.DatetimeIndex(series))
+        mask = series.isna().to_numpy()
+    else:
+        values = series.to_numpy()
+        result = values.tolist()
+        mask = pd.isna(values)
+    for pos in np.flatnonzero(mask):
+        result[pos] = None
+    return result
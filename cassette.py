@@ -0,0 +1,220 @@
+# cassette.py
+import os
+import json
+import time
+import base64
+import random
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Режим: '' - обычная работа, 'record' - записывать ответы Yahoo, 'replay' - отдавать записанные
+MODE = os.environ.get('YF_CASSETTE_MODE', '').lower()
+CASSETTE_DIR = os.environ.get('YF_CASSETTE_DIR', os.path.join('fixtures', 'cassettes'))
+
+# Для replay: задержка ответа в мс ("50" или диапазон "20-80") и доля ответов с ошибкой
+REPLAY_LATENCY_MS = os.environ.get('YF_REPLAY_LATENCY_MS', '0')
+REPLAY_ERROR_RATE = float(os.environ.get('YF_REPLAY_ERROR_RATE', 0))
+REPLAY_ERROR_STATUS = int(os.environ.get('YF_REPLAY_ERROR_STATUS', 503))
+REPLAY_SEED = os.environ.get('YF_REPLAY_SEED')
+
+MODES = ('record', 'replay')
+
+# Параметры запроса, которые меняются от сессии к сессии и не входят в ключ
+VOLATILE_PARAMS = {'crumb', '_'}
+
+# Диапазон баров chart API (unix-время): yfinance ставит period2 = текущее время
+# для period='max' и любых запросов со start, а period1 для 'max' и периодов
+# вида '1y' тоже отсчитывает от текущего времени
+RANGE_PARAMS = ('period1', 'period2')
+
+# Насколько period2 может отставать от текущего времени, чтобы считаться "сейчас", секунды
+RANGE_NOW_TOLERANCE = 2 * 24 * 3600
+
+# Заголовки, которые не сохраняются (тело хранится уже распакованным)
+SKIP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+
+class CassetteMiss(requests.ConnectionError):
+    """В кассете нет записи для запроса (replay)"""
+
+
+def request_key(method, url):
+    """
+    Ключ запроса: метод и URL с отсортированными параметрами без изменчивых
+
+    Диапазон "до текущего момента" (period2 около now) записывается как
+    period1=-<N>d, period2=now - длина диапазона в днях, поэтому история за
+    'max' или '1y', записанная вчера, находится и при воспроизведении сегодня.
+    Диапазон с явным концом в прошлом - датами YYYY-MM-DD.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    normalized = _normalize_range(dict(query))
+    params = sorted((k, normalized.get(k, v)) for k, v in query if k not in VOLATILE_PARAMS)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}?{urlencode(params)}"
+
+
+def _normalize_range(params):
+    """period1/period2 в виде, не зависящем от момента записи (см. request_key)"""
+    try:
+        start, end = (int(params[name]) if name in params else None for name in RANGE_PARAMS)
+    except ValueError:
+        return {}
+    if end is None:
+        return {}
+    if abs(time.time() - end) <= RANGE_NOW_TOLERANCE:
+        normalized = {"period2": "now"}
+        if start is not None:
+            # start - полночь по времени биржи, поэтому целое число суток не меняется в течение ее дня
+            normalized["period1"] = f"-{(end - start) // 86400}d"
+        return normalized
+    return {
+        name: time.strftime('%Y-%m-%d', time.gmtime(value))
+        for name, value in zip(RANGE_PARAMS, (start, end)) if value is not None
+    }
+
+
+class Cassette:
+    """
+    Каталог записанных ответов: по JSON-файлу на запрос (имя - sha1 ключа),
+    поэтому запись из нескольких потоков и процессов не конфликтует.
+    """
+
+    def __init__(self, path=CASSETTE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def load(self, key):
+        try:
+            with open(self._file(key), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, response):
+        content = response.content
+        try:
+            body, encoding = content.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode('ascii'), 'base64'
+
+        record = {
+            "key": key,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS},
+            "encoding": encoding,
+            "body": body,
+            "recorded_at": time.time()
+        }
+        # Запись через временный файл: читатель не увидит недописанный JSON
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+
+class RecordingAdapter(BaseAdapter):
+    """Пропускает запросы к обычному адаптеру и сохраняет успешные ответы в кассету"""
+
+    def __init__(self, inner, cassette):
+        super().__init__()
+        self.inner = inner
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        if response.status_code < 500 and response.status_code != 429:
+            self.cassette.save(request_key(request.method, request.url), response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Отдает ответы из кассеты без сети, с искусственной задержкой и долей
+    ошибок (REPLAY_ERROR_STATUS) - для воспроизводимых нагрузочных тестов.
+    """
+
+    def __init__(self, cassette, latency_ms=REPLAY_LATENCY_MS, error_rate=REPLAY_ERROR_RATE,
+                 error_status=REPLAY_ERROR_STATUS, seed=REPLAY_SEED):
+        super().__init__()
+        self.cassette = cassette
+        low, _, high = str(latency_ms).partition('-')
+        self.latency = (float(low or 0) / 1000, float(high or low or 0) / 1000)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            delay = self._random.uniform(*self.latency)
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        key = request_key(request.method, request.url)
+        if failed:
+            return self._build(request, self.error_status, 'Injected Failure', {}, b'{"error": "injected failure"}')
+
+        record = self.cassette.load(key)
+        if record is None:
+            raise CassetteMiss(f"No recorded response for {key}", request=request)
+
+        body = record["body"]
+        content = base64.b64decode(body) if record["encoding"] == 'base64' else body.encode('utf-8')
+        return self._build(request, record["status"], record.get("reason"), record["headers"], content)
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _build(request, status, reason, headers, content):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = reason
+        return response
+
+
+def install(session, adapter):
+    """
+    Подключить запись/воспроизведение к сессии по YF_CASSETTE_MODE
+
+    Args:
+        session: requests.Session
+        adapter: Обычный (сетевой) адаптер сессии
+    """
+    if not MODE:
+        return session
+    if MODE not in MODES:
+        raise ValueError(f"Unknown YF_CASSETTE_MODE: {MODE}")
+
+    cassette = Cassette(CASSETTE_DIR)
+    if MODE == 'record':
+        wrapped = RecordingAdapter(adapter, cassette)
+    else:
+        wrapped = ReplayAdapter(cassette)
+    session.mount('https://', wrapped)
+    session.mount('http://', wrapped)
+    logger.info(f"Cassette {MODE} mode: {CASSETTE_DIR}")
+    return session
@@ -0,0 +1,147 @@
+# fetch_plan.py
+import time
+import threading
+import logging
+
+import upstream
+import price_store
+from governor import UpstreamBusy
+
+logger = logging.getLogger(__name__)
+
+
+def _fetch_option_chain(ticker, plan):
+    """Цепочка опционов для ближайшей даты экспирации"""
+    expirations = plan.get("options")
+    if not expirations:
+        return None
+    return ticker.option_chain(expirations[0])
+
+
+# Ресурсы yfinance: имя -> функция (ticker, plan) -> значение.
+# Каждый ресурс - это отдельный запрос (или группа запросов) к Yahoo.
+RESOURCE_FETCHERS = {
+    "info": lambda ticker, plan: ticker.info,
+    "financials": lambda ticker, plan: ticker.financials,
+    "quarterly_financials": lambda ticker, plan: ticker.quarterly_financials,
+    "balance_sheet": lambda ticker, plan: ticker.balance_sheet,
+    "quarterly_balance_sheet": lambda ticker, plan: ticker.quarterly_balance_sheet,
+    "cashflow": lambda ticker, plan: ticker.cashflow,
+    "quarterly_cashflow": lambda ticker, plan: ticker.quarterly_cashflow,
+    "earnings": lambda ticker, plan: ticker.earnings,
+    "quarterly_earnings": lambda ticker, plan: ticker.quarterly_earnings,
+    "calendar": lambda ticker, plan: ticker.calendar,
+    "dividends": lambda ticker, plan: ticker.dividends,
+    "recommendations": lambda ticker, plan: ticker.recommendations,
+    "earnings_estimate": lambda ticker, plan: ticker.earnings_estimate,
+    "revenue_estimate": lambda ticker, plan: ticker.revenue_estimate,
+    "major_holders": lambda ticker, plan: ticker.major_holders,
+    "institutional_holders": lambda ticker, plan: ticker.institutional_holders,
+    "mutualfund_holders": lambda ticker, plan: ticker.mutualfund_holders,
+    "history": lambda ticker, plan: price_store.history(upstream.GovernedTicker(ticker), plan.params.get("period", "1y")),
+    "options": lambda ticker, plan: tuple(ticker.options),
+    "option_chain": _fetch_option_chain,
+    "news": lambda ticker, plan: ticker.news
+}
+
+# Параметры плана, от которых зависит результат ресурса (для объединения запросов)
+RESOURCE_PARAMS = {
+    "history": ("period",)
+}
+
+# Ресурсы из локального хранилища: сами загрузки из Yahoo идут через
+# upstream.GovernedTicker, поэтому целиком через upstream.call их не оборачиваем
+LOCAL_RESOURCES = ("history",)
+
+# Ресурсы, которые читают и другие маршруты и прогрев (prewarm): берутся из
+# общего кэша upstream по тому же ключу, что и там (upstream.cached_call)
+SHARED_RESOURCES = ("info", "financials", "balance_sheet", "cashflow", "options")
+
+_RAISE = object()
+
+
+class FetchPlan:
+    """
+    План запросов к yfinance в рамках одного вызова.
+
+    Секции объявляют нужные им ресурсы, план загружает каждый ресурс
+    не более одного раза (лениво, потокобезопасно) и запоминает ошибки,
+    чтобы не повторять неудачный запрос. Одинаковые запросы из разных
+    планов (параллельных вызовов) объединяются через upstream.call, а
+    SHARED_RESOURCES сначала ищутся в общем кэше воркеров.
+    """
+
+    def __init__(self, ticker, resources, params=None):
+        self.ticker = ticker
+        self.params = params or {}
+        self.resources = list(dict.fromkeys(resources))
+        unknown = [name for name in self.resources if name not in RESOURCE_FETCHERS]
+        if unknown:
+            raise ValueError(f"Unknown resources: {', '.join(unknown)}")
+        self._locks = {name: threading.Lock() for name in self.resources}
+        self._results = {}
+        self._errors = {}
+        self.timings = {}
+
+    def get(self, name, default=_RAISE):
+        """
+        Значение ресурса; загружается при первом обращении
+
+        Args:
+            name: Имя ресурса из RESOURCE_FETCHERS
+            default: Значение при ошибке загрузки (иначе ошибка пробрасывается);
+                UpstreamBusy пробрасывается всегда - запрос должен получить 503
+        """
+        if name not in self._locks:
+            raise KeyError(f"Resource '{name}' is not in the fetch plan")
+
+        with self._locks[name]:
+            if name not in self._results and name not in self._errors:
+                started = time.perf_counter()
+                fetch = lambda: RESOURCE_FETCHERS[name](self.ticker, self)
+                try:
+                    if name in LOCAL_RESOURCES:
+                        self._results[name] = fetch()
+                    else:
+                        call = upstream.cached_call if name in SHARED_RESOURCES else upstream.call
+                        self._results[name] = call(
+                            self.ticker.ticker,
+                            name,
+                            tuple(self.params.get(param) for param in RESOURCE_PARAMS.get(name, ())),
+                            fetch
+                        )
+                except Exception as e:
+                    self._errors[name] = e
+                finally:
+                    self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+        if name in self._errors:
+            if default is _RAISE or isinstance(self._errors[name], UpstreamBusy):
+                raise self._errors[name]
+            return default
+        return self._results[name]
+
+    def failed(self, name):
+        """Загрузка ресурса завершилась ошибкой"""
+        return name in self._errors
+
+    @property
+    def fetched(self):
+        """Ресурсы, к которым действительно обращались (включая неудачные)"""
+        return [name for name in self.resources if name in self.timings]
+
+    def summary(self):
+        return {
+            "planned": self.resources,
+            "fetched": self.fetched,
+            "upstream_calls": len(self.fetched),
+            "errors": {name: str(e) for name, e in self._errors.items()},
+            "timings_ms": dict(self.timings)
+        }
+
+    def log(self, symbol):
+        summary = self.summary()
+        logger.info(
+            f"Fetch plan for {symbol}: {summary['upstream_calls']}/{len(summary['planned'])} "
+            f"resources fetched {summary['fetched']}, errors: {list(summary['errors'])}"
+        )
@@ -0,0 +1,175 @@
+# governor.py
+import os
+import math
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Запросов к Yahoo в секунду (потолок; при 429 скорость снижается)
+RATE = float(os.environ.get('YF_UPSTREAM_RATE', 10))
+MIN_RATE = float(os.environ.get('YF_UPSTREAM_MIN_RATE', 0.5))
+BURST = int(os.environ.get('YF_UPSTREAM_BURST', 20))
+
+# Одновременных запросов к Yahoo на процесс
+MAX_IN_FLIGHT = int(os.environ.get('YF_UPSTREAM_MAX_IN_FLIGHT', 16))
+
+# Сколько секунд запрос может ждать своей очереди, прежде чем получит 503
+QUEUE_TIMEOUT = float(os.environ.get('YF_UPSTREAM_QUEUE_TIMEOUT', 10))
+
+# AIMD: +INCREASE доли потолка за успешный запрос, *DECREASE при 429/таймауте
+INCREASE = 0.05
+DECREASE = 0.5
+
+# Пауза после 429 без Retry-After: удваивается при повторных 429
+COOLDOWN = 1.0
+MAX_COOLDOWN = 30.0
+
+
+class UpstreamBusy(Exception):
+    """Бюджет запросов к upstream исчерпан; повторить через retry_after секунд"""
+
+    def __init__(self, retry_after):
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(f"Upstream request budget exhausted, retry after {self.retry_after}s")
+
+
+def is_throttle_error(error):
+    """Ошибка - это 429 или таймаут upstream (сигнал снизить скорость)"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    name = type(error).__name__.lower()
+    if 'timeout' in name or 'ratelimit' in name:
+        return True
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+
+class UpstreamGovernor:
+    """
+    Регулятор запросов к Yahoo: token bucket, ограничение одновременных
+    запросов и AIMD-адаптация скорости.
+
+    Каждый успешный запрос немного поднимает скорость (до rate), каждый 429
+    или таймаут вдвое снижает её (до min_rate) и ставит паузу. Запрос, который
+    не успевает получить разрешение до дедлайна, получает UpstreamBusy.
+    Вложенные вызовы в том же потоке (ресурс, загружающий другой ресурс)
+    не занимают второй слот.
+    """
+
+    def __init__(self, rate=RATE, burst=BURST, max_in_flight=MAX_IN_FLIGHT, min_rate=MIN_RATE,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._rate = rate
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._cooldown = COOLDOWN
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._counters = {"admitted": 0, "rejected": 0, "throttled": 0}
+
+    def run(self, fn, timeout=None):
+        """Выполнить fn() с разрешения регулятора; 429/таймауты снижают скорость"""
+        if getattr(self._local, 'active', False):
+            return fn()
+
+        self.acquire(timeout)
+        self._local.active = True
+        self._local.reported = False
+        throttled = False
+        try:
+            return fn()
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            raise
+        finally:
+            self._local.active = False
+            # 429, о котором уже сообщил хук HTTP-сессии (on_throttle), второй раз не учитывается
+            self.release(None if self._local.reported else throttled)
+
+    def acquire(self, timeout=None):
+        """Дождаться токена и свободного слота; не успели до дедлайна - UpstreamBusy"""
+        deadline = time.monotonic() + (self.queue_timeout if timeout is None else timeout)
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if self._in_flight >= self.max_in_flight:
+                    if now >= deadline:
+                        self._reject(1)
+                    self._cond.wait(deadline - now)
+                    continue
+
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self._rate if self._tokens < 1 else 0)
+                if wait <= 0:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    self._counters["admitted"] += 1
+                    return
+                if now + wait > deadline:
+                    self._reject(wait)
+                self._cond.wait(wait)
+
+    def release(self, throttled=False):
+        """Освободить слот: throttled=True - 429/таймаут, False - успех, None - без изменения скорости"""
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self._throttle(time.monotonic())
+            elif throttled is not None:
+                self._rate = min(self.max_rate, self._rate + INCREASE * self.max_rate)
+                self._cooldown = COOLDOWN
+            self._cond.notify_all()
+
+    def on_throttle(self, retry_after=None):
+        """Upstream ответил 429 (например, из хука HTTP-сессии)"""
+        self._local.reported = True
+        with self._cond:
+            self._throttle(time.monotonic(), retry_after)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            stats = dict(self._counters)
+            stats.update({
+                "rate": round(self._rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self._tokens, 2),
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "blocked_for": round(max(0.0, self._blocked_until - now), 2)
+            })
+            return stats
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+    def _throttle(self, now, retry_after=None):
+        # Вызывается под self._cond
+        self._counters["throttled"] += 1
+        self._rate = max(self.min_rate, self._rate * DECREASE)
+        pause = retry_after if retry_after else self._cooldown
+        self._blocked_until = max(self._blocked_until, now + pause)
+        self._cooldown = min(MAX_COOLDOWN, self._cooldown * 2)
+        logger.warning(f"Upstream throttled: rate lowered to {self._rate:.2f}/s, pausing {pause:.1f}s")
+
+    def _reject(self, wait):
+        # Вызывается под self._cond
+        self._counters["rejected"] += 1
+        raise UpstreamBusy(wait)
+
+
+governor = UpstreamGovernor()
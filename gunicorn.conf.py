@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+# Запуск: gunicorn -c gunicorn.conf.py yfinance_server:app (см. start.sh)
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+threads = int(os.environ.get('GUNICORN_THREADS', '2'))
+timeout = 120
+loglevel = 'info'
+
+# Приложение импортируется один раз в мастере (общие страницы памяти у воркеров);
+# фоновые потоки при этом стартуют только в воркерах - в post_fork
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Фоновые потоки создаются в воркере после fork, а не при импорте приложения.
+
+    Без preload_app приложение импортируется уже в воркере - тогда прогрев
+    стартует с первым запросом (yfinance_server.ensure_background_tasks).
+    """
+    import sys
+    app_module = sys.modules.get('yfinance_server')
+    if app_module is not None:
+        app_module.start_background_tasks()
+
+
+def child_exit(server, worker):
+    """Метрики завершившегося воркера больше не учитываются (PROMETHEUS_MULTIPROC_DIR)"""
+    import metrics
+    metrics.mark_process_dead(worker.pid)
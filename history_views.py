@@ -0,0 +1,190 @@
+# history_views.py
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from section_cache import SectionCache
+from shared_cache import shared_cache
+from price_store import PERIOD_OFFSETS, PERIOD_BARS
+
+logger = logging.getLogger(__name__)
+
+# Базовый дневной ряд тикера, из которого строятся все представления /api/history
+BASE_PERIOD = os.environ.get('YF_HISTORY_BASE_PERIOD', 'max')
+
+# Базовый ряд - наименьший из этих периодов, покрывающий запрос (не длиннее
+# BASE_PERIOD): без хранилища цен каждое истечение BASE_TTL иначе скачивало бы
+# всю историю, а с ним - каждый ряд читался бы из SQLite целиком
+BASE_LADDER = ('1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'max')
+
+# Запас при сравнении начала запроса с началом периода (выходные, праздники)
+LADDER_SLACK = pd.Timedelta(days=7)
+
+# Сколько секунд базовый ряд живет в кэше (хвост догружает хранилище цен)
+BASE_TTL = int(os.environ.get('YF_HISTORY_BASE_TTL', 60))
+
+# Интервалы yfinance, которые строятся из дневных баров, -> правило агрегации
+INTERVALS = {'1d': None, '1wk': 'W', '1mo': 'M', '3mo': 'Q'}
+
+# Правила агрегации: неделя, месяц, квартал, год (бакеты - периоды pandas)
+RESAMPLE_RULES = ('W', 'M', 'Q', 'Y')
+
+PERIODS = tuple(PERIOD_OFFSETS) + tuple(PERIOD_BARS) + ('ytd', 'max')
+
+base_cache = SectionCache(
+    max_entries=int(os.environ.get('YF_HISTORY_BASE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('YF_HISTORY_BASE_MAX_BYTES', 256 * 1024 * 1024)),
+    default_ttl=BASE_TTL,
+    # Общий уровень: ряд, загруженный (или прогретый) одним воркером, видят остальные
+    backend=shared_cache,
+    namespace='history_base'
+)
+
+
+def base_period(period='1mo', start=None, end=None):
+    """
+    Период базового ряда для представления: наименьший период BASE_LADDER,
+    покрывающий period или start (хранилище цен при более длинном периоде
+    докачивает только недостающее начало ряда)
+    """
+    if BASE_PERIOD not in BASE_LADDER:
+        return BASE_PERIOD
+    ladder = BASE_LADDER[:BASE_LADDER.index(BASE_PERIOD) + 1]
+
+    if start is None and end is not None:
+        return BASE_PERIOD
+    if start is not None:
+        needed = _localize(start, None)
+    elif period in PERIOD_BARS:
+        return ladder[0]
+    elif period == 'ytd':
+        needed = _period_start('ytd', None)
+    elif period in ladder:
+        return period
+    else:
+        return BASE_PERIOD
+
+    now = pd.Timestamp.now().normalize()
+    for candidate in ladder:
+        if candidate == 'max' or now - PERIOD_OFFSETS[candidate] + LADDER_SLACK <= needed:
+            return candidate
+    return BASE_PERIOD
+
+
+def base_series(symbol, loader, period=BASE_PERIOD):
+    """Дневной базовый ряд тикера за period из памяти или loader()"""
+    return base_cache.get_or_load(
+        (symbol.upper(), period), loader,
+        store_if=lambda hist: hist is not None and not hist.empty
+    )
+
+
+def refresh_base(symbol, loader, period=BASE_PERIOD):
+    """Загрузить базовый ряд заново и положить в кэш - память и общий уровень (прогрев)"""
+    hist = loader()
+    if hist is not None and not hist.empty:
+        base_cache.set((symbol.upper(), period), hist)
+    return hist
+
+
+def select(hist, period='1mo', start=None, end=None, rule=None):
+    """
+    Представление базового ряда: срез [start, end) (или period) и агрегация по rule
+
+    Args:
+        hist: Дневные бары, отсортированные по дате
+        period: Период, если start не задан
+        start, end: Даты (строки YYYY-MM-DD или Timestamp) по местному времени биржи; end не включается
+        rule: Одно из RESAMPLE_RULES или None (дневные бары)
+    """
+    if hist is None or hist.empty:
+        return hist
+    if start is not None or end is not None:
+        hist = slice_dates(hist, start, end)
+    elif period in PERIOD_BARS:
+        hist = hist.iloc[-PERIOD_BARS[period]:]
+    elif period != 'max':
+        hist = slice_dates(hist, _period_start(period, hist.index.tz), None)
+    return resample(hist, rule) if rule else hist
+
+
+def slice_dates(hist, start=None, end=None):
+    """Бары в [start, end) бинарным поиском по отсортированному индексу (без маски по всему ряду)"""
+    index = hist.index
+    left = index.searchsorted(_localize(start, index.tz), side='left') if start is not None else 0
+    right = index.searchsorted(_localize(end, index.tz), side='left') if end is not None else len(index)
+    return hist.iloc[left:right]
+
+
+def resample(hist, rule):
+    """
+    OHLCV-агрегация дневных баров по неделям/месяцам/кварталам/годам
+
+    Бар бакета помечен датой его первого торгового дня (как 1wk/1mo у
+    yfinance): Open - первый, High - максимум, Low - минимум, Close -
+    последний, Volume и Dividends - сумма, Stock Splits - произведение
+    коэффициентов. Бакеты идут подряд в отсортированном ряду, поэтому
+    агрегация - reduceat по границам без groupby.
+    """
+    if rule not in RESAMPLE_RULES:
+        raise ValueError(f"Unknown resample rule: {rule}")
+    if hist.empty:
+        return hist
+
+    index = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+    buckets = index.to_period(rule).asi8
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(hist)])) - 1
+
+    result = {}
+    for name in hist.columns:
+        values = hist[name].to_numpy()
+        if name == 'Open':
+            result[name] = values[starts]
+        elif name == 'Close':
+            result[name] = values[ends]
+        elif name == 'High':
+            result[name] = np.fmax.reduceat(values, starts)
+        elif name == 'Low':
+            result[name] = np.fmin.reduceat(values, starts)
+        elif name == 'Stock Splits':
+            factors = np.multiply.reduceat(np.where(values > 0, values, 1.0), starts)
+            result[name] = np.where(factors == 1.0, 0.0, factors)
+        elif name in ('Volume', 'Dividends'):
+            result[name] = np.add.reduceat(np.nan_to_num(values), starts)
+        else:
+            result[name] = values[ends]
+
+    frame = pd.DataFrame(result, index=hist.index[starts], columns=hist.columns)
+    if 'Volume' in frame and hist['Volume'].dtype.kind in 'iu':
+        frame['Volume'] = frame['Volume'].astype(hist['Volume'].dtype)
+    return frame
+
+
+def parse_date(value):
+    """Дата из запроса: None или Timestamp (ValueError при неверном формате)"""
+    if value is None or value == '':
+        return None
+    try:
+        return pd.Timestamp(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date: {value}")
+
+
+def _localize(moment, tz):
+    moment = pd.Timestamp(moment)
+    if tz is None:
+        return moment.tz_localize(None) if moment.tz is not None else moment
+    return moment.tz_localize(tz) if moment.tz is None else moment.tz_convert(tz)
+
+
+def _period_start(period, tz):
+    """Начало периода по местному времени биржи"""
+    now = pd.Timestamp.now(tz=tz).normalize()
+    if period == 'ytd':
+        return now.replace(month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unknown period: {period}")
+    return now - PERIOD_OFFSETS[period]
@@ -0,0 +1,129 @@
+# http_cache.py
+import os
+import gzip
+import hashlib
+import logging
+
+# Необязательная зависимость: без brotli ответы сжимаются только gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера не сжимаются (выигрыш меньше накладных расходов)
+COMPRESS_MIN_BYTES = int(os.environ.get('YF_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('YF_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('YF_BROTLI_QUALITY', 5))
+
+# Типы, которые имеет смысл сжимать (parquet сжат внутри себя)
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/msgpack',
+    'application/vnd.apache.arrow.stream',
+    'text/plain',
+    'text/html'
+}
+
+# Методы, ответы на которые можно отдавать из общих кэшей (ответ POST зависит от тела запроса)
+PUBLIC_METHODS = ('GET', 'HEAD')
+
+# Суффикс ETag для сжатого представления (разные байты - разные сильные ETag)
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gzip"}
+
+
+def etag(body):
+    """Сильный ETag (без кавычек) по байтам несжатого представления"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def encodings():
+    """Поддерживаемые сжатия в порядке предпочтения сервера"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate(accept_encodings):
+    """Сжатие по Accept-Encoding (werkzeug Accept) или None"""
+    return accept_encodings.best_match(encodings())
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unknown content encoding: {encoding}")
+
+
+def matches(if_none_match, tag):
+    """
+    Совпадает ли If-None-Match с ETag представления
+
+    Сравнение слабое (RFC 9110, 13.1.2): W/ и суффикс сжатия игнорируются -
+    клиенту, у которого есть gzip-версия, не нужна и несжатая.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.star_tag:
+        return True
+    for candidate in if_none_match.as_set(include_weak=True):
+        for suffix in ENCODING_SUFFIXES.values():
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+                break
+        if candidate == tag:
+            return True
+    return False
+
+
+def finalize(request, response, max_age=None):
+    """
+    Условный ответ и сжатие для успешного (200) не потокового ответа
+
+    ETag - из заголовка, если его уже выставил обработчик (например, по
+    версии данных без служебных полей), иначе по телу. При совпадении с
+    If-None-Match - 304 без тела для GET/HEAD и 412 для остальных методов
+    (RFC 9110, 13.1.2); иначе тело сжимается выбранным Accept-Encoding,
+    если оно не меньше COMPRESS_MIN_BYTES.
+
+    Cache-Control: public, max-age - только для GET/HEAD; ответ на POST
+    зависит от тела запроса, поэтому он private, no-cache. Клиент POST-
+    маршрута может прислать If-None-Match: 412 означает, что его копия
+    актуальна.
+
+    Args:
+        request: flask.request
+        response: Ответ Flask
+        max_age: Cache-Control max-age, секунды (None - без ETag и Cache-Control, только сжатие)
+    """
+    if response.status_code != 200:
+        # Ошибки и 503 с Retry-After не кэшируются
+        if max_age is not None:
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+    if response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    compressible = response.mimetype in COMPRESSIBLE_TYPES and len(body) >= COMPRESS_MIN_BYTES
+    encoding = negotiate(request.accept_encodings) if compressible else None
+    if compressible:
+        response.vary.add('Accept-Encoding')
+
+    if max_age is not None:
+        tag, _ = response.get_etag()
+        tag = tag or etag(body)
+        response.set_etag(tag + ENCODING_SUFFIXES[encoding] if encoding else tag)
+        response.headers['Cache-Control'] = (
+            f"public, max-age={int(max_age)}" if request.method in PUBLIC_METHODS else "private, no-cache"
+        )
+        if matches(request.if_none_match, tag):
+            response.status_code = 304 if request.method in PUBLIC_METHODS else 412
+            response.set_data(b'')
+            return response
+
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
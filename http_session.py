@@ -0,0 +1,141 @@
+# http_session.py
+import os
+import random
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import cassette
+from governor import governor
+
+logger = logging.getLogger(__name__)
+
+# Соединений keep-alive на хост (и число хостов в пуле)
+POOL_SIZE = int(os.environ.get('YF_HTTP_POOL_SIZE', 32))
+
+# Повторы при сетевых ошибках и ответах 5xx (429 обрабатывает governor)
+MAX_RETRIES = int(os.environ.get('YF_HTTP_RETRIES', 3))
+
+# Базовая задержка повтора в секундах (экспоненциальная, со случайным разбросом)
+BACKOFF_FACTOR = float(os.environ.get('YF_HTTP_BACKOFF', 0.5))
+BACKOFF_MAX = float(os.environ.get('YF_HTTP_BACKOFF_MAX', 10))
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36'
+
+_counters = {"requests": 0, "connections_opened": 0, "connections_reused": 0, "retries": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _report_throttle(response, *args, **kwargs):
+    """Хук ответа: 429 от Yahoo снижает скорость регулятора (единственный учет этого 429)"""
+    if response.status_code == 429:
+        retry_after = response.headers.get('Retry-After')
+        governor.on_throttle(float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+class JitteredRetry(Retry):
+    """Retry с "full jitter": задержка случайна в [0, backoff_factor * 2^n]"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, min(backoff, BACKOFF_MAX)) if backoff else 0
+
+    def increment(self, *args, **kwargs):
+        _count("retries")
+        return super().increment(*args, **kwargs)
+
+
+class _CountingPoolMixin:
+    """Считает, сколько раз соединение взято из пула живым, а сколько - открыто заново"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        _count("requests")
+        # У нового (или закрытого после разрыва) соединения ещё нет сокета
+        if getattr(conn, 'sock', None) is not None:
+            _count("connections_reused")
+        else:
+            _count("connections_opened")
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter с keep-alive пулом заданного размера и счетчиками соединений"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+
+def create_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """Новая сессия requests с пулом соединений и повторами с разбросом"""
+    retry = JitteredRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = PooledAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    session.hooks['response'].append(_report_throttle)
+    # YF_CASSETTE_MODE=record|replay - запись/воспроизведение ответов Yahoo
+    return cassette.install(session, adapter)
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Общая для процесса сессия: keep-alive соединения, cookie и crumb Yahoo
+    переиспользуются всеми yf.Ticker. После fork (новый pid) создается заново,
+    чтобы воркеры не делили сокеты.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = create_session()
+                _session_pid = pid
+                logger.info(f"HTTP session created: pool size {POOL_SIZE}, retries {MAX_RETRIES}")
+    return _session
+
+
+def stats():
+    """Счётчики соединений: сколько переиспользовано из пула, сколько открыто"""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["pool_size"] = POOL_SIZE
+    stats["reuse_ratio"] = round(stats["connections_reused"] / stats["requests"], 4) if stats["requests"] else None
+    return stats
@@ -0,0 +1,356 @@
+# indicators.py
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from section_cache import SectionCache
+from shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 100
+
+# Состояние индикаторов (для досчета новых баров) живет сутки
+STATE_TTL = 24 * 3600
+
+# Допустимое расхождение цены на последнем учтенном баре (иначе - полный пересчет)
+ADJUSTMENT_TOLERANCE = 1e-6
+
+state_cache = SectionCache(
+    max_entries=int(os.environ.get('YF_INDICATOR_CACHE_MAX_ENTRIES', 4096)),
+    default_ttl=STATE_TTL,
+    backend=shared_cache,
+    namespace='indicators'
+)
+
+
+def _ewm(values, alpha):
+    """Рекурсия y[t] = (1 - alpha) * y[t-1] + alpha * x[t], y[0] = x[0] (без NaN в начале)"""
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _wilder(values, period):
+    """
+    Сглаживание Уайлдера: первое значение - среднее первых period значений,
+    дальше - рекурсия с alpha = 1 / period (values без начального NaN)
+    """
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    result[period - 1:] = _ewm(seeded, 1 / period)
+    return result
+
+
+def _continue(last, values, alpha):
+    """Продолжить рекурсию _ewm от последнего значения last на новые values"""
+    if last is None or np.isnan(last):
+        return None
+    return _ewm(np.concatenate(([last], values)), alpha)[1:]
+
+
+class Indicator:
+    """
+    Индикатор: compute() по всему ряду и update() по новым барам.
+
+    update() получает lookback баров контекста (уже учтенных) и новые бары,
+    возвращает значения только для новых баров и новое состояние - так
+    новые бары досчитываются без пересчета всего окна.
+    """
+
+    name = None
+    lookback = 1
+
+    def __init__(self, *params):
+        self.params = params
+
+    @property
+    def key(self):
+        return f"{self.name}:{','.join(f'{p:g}' for p in self.params)}"
+
+    def columns(self):
+        return [self.label()]
+
+    def label(self, suffix=None):
+        base = '_'.join([self.name] + [f'{p:g}'.replace('.', '_') for p in self.params])
+        return f"{base}_{suffix}" if suffix else base
+
+    def compute(self, bars):
+        raise NotImplementedError
+
+    def update(self, state, context, bars):
+        raise NotImplementedError
+
+
+class SMA(Indicator):
+    name = 'sma'
+
+    def __init__(self, period=20):
+        super().__init__(int(period))
+        self.period = int(period)
+        self.lookback = max(self.period - 1, 1)
+
+    def compute(self, bars):
+        values = bars['Close'].rolling(self.period).mean().to_numpy()
+        return {self.label(): values}, {}
+
+    def update(self, state, context, bars):
+        closes = pd.concat([context['Close'], bars['Close']])
+        values = closes.rolling(self.period).mean().to_numpy()[len(context):]
+        return {self.label(): values}, state
+
+
+class EMA(Indicator):
+    name = 'ema'
+
+    def __init__(self, period=20):
+        super().__init__(int(period))
+        self.period = int(period)
+        self.alpha = 2 / (self.period + 1)
+
+    def compute(self, bars):
+        values = _ewm(bars['Close'].to_numpy(dtype=float), self.alpha)
+        return {self.label(): values}, {"ema": values[-1] if len(values) else None}
+
+    def update(self, state, context, bars):
+        values = _continue(state["ema"], bars['Close'].to_numpy(dtype=float), self.alpha)
+        return {self.label(): values}, {"ema": values[-1]}
+
+
+class RSI(Indicator):
+    name = 'rsi'
+
+    def __init__(self, period=14):
+        super().__init__(int(period))
+        self.period = int(period)
+
+    def compute(self, bars):
+        closes = bars['Close'].to_numpy(dtype=float)
+        delta = np.diff(closes)
+        gain = _wilder(np.clip(delta, 0, None), self.period)
+        loss = _wilder(np.clip(-delta, 0, None), self.period)
+        values = np.concatenate(([np.nan], self._rsi(gain, loss)))
+        state = {"gain": gain[-1], "loss": loss[-1]} if len(delta) else {"gain": None, "loss": None}
+        return {self.label(): values}, state
+
+    def update(self, state, context, bars):
+        closes = np.concatenate((context['Close'].to_numpy(dtype=float)[-1:], bars['Close'].to_numpy(dtype=float)))
+        delta = np.diff(closes)
+        gain = _continue(state["gain"], np.clip(delta, 0, None), 1 / self.period)
+        loss = _continue(state["loss"], np.clip(-delta, 0, None), 1 / self.period)
+        if gain is None or loss is None:
+            return None, state
+        return {self.label(): self._rsi(gain, loss)}, {"gain": gain[-1], "loss": loss[-1]}
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+
+class MACD(Indicator):
+    name = 'macd'
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__(int(fast), int(slow), int(signal))
+        self.alphas = tuple(2 / (int(p) + 1) for p in (fast, slow, signal))
+
+    def columns(self):
+        return [self.label('line'), self.label('signal'), self.label('hist')]
+
+    def compute(self, bars):
+        closes = bars['Close'].to_numpy(dtype=float)
+        fast = _ewm(closes, self.alphas[0])
+        slow = _ewm(closes, self.alphas[1])
+        line = fast - slow
+        signal = _ewm(line, self.alphas[2])
+        state = {"fast": fast[-1], "slow": slow[-1], "signal": signal[-1]} if len(closes) else {
+            "fast": None, "slow": None, "signal": None}
+        return self._outputs(line, signal), state
+
+    def update(self, state, context, bars):
+        closes = bars['Close'].to_numpy(dtype=float)
+        fast = _continue(state["fast"], closes, self.alphas[0])
+        slow = _continue(state["slow"], closes, self.alphas[1])
+        if fast is None or slow is None:
+            return None, state
+        line = fast - slow
+        signal = _continue(state["signal"], line, self.alphas[2])
+        return self._outputs(line, signal), {"fast": fast[-1], "slow": slow[-1], "signal": signal[-1]}
+
+    def _outputs(self, line, signal):
+        return {self.label('line'): line, self.label('signal'): signal, self.label('hist'): line - signal}
+
+
+class BollingerBands(Indicator):
+    name = 'bbands'
+
+    def __init__(self, period=20, width=2):
+        super().__init__(int(period), float(width))
+        self.period = int(period)
+        self.width = float(width)
+        self.lookback = max(self.period - 1, 1)
+
+    def columns(self):
+        return [self.label('middle'), self.label('upper'), self.label('lower')]
+
+    def compute(self, bars):
+        return self._bands(bars['Close']), {}
+
+    def update(self, state, context, bars):
+        outputs = self._bands(pd.concat([context['Close'], bars['Close']]))
+        return {name: values[len(context):] for name, values in outputs.items()}, state
+
+    def _bands(self, closes):
+        rolling = closes.rolling(self.period)
+        middle = rolling.mean().to_numpy()
+        std = rolling.std(ddof=0).to_numpy()
+        return {
+            self.label('middle'): middle,
+            self.label('upper'): middle + self.width * std,
+            self.label('lower'): middle - self.width * std
+        }
+
+
+class ATR(Indicator):
+    name = 'atr'
+
+    def __init__(self, period=14):
+        super().__init__(int(period))
+        self.period = int(period)
+
+    def compute(self, bars):
+        true_range = self._true_range(bars, bars['Close'].shift(1).to_numpy(dtype=float))
+        values = np.concatenate(([np.nan], _wilder(true_range[1:], self.period)))
+        return {self.label(): values}, {"atr": values[-1] if len(values) > 1 else None}
+
+    def update(self, state, context, bars):
+        previous = np.concatenate((context['Close'].to_numpy(dtype=float)[-1:], bars['Close'].to_numpy(dtype=float)[:-1]))
+        values = _continue(state["atr"], self._true_range(bars, previous), 1 / self.period)
+        if values is None:
+            return None, state
+        return {self.label(): values}, {"atr": values[-1]}
+
+    @staticmethod
+    def _true_range(bars, previous_close):
+        high = bars['High'].to_numpy(dtype=float)
+        low = bars['Low'].to_numpy(dtype=float)
+        return np.nanmax(np.vstack((high - low, np.abs(high - previous_close), np.abs(low - previous_close))), axis=0)
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, RSI, MACD, BollingerBands, ATR)}
+
+
+def parse(spec):
+    """
+    Индикатор из строки 'name' или 'name:p1,p2' (например 'sma:50', 'macd:12,26,9')
+
+    Raises:
+        ValueError: Неизвестный индикатор или неверные параметры
+    """
+    name, _, params = str(spec).strip().lower().partition(':')
+    if name not in INDICATORS:
+        raise ValueError(f"Unknown indicator: {name} (available: {', '.join(INDICATORS)})")
+    try:
+        values = [float(p) for p in params.split(',') if p.strip()]
+        indicator = INDICATORS[name](*values)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid parameters for {name}: {params}")
+    if any(p <= 0 for p in indicator.params):
+        raise ValueError(f"Invalid parameters for {name}: {params}")
+    return indicator
+
+
+def calculate(symbol, indicator, bars):
+    """
+    Значения индикатора для всех баров ряда
+
+    Значения EMA/RSI зависят от начала ряда, поэтому bars - всегда один и тот
+    же базовый ряд тикера (начало не сдвигается), а окно вырезается после.
+
+    Закрытые бары (все, кроме последнего) досчитываются от сохраненного
+    состояния; последний бар может меняться в течение дня, поэтому он
+    считается заново при каждом запросе и в состояние не попадает.
+    Если ранее учтенный бар изменился (пересчет цен после дивидендов или
+    сплита) - полный пересчет.
+    """
+    key = (symbol.upper(), indicator.key)
+    closed = bars.iloc[:-1]
+    entry = state_cache.get(key)
+    pos = _resume_position(entry, closed)
+
+    if pos is None:
+        outputs, state = indicator.compute(closed)
+        entry = _entry(closed, outputs, state)
+        state_cache.set(key, entry)
+    elif pos < len(closed) - 1:
+        outputs, state = _extend(indicator, entry, closed, pos)
+        if outputs is None:
+            outputs, state = indicator.compute(closed)
+        entry = _entry(closed, outputs, state)
+        state_cache.set(key, entry)
+
+    last, _ = indicator.update(entry["state"], _context(closed, len(closed) - 1, indicator), bars.iloc[-1:]) \
+        if len(closed) else (None, None)
+    if last is None:
+        # Ряд слишком короткий для досчета - считаем целиком
+        outputs, _ = indicator.compute(bars)
+        return pd.DataFrame(outputs, index=bars.index)
+
+    frame = pd.DataFrame(entry["outputs"], index=closed.index)
+    return pd.concat([frame, pd.DataFrame(last, index=bars.index[-1:])])
+
+
+def calculate_all(symbol, indicators, bars, window=DEFAULT_WINDOW):
+    """
+    Таблица значений индикаторов (колонки Indicator.columns()) по последним
+    window барам; считается весь базовый ряд, отдается только окно
+    """
+    if bars is None or bars.empty:
+        return pd.DataFrame(columns=[c for indicator in indicators for c in indicator.columns()])
+    frames = [calculate(symbol, indicator, bars) for indicator in indicators]
+    result = pd.concat(frames, axis=1)
+    return result.iloc[-window:] if window else result
+
+
+def _entry(closed, outputs, state):
+    return {
+        "outputs": {name: np.asarray(values, dtype=float) for name, values in outputs.items()},
+        "state": state,
+        "last_ts": closed.index[-1] if len(closed) else None,
+        "last_close": float(closed['Close'].iloc[-1]) if len(closed) else None,
+        "first_ts": closed.index[0] if len(closed) else None
+    }
+
+
+def _resume_position(entry, closed):
+    """Позиция последнего учтенного бара в closed или None (нужен полный пересчет)"""
+    if not entry or entry["last_ts"] is None or len(closed) == 0 or closed.index[0] != entry["first_ts"]:
+        return None
+    pos = closed.index.searchsorted(entry["last_ts"])
+    if pos >= len(closed) or closed.index[pos] != entry["last_ts"]:
+        return None
+    close = float(closed['Close'].iloc[pos])
+    if abs(close - entry["last_close"]) > ADJUSTMENT_TOLERANCE * max(abs(close), 1.0):
+        return None
+    return pos
+
+
+def _context(bars, pos, indicator):
+    """lookback уже учтенных баров, заканчивая позицией pos"""
+    return bars.iloc[max(0, pos - indicator.lookback + 1):pos + 1]
+
+
+def _extend(indicator, entry, closed, pos):
+    """Досчитать новые закрытые бары после позиции pos"""
+    new, state = indicator.update(entry["state"], _context(closed, pos, indicator), closed.iloc[pos + 1:])
+    if new is None:
+        return None, None
+    outputs = {
+        name: np.concatenate((values[:pos + 1], np.asarray(new[name], dtype=float)))
+        for name, values in entry["outputs"].items()
+    }
+    return outputs, state
@@ -0,0 +1,127 @@
+# json_provider.py
+import os
+import math
+import json
+import decimal
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import timed_serialization
+
+# Необязательная зависимость: без orjson - стандартный json с теми же правилами для NumPy/pandas
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 'orjson' (по умолчанию, если установлен) или 'default' - стандартный json
+PROVIDER = os.environ.get('YF_JSON_PROVIDER', 'orjson' if orjson is not None else 'default').lower()
+
+
+def default(value):
+    """
+    Значения, которые кодировщик не знает сам: Timestamp -> ISO-строка,
+    NaT/NA -> null, скаляры и массивы NumPy -> числа и списки
+    """
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, pd.Timedelta):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.floating):
+        value = value.item()
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON-провайдер Flask на orjson: скаляры и массивы NumPy кодируются без
+    преобразования в объекты Python, NaN/inf -> null, datetime -> ISO 8601
+    """
+
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def _options(self):
+        return self.OPTIONS | orjson.OPT_SORT_KEYS if self.sort_keys else self.OPTIONS
+
+    @timed_serialization('json')
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=default, option=self._options())
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Байты orjson уходят в ответ без промежуточной str
+        return self._app.response_class(self.dumps_bytes(self._prepare_response_obj(args, kwargs)),
+                                        mimetype=self.mimetype)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """
+    Стандартный json с теми же правилами (NumPy, Timestamp, NaN -> null) - если orjson нет
+
+    Кодирование идет с allow_nan=False: payload без NaN/inf (обычный случай)
+    кодируется за один проход, и только на ValueError payload обходится
+    целиком с заменой NaN/inf на None.
+    """
+
+    @timed_serialization('json')
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("default", default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        kwargs["allow_nan"] = False
+        try:
+            return json.dumps(obj, **kwargs)
+        except ValueError:
+            return json.dumps(_finite(obj), **kwargs)
+
+
+def _finite(obj):
+    """NaN/inf -> None (стандартный json пишет их как NaN, что не является JSON)"""
+    kind = type(obj)
+    if kind is dict:
+        return {key: value if type(value) in _PLAIN else _finite(value) for key, value in obj.items()}
+    if kind is list or kind is tuple:
+        return [value if type(value) in _PLAIN else _finite(value) for value in obj]
+    if isinstance(obj, (float, np.floating)):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == 'f':
+        return _finite(obj.tolist())
+    return obj
+
+
+# Типы, которые _finite не нужно проверять
+_PLAIN = {str, int, bool, type(None)}
+
+
+def provider_class(name=PROVIDER):
+    """Класс JSON-провайдера для app.json_provider_class"""
+    if name == 'orjson':
+        if orjson is None:
+            logger.warning("YF_JSON_PROVIDER=orjson, but orjson is not installed; using the standard json")
+            return NumpyJSONProvider
+        return OrjsonProvider
+    if name != 'default':
+        raise ValueError(f"Unknown YF_JSON_PROVIDER: {name}")
+    return NumpyJSONProvider
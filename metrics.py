@@ -0,0 +1,110 @@
+# metrics.py
+import os
+import time
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Необязательная зависимость: без prometheus_client метрики не собираются, /metrics - 503
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, CollectorRegistry, multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Несколько процессов (gunicorn): значения пишутся в mmap-файлы этого каталога
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SERIALIZATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+ENABLED = prometheus_client is not None
+
+if ENABLED:
+    REQUEST_LATENCY = Histogram(
+        'yf_http_request_duration_seconds', 'HTTP request latency by route',
+        ['route', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    SECTION_LATENCY = Histogram(
+        'yf_section_duration_seconds', 'get_ticker_info section latency (including cache)',
+        ['section'], buckets=LATENCY_BUCKETS
+    )
+    UPSTREAM_LATENCY = Histogram(
+        'yf_upstream_call_duration_seconds', 'Upstream (Yahoo) call latency by resource',
+        ['resource'], buckets=LATENCY_BUCKETS
+    )
+    UPSTREAM_ERRORS = Counter(
+        'yf_upstream_errors_total', 'Failed upstream calls by resource and error type',
+        ['resource', 'error']
+    )
+    CACHE_LOOKUPS = Counter(
+        'yf_cache_lookups_total', 'Cache lookups by cache and result (hit, stale, shared, miss)',
+        ['cache', 'result']
+    )
+    SERIALIZATION_LATENCY = Histogram(
+        'yf_serialization_duration_seconds', 'Time spent converting data frames to response structures',
+        ['kind'], buckets=SERIALIZATION_BUCKETS
+    )
+
+
+def observe_request(route, method, status, seconds):
+    if ENABLED:
+        REQUEST_LATENCY.labels(route, method, str(status)).observe(seconds)
+
+
+def observe_section(section, seconds):
+    if ENABLED:
+        SECTION_LATENCY.labels(section).observe(seconds)
+
+
+def observe_upstream(resource, seconds, error=None):
+    if ENABLED:
+        UPSTREAM_LATENCY.labels(resource).observe(seconds)
+        if error is not None:
+            UPSTREAM_ERRORS.labels(resource, type(error).__name__).inc()
+
+
+def cache_lookup(cache, result):
+    if ENABLED:
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def timed_serialization(kind):
+    """Декоратор: время функции сериализации в yf_serialization_duration_seconds{kind}"""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        histogram = SERIALIZATION_LATENCY.labels(kind)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def render():
+    """
+    Текст метрик в формате Prometheus и его Content-Type
+
+    В многопроцессном режиме (PROMETHEUS_MULTIPROC_DIR) собираются
+    значения всех воркеров, иначе - текущего процесса.
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Для хука gunicorn child_exit: убрать live-метрики завершившегося воркера"""
+    if ENABLED and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
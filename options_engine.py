@@ -0,0 +1,157 @@
+# options_engine.py
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+import upstream
+import profiling
+from section_cache import SectionCache
+from shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Параллельная загрузка дат экспирации (общий пул процесса)
+OPTION_WORKERS = int(os.environ.get('YF_OPTION_WORKERS', 8))
+
+# TTL цепочки одной даты экспирации и списка дат, секунды
+CHAIN_TTL = int(os.environ.get('YF_OPTION_CHAIN_TTL', 60))
+EXPIRATIONS_TTL = 300
+
+# Предел ожидания всех цепочек: что не успело - в errors, ответ не ждет дольше
+CHAIN_TIMEOUT = float(os.environ.get('YF_OPTION_TIMEOUT', 20))
+
+# Максимум дат экспирации в одном запросе
+MAX_EXPIRATIONS = int(os.environ.get('YF_OPTION_MAX_EXPIRATIONS', 40))
+
+CONTRACT_TYPES = ('calls', 'puts')
+
+OPTION_EXECUTOR = ThreadPoolExecutor(max_workers=OPTION_WORKERS, thread_name_prefix='yf-options')
+
+chain_cache = SectionCache(
+    max_entries=int(os.environ.get('YF_OPTION_CACHE_MAX_ENTRIES', 512)),
+    max_bytes=int(os.environ.get('YF_OPTION_CACHE_MAX_BYTES', 128 * 1024 * 1024)),
+    default_ttl=CHAIN_TTL,
+    backend=shared_cache,
+    namespace='option_chain'
+)
+
+
+def expirations(ticker):
+    """Даты экспирации тикера (YYYY-MM-DD), от ближайшей"""
+    symbol = ticker.ticker
+    return upstream.cached_call(symbol, 'options', (), lambda: tuple(ticker.options), ttl=EXPIRATIONS_TTL)
+
+
+def select_expirations(available, requested=None, expiry_from=None, expiry_to=None, limit=None):
+    """
+    Выбрать даты экспирации: явный список, диапазон дат и/или первые limit
+
+    Raises:
+        ValueError: Запрошены даты, которых нет у тикера
+    """
+    if requested:
+        unknown = [date for date in requested if date not in available]
+        if unknown:
+            raise ValueError(f"Unknown expirations: {', '.join(unknown)}")
+        selected = [date for date in available if date in requested]
+    else:
+        selected = list(available)
+    if expiry_from:
+        selected = [date for date in selected if date >= expiry_from]
+    if expiry_to:
+        selected = [date for date in selected if date <= expiry_to]
+    return selected[:min(limit or MAX_EXPIRATIONS, MAX_EXPIRATIONS)]
+
+
+def load_chain(ticker, expiry):
+    """
+    Цепочка одной даты экспирации одной таблицей (колонка type - calls/puts)
+    через кэш; цена базового актива - в attrs["underlying_price"]
+    """
+    symbol = ticker.ticker.upper()
+    return chain_cache.get_or_load(
+        (symbol, expiry),
+        lambda: _fetch_chain(ticker, expiry),
+        ttl=CHAIN_TTL,
+        refresh=lambda: _fetch_chain(upstream.ticker(symbol), expiry),
+        store_if=lambda chain: chain is not None
+    )
+
+
+def _fetch_chain(ticker, expiry):
+    chain = upstream.call(ticker.ticker, 'option_chain', (expiry,), lambda: ticker.option_chain(expiry))
+    parts = []
+    for kind in CONTRACT_TYPES:
+        side = getattr(chain, kind, None)
+        if side is not None and not side.empty:
+            parts.append(side.assign(type=kind))
+    frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['strike', 'openInterest', 'type'])
+
+    underlying = getattr(chain, 'underlying', None) or {}
+    frame.attrs["underlying_price"] = underlying.get('regularMarketPrice')
+    return frame
+
+
+def fetch_chains(ticker, dates, timeout=CHAIN_TIMEOUT):
+    """
+    Цепочки нескольких дат параллельно в OPTION_EXECUTOR
+
+    Returns:
+        ({дата: DataFrame}, {дата: текст ошибки}) - даты, не загруженные
+        за timeout секунд, попадают в ошибки
+    """
+    futures = {OPTION_EXECUTOR.submit(profiling.bind(load_chain), ticker, date): date for date in dates}
+    done, pending = wait(futures, timeout=timeout)
+
+    chains, errors = {}, {}
+    for future in done:
+        date = futures[future]
+        try:
+            chains[date] = future.result()
+        except Exception as e:
+            logger.error(f"Error fetching option chain {ticker.ticker} {date}: {str(e)}")
+            errors[date] = str(e)
+    for future in pending:
+        future.cancel()
+        errors[futures[future]] = f"Timed out after {timeout}s"
+    return chains, errors
+
+
+def filter_chain(chain, spot=None, contract_type=None, strike_min=None, strike_max=None,
+                 moneyness_min=None, moneyness_max=None, min_open_interest=None):
+    """
+    Отфильтровать цепочку одной маской (до сериализации)
+
+    Args:
+        chain: Таблица из load_chain
+        spot: Цена базового актива для moneyness (strike / spot)
+        contract_type: 'calls', 'puts' или None (обе стороны)
+        strike_min, strike_max: Диапазон страйков
+        moneyness_min, moneyness_max: Диапазон strike / spot
+        min_open_interest: Минимальный открытый интерес (NaN считается нулем)
+    """
+    strikes = chain['strike'].to_numpy(dtype=float)
+    mask = np.ones(len(chain), dtype=bool)
+
+    if contract_type:
+        mask &= (chain['type'] == contract_type).to_numpy()
+    if strike_min is not None:
+        mask &= strikes >= strike_min
+    if strike_max is not None:
+        mask &= strikes <= strike_max
+    if (moneyness_min is not None or moneyness_max is not None) and spot:
+        moneyness = strikes / spot
+        if moneyness_min is not None:
+            mask &= moneyness >= moneyness_min
+        if moneyness_max is not None:
+            mask &= moneyness <= moneyness_max
+    if min_open_interest is not None and 'openInterest' in chain.columns:
+        mask &= np.nan_to_num(chain['openInterest'].to_numpy(dtype=float)) >= min_open_interest
+
+    result = chain[mask]
+    if spot:
+        result = result.assign(moneyness=np.round(result['strike'].to_numpy(dtype=float) / spot, 4))
+    return result
@@ -0,0 +1,272 @@
+# prewarm.py
+import os
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+from governor import governor, UpstreamGovernor, UpstreamBusy, is_throttle_error
+
+# Необязательно: без fcntl (Windows) каждый процесс прогревает сам
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Список прогрева: тикеры через запятую и/или файл (по тикеру на строку, # - комментарий)
+WATCHLIST = os.environ.get('YF_PREWARM_SYMBOLS', '')
+WATCHLIST_FILE = os.environ.get('YF_PREWARM_FILE', '')
+
+# Периодичность по ресурсам, секунды: котировки (только в торговые часы), история, отчеты
+QUOTES_INTERVAL = float(os.environ.get('YF_PREWARM_QUOTES_INTERVAL', 30))
+HISTORY_INTERVAL = float(os.environ.get('YF_PREWARM_HISTORY_INTERVAL', 24 * 3600))
+FINANCIALS_INTERVAL = float(os.environ.get('YF_PREWARM_FINANCIALS_INTERVAL', 7 * 24 * 3600))
+
+# Бюджет прогрева: запросов в секунду, всплеск и одновременные запросы
+RATE = float(os.environ.get('YF_PREWARM_RATE', 2))
+BURST = int(os.environ.get('YF_PREWARM_BURST', 5))
+WORKERS = int(os.environ.get('YF_PREWARM_WORKERS', 2))
+
+# Доля токенов общего регулятора, которую прогрев оставляет живым запросам
+RESERVE = float(os.environ.get('YF_PREWARM_RESERVE', 0.25))
+
+# Период полураспада счетчика запросов тикера (приоритет прогрева)
+HALF_LIFE = float(os.environ.get('YF_PREWARM_HALF_LIFE', 3600))
+
+# Прогрев ведет один процесс из нескольких воркеров - владелец этого файла-блокировки
+LOCK_PATH = os.environ.get('YF_PREWARM_LOCK', os.path.join('data', 'prewarm.lock'))
+
+# Торговая сессия (NYSE, без учета праздников) и за сколько минут до открытия начинать
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = (9, 30)
+MARKET_CLOSE = (16, 0)
+MARKET_LEAD = timedelta(minutes=int(os.environ.get('YF_PREWARM_LEAD_MINUTES', 5)))
+
+# Шаг планировщика и пауза перед повтором после ошибки, секунды
+TICK = 1.0
+RETRY_DELAY = 60.0
+
+
+def load_watchlist(symbols=WATCHLIST, path=WATCHLIST_FILE):
+    """Тикеры из YF_PREWARM_SYMBOLS и YF_PREWARM_FILE без повторов, в верхнем регистре"""
+    items = symbols.split(',') if symbols else []
+    if path:
+        try:
+            with open(path) as f:
+                items += [line.split('#', 1)[0] for line in f]
+        except FileNotFoundError:
+            logger.warning(f"Prewarm watchlist file not found: {path}")
+    return list(dict.fromkeys(item.strip().upper() for item in items if item.strip()))
+
+
+def market_hours(now=None):
+    """Идет ли торговая сессия (с запасом MARKET_LEAD до открытия)"""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    opens = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0) - MARKET_LEAD
+    closes = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+    return opens <= now < closes
+
+
+class _Task:
+    def __init__(self, name, interval, fn, market_only):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.market_only = market_only
+
+
+class PrewarmScheduler:
+    """
+    Фоновый прогрев кэшей для списка тикеров.
+
+    Задачи (ресурс, периодичность, функция прогрева одного тикера)
+    регистрирует сервер: функции пишут в те же кэши, что читают эндпоинты.
+    На каждом шаге из просроченных пар (задача, тикер) первыми идут самые
+    запрашиваемые тикеры (счетчик запросов с экспоненциальным затуханием);
+    запуск ограничен собственным бюджетом (token bucket) и откладывается,
+    пока общему регулятору upstream не хватает запаса для живых запросов.
+
+    Прогрев ведет один процесс (лидер, см. _is_leader), поэтому функции
+    прогрева должны писать в общие для воркеров хранилища: shared_cache
+    (info, отчеты, базовый ряд истории) и price_store (дневные бары) - а не
+    только в память процесса-лидера.
+    """
+
+    def __init__(self, symbols, rate=RATE, burst=BURST, workers=WORKERS, half_life=HALF_LIFE):
+        self.symbols = list(symbols)
+        self.half_life = half_life
+        self.budget = UpstreamGovernor(rate=rate, burst=burst, max_in_flight=workers, min_rate=rate / 10)
+        self._watched = set(self.symbols)
+        self._tasks = []
+        self._due = {}
+        self._running = set()
+        self._scores = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yf-prewarm')
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+        self._counters = {"refreshed": 0, "errors": 0, "deferred": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.symbols)
+
+    def add(self, name, interval, fn, market_only=False):
+        """Зарегистрировать задачу: fn(symbol) раз в interval секунд (market_only - только в торговые часы)"""
+        self._tasks.append(_Task(name, interval, fn, market_only))
+
+    def record(self, symbols):
+        """Учесть запрос к тикерам (приоритет прогрева)"""
+        now = time.monotonic()
+        with self._lock:
+            for symbol in symbols:
+                symbol = str(symbol).strip().upper()
+                if symbol not in self._watched:
+                    continue
+                score, updated = self._scores.get(symbol, (0.0, now))
+                self._scores[symbol] = (self._decay(score, now - updated) + 1, now)
+
+    def score(self, symbol, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            score, updated = self._scores.get(symbol, (0.0, now))
+        return self._decay(score, now - updated)
+
+    def _decay(self, score, elapsed):
+        return score * math.exp(-math.log(2) * elapsed / self.half_life) if self.half_life else score
+
+    def start(self):
+        """Запустить фоновый поток (в каждом процессе - один раз; только если список не пуст)
+
+        Вызывается не при импорте, а при старте сервера (post_fork в gunicorn,
+        lifespan в ASGI, первый запрос во Flask) - после fork поток должен
+        создаваться заново в каждом воркере.
+        """
+        with self._lock:
+            if not self.enabled or not self._tasks or self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='yf-prewarm-scheduler', daemon=True)
+            self._thread.start()
+        logger.info(f"Prewarm scheduler started: {len(self.symbols)} symbols, "
+                    f"tasks {[task.name for task in self._tasks]}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    def _loop(self):
+        while not self._stop.wait(TICK):
+            if not self._is_leader():
+                continue
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Prewarm tick failed: {str(e)}")
+
+    def run_pending(self, now=None, market_open=None):
+        """Один шаг: запустить просроченные задачи в порядке приоритета; вернуть число запущенных"""
+        now = time.monotonic() if now is None else now
+        market_open = market_hours() if market_open is None else market_open
+
+        with self._lock:
+            pending = [
+                (task, symbol) for task in self._tasks if market_open or not task.market_only
+                for symbol in self.symbols
+                if (task.name, symbol) not in self._running and self._due.get((task.name, symbol), 0) <= now
+            ]
+        if not pending:
+            return 0
+        pending.sort(key=lambda item: (-self.score(item[1], now), self._due.get((item[0].name, item[1]), 0)))
+
+        started = 0
+        for task, symbol in pending:
+            if not self._headroom():
+                with self._lock:
+                    self._counters["deferred"] += 1
+                break
+            try:
+                self.budget.acquire(timeout=0)
+            except UpstreamBusy:
+                break
+            with self._lock:
+                self._running.add((task.name, symbol))
+            self._executor.submit(self._run, task, symbol)
+            started += 1
+        return started
+
+    def _run(self, task, symbol):
+        throttled = False
+        result = "refreshed"
+        try:
+            task.fn(symbol)
+            delay = task.interval
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            delay = min(task.interval, RETRY_DELAY)
+            result = "errors"
+            logger.warning(f"Prewarm {task.name} for {symbol} failed: {str(e)}")
+        finally:
+            self.budget.release(throttled)
+        with self._lock:
+            self._counters[result] += 1
+            self._due[(task.name, symbol)] = time.monotonic() + delay
+            self._running.discard((task.name, symbol))
+
+    @staticmethod
+    def _headroom():
+        """У общего регулятора есть запас для живых запросов (нет паузы после 429, свободны слоты и токены)"""
+        stats = governor.stats()
+        return (stats["blocked_for"] == 0
+                and stats["in_flight"] < max(1, stats["max_in_flight"] // 2)
+                and stats["tokens"] >= 1 + governor.burst * RESERVE)
+
+    def _is_leader(self):
+        """Владеет ли процесс блокировкой прогрева (остальные воркеры пробуют на каждом шаге)"""
+        if fcntl is None or self._lock_file is not None:
+            return True
+        directory = os.path.dirname(LOCK_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(LOCK_PATH, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Prewarm leader: pid {os.getpid()}")
+        return True
+
+    def stats(self):
+        market_open = market_hours()
+        with self._lock:
+            now = time.monotonic()
+            due = sum(1 for task in self._tasks if market_open or not task.market_only for symbol in self.symbols
+                      if self._due.get((task.name, symbol), 0) <= now)
+            stats = dict(self._counters)
+            stats.update({
+                "symbols": len(self.symbols),
+                "tasks": [task.name for task in self._tasks],
+                "running": len(self._running),
+                "due": due,
+                "leader": self._lock_file is not None or (fcntl is None and self._pid is not None),
+                "market_hours": market_open,
+                "budget": self.budget.stats()
+            })
+        return stats
+
+
+scheduler = PrewarmScheduler(load_watchlist())
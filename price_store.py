@@ -0,0 +1,371 @@
+# price_store.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Интервалы, которые хранятся локально (внутридневные бары всегда качаются заново)
+STORE_INTERVALS = ('1d',)
+
+# Периоды в днях календаря; 'Nd' - последние N баров
+PERIOD_OFFSETS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+PERIOD_BARS = {'1d': 1, '5d': 5}
+
+# Колонки ticker.history() и соответствующие колонки таблицы
+BAR_COLUMNS = (
+    ('Open', 'open'),
+    ('High', 'high'),
+    ('Low', 'low'),
+    ('Close', 'close'),
+    ('Volume', 'volume'),
+    ('Dividends', 'dividends'),
+    ('Stock Splits', 'splits')
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    volume INTEGER, dividends REAL, splits REAL,
+    PRIMARY KEY (symbol, interval, ts)
+);
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    tz TEXT,
+    covered_from INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (symbol, interval)
+);
+'''
+
+# Допустимое относительное расхождение цены закрытия на контрольном баре
+ADJUSTMENT_TOLERANCE = 1e-4
+
+
+class PriceStore:
+    """
+    Локальное хранилище дневных OHLCV-баров в SQLite.
+
+    Первый запрос по тикеру скачивает весь период, последующие - только
+    хвост начиная с предпоследнего сохранённого бара, а более длинный
+    период - только недостающее начало ряда. Если на контрольном
+    баре цена разошлась или появились новые дивиденды/сплиты (цены
+    с auto_adjust пересчитаны), ряд целиком скачивается заново.
+
+    Загрузка, запись и чтение одного ряда (symbol, interval) в процессе идут
+    под его блокировкой; скачанные бары сливаются с сохранёнными, и
+    ряд заменяется целиком только при пересчете цен - поэтому более короткая
+    загрузка (в том числе из другого процесса) не срезает более длинную.
+
+    Файл и схема создаются при первом обращении, а не в конструкторе.
+    """
+
+    def __init__(self, path, refresh_interval=60):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._series_locks = {}
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def history(self, ticker, period='1mo', interval='1d'):
+        """
+        Аналог ticker.history(period=..., interval=...) с локальным хранилищем
+
+        Args:
+            ticker: yf.Ticker
+            period: Период (1d, 5d, 1mo, ..., 10y, ytd, max)
+            interval: Интервал баров; не из STORE_INTERVALS - без хранилища
+        """
+        if interval not in STORE_INTERVALS or not self._supported_period(period):
+            return ticker.history(period=period, interval=interval)
+
+        symbol = ticker.ticker.upper()
+        start = self._period_start(period)
+        with self._series_lock(symbol, interval):
+            meta = self._load_meta(symbol, interval)
+
+            if meta is None:
+                self._full_fetch(ticker, symbol, interval, start, period=period)
+            else:
+                stale = time.time() - meta["updated_at"] > self.refresh_interval
+                if start < meta["covered_from"]:
+                    self._head_fetch(ticker, symbol, interval, start, meta)
+                    meta = self._load_meta(symbol, interval)
+                if stale:
+                    self._delta_fetch(ticker, symbol, interval, meta)
+
+            hist = self.read(symbol, interval, start)
+        if period in PERIOD_BARS:
+            return hist.tail(PERIOD_BARS[period])
+        return hist
+
+    def read(self, symbol, interval='1d', start=0):
+        """Сохранённые бары начиная с start (unix-время, UTC)"""
+        meta = self._load_meta(symbol, interval)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT ts, open, high, low, close, volume, dividends, splits FROM bars '
+                'WHERE symbol = ? AND interval = ? AND ts >= ? ORDER BY ts',
+                (symbol, interval, int(start))
+            ).fetchall()
+
+        values = np.array(rows, dtype=float).reshape(-1, len(BAR_COLUMNS) + 1)
+        index = pd.to_datetime(values[:, 0].astype(np.int64), unit='s', utc=True)
+        if meta and meta["tz"]:
+            index = index.tz_convert(meta["tz"])
+        hist = pd.DataFrame(values[:, 1:], index=index, columns=[name for name, _ in BAR_COLUMNS])
+        if not hist['Volume'].isna().any():
+            hist['Volume'] = hist['Volume'].astype(np.int64)
+        hist.index.name = 'Date'
+        return hist
+
+    def invalidate(self, symbol, interval='1d'):
+        """Удалить сохранённый ряд (следующий запрос скачает его целиком)"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM bars WHERE symbol = ? AND interval = ?', (symbol, interval))
+            conn.execute('DELETE FROM series WHERE symbol = ? AND interval = ?', (symbol, interval))
+
+    def _series_lock(self, symbol, interval):
+        with self._lock:
+            return self._series_locks.setdefault((symbol, interval), threading.Lock())
+
+    def _full_fetch(self, ticker, symbol, interval, start, period=None, tz=None, replace=False):
+        """Скачать весь ряд (по периоду или с даты start); replace - заменить сохранённый, иначе слить"""
+        if period is not None:
+            hist = ticker.history(period=period, interval=interval)
+        else:
+            hist = ticker.history(start=self._local_date(start, tz), interval=interval)
+
+        if hist is None or hist.empty:
+            return
+        logger.info(f"Price store: full fetch of {symbol} {interval}, {len(hist)} bars")
+        covered_from = min(start, int(self._timestamps(hist.index)[0]))
+        self._write(symbol, interval, hist, covered_from, replace=replace)
+
+    def _head_fetch(self, ticker, symbol, interval, start, meta):
+        """Докачать начало ряда (запрошен период длиннее сохранённого), не качая заново всё остальное"""
+        with closing(self._connect()) as conn:
+            first = conn.execute(
+                'SELECT ts, close FROM bars WHERE symbol = ? AND interval = ? ORDER BY ts LIMIT 1',
+                (symbol, interval)
+            ).fetchone()
+
+        # 'max': где начинается история, заранее неизвестно
+        if first is None or start == 0:
+            self._full_fetch(ticker, symbol, interval, start, period='max' if start == 0 else None, tz=meta["tz"])
+            return
+
+        # До первого сохранённого бара включительно - он контрольный
+        first_ts, first_close = first
+        head = ticker.history(
+            start=self._local_date(start, meta["tz"]),
+            end=self._local_date(first_ts + 86400, meta["tz"]),
+            interval=interval
+        )
+        if head is None or head.empty:
+            self._cover(symbol, interval, start)
+            return
+
+        matches = np.flatnonzero(self._timestamps(head.index) == first_ts)
+        if len(matches) > 0:
+            close = float(head['Close'].iloc[matches[0]])
+            if abs(close - first_close) > ADJUSTMENT_TOLERANCE * max(abs(first_close), 1.0):
+                logger.info(f"Price store: adjustment detected for {symbol} {interval}, refetching")
+                self._full_fetch(ticker, symbol, interval, start, tz=meta["tz"], replace=True)
+                return
+
+        logger.info(f"Price store: head fetch of {symbol} {interval}, {len(head)} bars")
+        self._write(symbol, interval, head, start)
+
+    def _delta_fetch(self, ticker, symbol, interval, meta):
+        """Докачать хвост ряда; при пересчете цен - скачать ряд заново"""
+        with closing(self._connect()) as conn:
+            anchors = conn.execute(
+                'SELECT ts, close, dividends, splits FROM bars WHERE symbol = ? AND interval = ? '
+                'ORDER BY ts DESC LIMIT 2',
+                (symbol, interval)
+            ).fetchall()
+
+        if not anchors:
+            self._full_fetch(ticker, symbol, interval, meta["covered_from"], tz=meta["tz"])
+            return
+
+        # Последний бар может быть незакрытым, поэтому сверяемся с предпоследним
+        anchor_ts, anchor_close, _, _ = anchors[-1]
+        delta = ticker.history(start=self._local_date(anchor_ts, meta["tz"]), interval=interval)
+        if delta is None or delta.empty:
+            self._touch(symbol, interval)
+            return
+
+        if self._adjusted_since(delta, anchor_ts, anchor_close, anchors):
+            logger.info(f"Price store: adjustment detected for {symbol} {interval}, refetching")
+            self._full_fetch(
+                ticker, symbol, interval, meta["covered_from"],
+                period='max' if meta["covered_from"] == 0 else None,
+                tz=meta["tz"],
+                replace=True
+            )
+            return
+
+        self._write(symbol, interval, delta, meta["covered_from"])
+
+    def _adjusted_since(self, delta, anchor_ts, anchor_close, anchors):
+        """Изменились ли исторические (скорректированные) цены с момента сохранения"""
+        timestamps = self._timestamps(delta.index)
+        matches = np.flatnonzero(timestamps == anchor_ts)
+        if len(matches) == 0:
+            return True
+
+        close = float(delta['Close'].iloc[matches[0]])
+        if abs(close - anchor_close) > ADJUSTMENT_TOLERANCE * max(abs(anchor_close), 1.0):
+            return True
+
+        # Новые дивиденды/сплиты на барах, которых ещё не было в хранилище
+        stored_actions = {ts: (dividends or 0.0, splits or 0.0) for ts, _, dividends, splits in anchors}
+        dividends = delta['Dividends'].to_numpy(dtype=float) if 'Dividends' in delta.columns else np.zeros(len(delta))
+        splits = delta['Stock Splits'].to_numpy(dtype=float) if 'Stock Splits' in delta.columns else np.zeros(len(delta))
+        for pos in np.flatnonzero((dividends != 0) | (splits != 0)):
+            if stored_actions.get(int(timestamps[pos])) != (dividends[pos], splits[pos]):
+                return True
+        return False
+
+    def _write(self, symbol, interval, hist, covered_from, replace=False):
+        timestamps = self._timestamps(hist.index)
+        columns = [
+            hist[name].to_numpy(dtype=float) if name in hist.columns else np.zeros(len(hist))
+            for name, _ in BAR_COLUMNS
+        ]
+        rows = [
+            (symbol, interval, int(ts), o, h, l, c, int(v) if v == v else None, d, s)
+            for ts, o, h, l, c, v, d, s in zip(timestamps, *(col.tolist() for col in columns))
+        ]
+        tz = str(hist.index.tz) if hist.index.tz is not None else None
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            if replace:
+                conn.execute('DELETE FROM bars WHERE symbol = ? AND interval = ?', (symbol, interval))
+            conn.executemany(
+                'INSERT OR REPLACE INTO bars (symbol, interval, ts, open, high, low, close, volume, dividends, splits) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            # При слиянии ряд покрывает и сохранённое ранее начало (covered_from - минимум)
+            conn.execute(
+                'INSERT INTO series (symbol, interval, tz, covered_from, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (symbol, interval) DO UPDATE SET tz = excluded.tz, updated_at = excluded.updated_at, '
+                'covered_from = ' + ('excluded.covered_from' if replace else 'MIN(covered_from, excluded.covered_from)'),
+                (symbol, interval, tz, int(covered_from), time.time())
+            )
+
+    def _cover(self, symbol, interval, start):
+        """Отметить, что ряд покрывает период с start (баров раньше нет)"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE series SET covered_from = MIN(covered_from, ?) WHERE symbol = ? AND interval = ?',
+                (int(start), symbol, interval)
+            )
+
+    def _touch(self, symbol, interval):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'UPDATE series SET updated_at = ? WHERE symbol = ? AND interval = ?',
+                (time.time(), symbol, interval)
+            )
+
+    def _load_meta(self, symbol, interval):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT tz, covered_from, updated_at FROM series WHERE symbol = ? AND interval = ?',
+                (symbol, interval)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"tz": row[0], "covered_from": row[1], "updated_at": row[2]}
+
+    def _connect(self):
+        self._ensure_schema()
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _ensure_schema(self):
+        """Каталог, файл и таблицы - один раз на процесс, при первом соединении"""
+        if self._ready:
+            return
+        with self._schema_lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+                conn.executescript(SCHEMA)
+            self._ready = True
+
+    @staticmethod
+    def _supported_period(period):
+        return period in PERIOD_OFFSETS or period in PERIOD_BARS or period in ('ytd', 'max')
+
+    @staticmethod
+    def _period_start(period):
+        """Начало периода (unix-время); для 'Nd' - с запасом на выходные"""
+        now = pd.Timestamp.now(tz='UTC').normalize()
+        if period == 'max':
+            return 0
+        if period == 'ytd':
+            return int(now.replace(month=1, day=1).timestamp())
+        if period in PERIOD_BARS:
+            return int((now - pd.Timedelta(days=PERIOD_BARS[period] * 2 + 7)).timestamp())
+        return int((now - PERIOD_OFFSETS[period]).timestamp())
+
+    @staticmethod
+    def _timestamps(index):
+        """Unix-время (UTC, секунды) для индекса баров"""
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        return index.tz_convert('UTC').as_unit('s').asi8
+
+    @staticmethod
+    def _local_date(ts, tz=None):
+        """Дата бара в часовом поясе биржи для параметра start"""
+        moment = pd.Timestamp(int(ts), unit='s', tz='UTC')
+        if tz:
+            moment = moment.tz_convert(tz)
+        return moment.strftime('%Y-%m-%d')
+
+
+def _default_store():
+    """Хранилище процесса; путь пустой (YF_PRICE_STORE_PATH='') - хранилище выключено"""
+    path = os.environ.get('YF_PRICE_STORE_PATH', os.path.join('data', 'prices.sqlite'))
+    if not path:
+        return None
+    return PriceStore(path, refresh_interval=int(os.environ.get('YF_PRICE_STORE_REFRESH', 60)))
+
+
+price_store = _default_store()
+
+
+def history(ticker, period='1mo', interval='1d'):
+    """ticker.history() через локальное хранилище, если оно включено"""
+    if price_store is None:
+        return ticker.history(period=period, interval=interval)
+    return price_store.history(ticker, period, interval)
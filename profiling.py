@@ -0,0 +1,276 @@
+# profiling.py
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Профилирование включено, только если задан токен (заголовок X-Profile-Token)
+PROFILE_TOKEN = os.environ.get('YF_PROFILE_TOKEN', '')
+
+# Интервал опроса стеков и куда сохранять профили (последние PROFILE_KEEP запросов)
+INTERVAL = float(os.environ.get('YF_PROFILE_INTERVAL_MS', 2)) / 1000
+PROFILE_DIR = os.environ.get('YF_PROFILE_DIR', os.path.join('data', 'profiles'))
+PROFILE_KEEP = int(os.environ.get('YF_PROFILE_KEEP', 50))
+
+# Не больше стольких сэмплов на профиль (защита памяти при долгих запросах)
+MAX_SAMPLES = 200000
+
+PROFILE_FORMATS = ('speedscope', 'collapsed')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Категории времени: по первому совпадению в стеке сэмпла
+CATEGORIES = (
+    ("upstream", lambda path, name: path.endswith('upstream.py') and name == '_observed'),
+    ("json", lambda path, name: f'{os.sep}json{os.sep}' in path or 'orjson' in path or path.endswith('binary_formats.py')),
+    ("wait", lambda path, name: path.endswith(os.path.join('concurrent', 'futures', '_base.py'))),
+    ("dataframe", lambda path, name: f'{os.sep}pandas{os.sep}' in path or f'{os.sep}numpy{os.sep}' in path
+     or f'{os.sep}pyarrow{os.sep}' in path)
+)
+
+_PROFILE_ID = re.compile(r'^[0-9]+-[0-9a-f]{8}$')
+
+# Профилировщик текущего запроса (задачи пулов привязываются к нему через bind)
+_active = contextvars.ContextVar('yf_profiler', default=None)
+
+
+def bind(fn):
+    """
+    Обернуть задачу для пула: пока она выполняется, поток пула сэмплируется
+    профилировщиком запроса, который ее отправил (без профиля - fn как есть)
+    """
+    profiler = _active.get()
+    if profiler is None:
+        return fn
+
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        profiler._attach(ident)
+        token = _active.set(profiler)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active.reset(token)
+            profiler._detach(ident)
+    return run
+
+
+def check_token(token):
+    """Разрешено ли профилирование с этим токеном (без токена на сервере - выключено)"""
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(str(token or ''), PROFILE_TOKEN)
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профилировщик одного запроса.
+
+    Фоновый поток каждые interval секунд снимает стеки (sys._current_frames)
+    потока запроса и потоков пулов, пока они выполняют задачи этого запроса
+    (отправленные через bind), поэтому видна и работа в пулах, которую
+    cProfile не ловит, но не видны параллельные запросы. Время
+    раскладывается по категориям: upstream (запросы к Yahoo), dataframe
+    (pandas/numpy), json (кодирование ответа), wait (ожидание секций) и
+    python (остальной код) - в мс потокового времени, суммарно по потокам:
+    при параллельных секциях сумма больше wall_ms.
+    """
+
+    def __init__(self, name, interval=INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.samples = {}
+        self.wall_ms = None
+        self._count = 0
+        self._codes = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+        self._started = None
+        self._token = None
+        # Потоки пулов, выполняющие задачи запроса: ident -> число задач
+        self._attached = Counter()
+        self._attached_lock = threading.Lock()
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._started = time.perf_counter()
+        self._token = _active.set(self)
+        self._thread = threading.Thread(target=self._run, name='yf-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        _active.reset(self._token)
+        self.wall_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        return False
+
+    def _attach(self, ident):
+        with self._attached_lock:
+            self._attached[ident] += 1
+
+    def _detach(self, ident):
+        with self._attached_lock:
+            self._attached[ident] -= 1
+            if self._attached[ident] <= 0:
+                del self._attached[ident]
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if self._count >= MAX_SAMPLES:
+                continue
+            with self._attached_lock:
+                threads = {self._target, *self._attached}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident not in threads:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                if ident not in names:
+                    names[ident] = 'request' if ident == self._target else self._thread_name(ident)
+                self.samples.setdefault(names[ident], []).append(tuple(stack))
+                self._count += 1
+
+    @staticmethod
+    def _thread_name(ident):
+        for thread in threading.enumerate():
+            if thread.ident == ident:
+                return thread.name
+        return str(ident)
+
+    def breakdown(self):
+        """Потоковое (CPU + ожидание) время по категориям, мс, суммарно по потокам запроса"""
+        totals = Counter()
+        for stacks in self.samples.values():
+            for stack in stacks:
+                totals[self._category(stack)] += 1
+        result = {name: round(totals[name] * self.interval * 1000, 1) for name, _ in CATEGORIES}
+        result["python"] = round(totals["python"] * self.interval * 1000, 1)
+        return result
+
+    @staticmethod
+    def _category(stack):
+        for name, matches in CATEGORIES:
+            if any(matches(code.co_filename, code.co_name) for code in stack):
+                return name
+        return "python"
+
+    def collapsed(self):
+        """Свернутые стеки (формат flamegraph.pl / speedscope): 'поток;f1;f2 N'"""
+        lines = Counter()
+        for thread, stacks in self.samples.items():
+            for stack in stacks:
+                lines[';'.join([thread] + [self._label(code) for code in stack])] += 1
+        return ''.join(f"{line} {count}\n" for line, count in lines.most_common())
+
+    def speedscope(self):
+        """Профиль в формате speedscope (sampled, по профилю на поток)"""
+        frames = []
+        index = {}
+
+        def frame_index(code):
+            if code not in index:
+                index[code] = len(frames)
+                frames.append({"name": code.co_name, "file": self._short_path(code.co_filename),
+                               "line": code.co_firstlineno})
+            return index[code]
+
+        interval_ms = self.interval * 1000
+        profiles = []
+        for thread, stacks in self.samples.items():
+            profiles.append({
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(len(stacks) * interval_ms, 3),
+                "samples": [[frame_index(code) for code in stack] for stack in stacks],
+                "weights": [interval_ms] * len(stacks)
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "yfinance-server",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "wall_ms": self.wall_ms,
+            "interval_ms": self.interval * 1000,
+            "samples": self._count,
+            # Сумма по потокам, а не доли wall_ms
+            "breakdown_ms": self.breakdown(),
+            "breakdown_unit": "thread_ms"
+        }
+
+    def save(self, directory=PROFILE_DIR):
+        """Сохранить профиль (speedscope и collapsed); вернуть summary с id"""
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{profile_id}.speedscope.json"), 'w') as f:
+            json.dump(self.speedscope(), f)
+        with open(os.path.join(directory, f"{profile_id}.collapsed.txt"), 'w') as f:
+            f.write(self.collapsed())
+        _prune(directory)
+
+        summary = self.summary()
+        summary["id"] = profile_id
+        logger.info(f"Profile {profile_id} for {self.name}: {summary['wall_ms']} ms, {summary['breakdown_ms']}")
+        return summary
+
+    def _label(self, code):
+        return f"{code.co_name} ({self._short_path(code.co_filename)}:{code.co_firstlineno})"
+
+    @staticmethod
+    def _short_path(path):
+        if path.startswith(APP_DIR):
+            return os.path.relpath(path, APP_DIR)
+        marker = f'site-packages{os.sep}'
+        return path.split(marker, 1)[1] if marker in path else os.path.basename(path)
+
+
+def server_timing(summary):
+    """Заголовок Server-Timing из summary профиля (категории - потоковое время, total - wall)"""
+    parts = [f'{name};dur={value};desc="thread time"' for name, value in summary["breakdown_ms"].items()]
+    parts.append(f'total;dur={summary["wall_ms"]};desc="wall time"')
+    return ', '.join(parts)
+
+
+def load(profile_id, fmt='speedscope', directory=PROFILE_DIR):
+    """Содержимое сохраненного профиля или None"""
+    if not _PROFILE_ID.match(profile_id or '') or fmt not in PROFILE_FORMATS:
+        return None
+    suffix = 'speedscope.json' if fmt == 'speedscope' else 'collapsed.txt'
+    try:
+        with open(os.path.join(directory, f"{profile_id}.{suffix}")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _prune(directory):
+    """Оставить файлы последних PROFILE_KEEP профилей"""
+    ids = sorted({name.split('.', 1)[0] for name in os.listdir(directory) if _PROFILE_ID.match(name.split('.', 1)[0])})
+    for profile_id in ids[:-PROFILE_KEEP] if PROFILE_KEEP else []:
+        for fmt in ('speedscope.json', 'collapsed.txt'):
+            try:
+                os.remove(os.path.join(directory, f"{profile_id}.{fmt}"))
+            except FileNotFoundError:
+                pass
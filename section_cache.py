@@ -0,0 +1,250 @@
+# section_cache.py
+import sys
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'stored_at', 'ttl', 'stale_ttl', 'size')
+
+    def __init__(self, value, ttl, stale_ttl, size, age=0):
+        self.value = value
+        self.stored_at = time.monotonic() - age
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.size = size
+
+
+class SectionCache:
+    """
+    Ограниченный кэш секций: TTL на запись, LRU-вытеснение по числу записей
+    и примерному объёму, stale-while-revalidate с одним фоновым обновлением на ключ.
+
+    Ключ - произвольный hashable, обычно (symbol, section, params).
+    Необязательный backend (например, shared_cache.SharedCache) - второй
+    уровень, общий для процессов: промах в памяти сначала проверяется там,
+    а загруженные значения записываются в оба уровня.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, default_ttl=60, refresh_workers=2,
+                 backend=None, namespace='section'):
+        self.backend = backend
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=refresh_workers,
+            thread_name_prefix='section-cache-refresh'
+        )
+        self._counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "refreshes": 0,
+            "refresh_errors": 0
+        }
+
+    def get_or_load(self, key, loader, ttl=None, stale_ttl=None, refresh=None, store_if=None):
+        """
+        Вернуть значение из кэша или загрузить его через loader()
+
+        Args:
+            key: Ключ кэша
+            loader: Функция без аргументов, возвращающая свежее значение
+            ttl: Время жизни записи в секундах (по умолчанию default_ttl)
+            stale_ttl: Сколько секунд после истечения TTL можно отдавать устаревшее
+                значение, пока идёт фоновое обновление (по умолчанию равно ttl)
+            refresh: Функция для фонового обновления (по умолчанию loader)
+            store_if: Предикат - сохранять ли загруженное значение
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age <= entry.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    metrics.cache_lookup(self.namespace, "hit")
+                    return entry.value
+                if age <= entry.ttl + entry.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["stale_hits"] += 1
+                    metrics.cache_lookup(self.namespace, "stale")
+                    self._schedule_refresh(key, refresh or loader, ttl, stale_ttl, store_if)
+                    return entry.value
+                self._remove(key)
+                self._counters["expirations"] += 1
+
+        # Второй уровень: значение мог загрузить другой процесс
+        shared = self.backend.get((self.namespace, key)) if self.backend is not None else None
+        if shared is not None and shared[1] <= ttl + stale_ttl:
+            value, age = shared
+            self._store(key, value, ttl, stale_ttl, age)
+            with self._lock:
+                self._counters["shared_hits"] += 1
+                metrics.cache_lookup(self.namespace, "shared")
+                if age > ttl:
+                    self._schedule_refresh(key, refresh or loader, ttl, stale_ttl, store_if)
+            return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+            metrics.cache_lookup(self.namespace, "miss")
+
+        value = loader()
+        if store_if is None or store_if(value):
+            self.set(key, value, ttl, stale_ttl)
+        return value
+
+    def get(self, key, ttl=None):
+        """
+        Получить свежее значение без загрузки (None, если нет или истекло)
+
+        Промах в памяти проверяется во втором уровне: запись другого процесса
+        возрастом не больше ttl (по умолчанию default_ttl) копируется в память.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at <= entry.ttl:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                metrics.cache_lookup(self.namespace, "hit")
+                return entry.value
+
+        shared = self.backend.get((self.namespace, key)) if self.backend is not None else None
+        if shared is not None and shared[1] <= ttl:
+            value, age = shared
+            self._store(key, value, ttl, ttl, age)
+            with self._lock:
+                self._counters["shared_hits"] += 1
+                metrics.cache_lookup(self.namespace, "shared")
+            return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+            metrics.cache_lookup(self.namespace, "miss")
+        return None
+
+    def set(self, key, value, ttl=None, stale_ttl=None):
+        """Сохранить значение (в памяти и во втором уровне) с вытеснением по бюджету"""
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self._store(key, value, ttl, stale_ttl)
+        if self.backend is not None:
+            self.backend.set((self.namespace, key), value, ttl, stale_ttl)
+
+    def _store(self, key, value, ttl, stale_ttl, age=0):
+        """Сохранить значение в памяти и вытеснить самые старые записи при превышении бюджета"""
+        entry = _Entry(value, ttl, stale_ttl, self._estimate_size(value), age)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                if oldest == key and len(self._entries) == 1:
+                    break
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Счётчики попаданий/промахов/вытеснений и текущий размер"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_entries"] = self.max_entries
+            stats["max_bytes"] = self.max_bytes
+            served = stats["hits"] + stats["stale_hits"] + stats["shared_hits"]
+            lookups = served + stats["misses"]
+            stats["hit_ratio"] = round(served / lookups, 4) if lookups else None
+            return stats
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _schedule_refresh(self, key, refresh, ttl, stale_ttl, store_if):
+        # Вызывается под self._lock: на один ключ - не больше одного обновления
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self._refresh_executor.submit(self._run_refresh, key, refresh, ttl, stale_ttl, store_if)
+
+    def _run_refresh(self, key, refresh, ttl, stale_ttl, store_if):
+        try:
+            value = refresh()
+            if store_if is None or store_if(value):
+                self.set(key, value, ttl, stale_ttl)
+            with self._lock:
+                self._counters["refreshes"] += 1
+        except Exception as e:
+            logger.error(f"Error refreshing cache entry {key}: {str(e)}")
+            with self._lock:
+                self._counters["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    @staticmethod
+    def _estimate_size(value):
+        """
+        Примерный размер значения в байтах: по JSON-представлению, а вложенные
+        массивы NumPy и DataFrame/Series - по памяти (str(ndarray) - лишь сокращенная сводка)
+        """
+        if hasattr(value, 'memory_usage'):
+            return _memory_usage(value)
+        arrays = []
+
+        def default(item):
+            if hasattr(item, 'memory_usage'):
+                arrays.append(_memory_usage(item))
+                return None
+            if hasattr(item, 'nbytes'):
+                arrays.append(int(item.nbytes))
+                return None
+            return str(item)
+
+        try:
+            return len(json.dumps(value, default=default)) + sum(arrays)
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+
+
+def _memory_usage(value):
+    """Память DataFrame (сумма по колонкам) или Series (одно число)"""
+    usage = value.memory_usage(deep=True)
+    return int(usage.sum() if hasattr(usage, 'sum') else usage)
@@ -0,0 +1,226 @@
+# serializers.py
+import numpy as np
+import pandas as pd
+
+from metrics import timed_serialization
+
+# Форматы вывода DataFrame
+FRAME_FORMATS = ('nested', 'columnar')
+
+
+def frame_label(value):
+    """Метка колонки/строки для JSON: даты как YYYY-MM-DD, остальное - str()"""
+    return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+
+
+def column_values(series):
+    """
+    Значения колонки списком Python-объектов: NaN -> None, числа в object-колонках -> float;
+    целые и bool-колонки остаются целыми и bool (как скаляры df.loc в прежнем поячеечном обходе)
+
+    Числовые колонки обрабатываются целиком через NumPy, поэлементный
+    проход остается только для object-колонок.
+    """
+    values = series.to_numpy()
+
+    if values.dtype.kind in 'iub':
+        return values.tolist()
+    if values.dtype.kind == 'f':
+        result = values.tolist()
+        for pos in np.flatnonzero(np.isnan(values)):
+            result[pos] = None
+        return result
+
+    result = series.astype(object).tolist()
+    for pos in np.flatnonzero(series.isna().to_numpy()):
+        result[pos] = None
+    return [float(v) if isinstance(v, (int, float)) else v for v in result]
+
+
+@timed_serialization('frame')
+def frame_to_dict(df, orient='nested'):
+    """
+    Конвертировать DataFrame в структуру для JSON
+
+    Args:
+        df: DataFrame (колонки - обычно даты отчетов)
+        orient: 'nested' - {колонка: {строка: значение}},
+                'columnar' - {"columns": [...], "index": [...], "values": [[...], ...]}
+    """
+    if df is None or df.empty:
+        return {}
+
+    if orient not in FRAME_FORMATS:
+        raise ValueError(f"Unknown frame format: {orient}")
+
+    columns = [frame_label(col) for col in df.columns]
+    index = [str(idx) for idx in df.index]
+    values = [column_values(df.iloc[:, pos]) for pos in range(df.shape[1])]
+
+    if orient == 'columnar':
+        return {
+            "columns": columns,
+            "index": index,
+            "values": [list(row) for row in zip(*values)]
+        }
+
+    return {col: dict(zip(index, col_values)) for col, col_values in zip(columns, values)}
+
+
+# Форматы вывода произвольных таблиц (цепочки опционов и т.п.)
+TABLE_FORMATS = ('records', 'columnar')
+
+
+def table_columns(df):
+    """
+    Таблица по колонкам {колонка: [...]} с типами JSON: целые остаются целыми,
+    bool - bool, даты - ISO-строками, NaN/NaT -> None
+    """
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        values = series.to_numpy()
+        kind = values.dtype.kind
+        if kind in 'iub':
+            columns[str(name)] = values.tolist()
+            continue
+        if kind == 'f':
+            result = values.tolist()
+            mask = np.isnan(values)
+        elif kind == 'M' or isinstance(series.dtype, pd.DatetimeTZDtype):
+            mask = series.isna().to_numpy()
+            index = pd.DatetimeIndex(series)
+            if index.tz is not None:
+                result = index.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ').tolist()
+            else:
+                result = index.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+        else:
+            result = series.astype(object).tolist()
+            mask = series.isna().to_numpy()
+        for pos in np.flatnonzero(mask):
+            result[pos] = None
+        columns[str(name)] = result
+    return columns
+
+
+@timed_serialization('table')
+def serialize_table(df, fmt='records'):
+    """Таблица списком записей ('records') или массивами по колонкам ('columnar')"""
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    if df is None:
+        return [] if fmt == 'records' else {}
+    columns = table_columns(df)
+    if fmt == 'columnar':
+        return columns
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+# Форматы вывода исторических данных
+HISTORY_FORMATS = ('records', 'columnar')
+
+# Колонки баров: ключ в ответе -> колонка ticker.history()
+PRICE_COLUMNS = (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'))
+ACTION_COLUMNS = (('dividends', 'Dividends'), ('stock_splits', 'Stock Splits'))
+
+
+def _with_nulls(values, result):
+    """Заменить в списке позиции NaN на None"""
+    for pos in np.flatnonzero(np.isnan(values)):
+        result[pos] = None
+    return result
+
+
+def _float_values(series):
+    """
+    Колонка как float64: bool -> 1.0/0.0 (явно, как float(True)),
+    pd.NA в nullable-колонках -> NaN
+    """
+    if series.dtype.kind == 'b':
+        return series.to_numpy().astype(float)
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+def format_dates(index):
+    """Даты индекса как YYYY-MM-DD (по местному времени биржи) без поэлементного strftime"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return np.datetime_as_string(index.to_numpy().astype('datetime64[D]')).tolist()
+
+
+def history_columns(hist, actions=False):
+    """
+    Исторические данные по колонкам: {"date": [...], "open": [...], ...}
+
+    Цены округляются до 2 знаков целыми колонками через np.round: это
+    то же, что round() для np.float64, но не для float Python - значения
+    вроде 2.675 дают 2.68, а не 2.67. Даты форматируются один раз для всего
+    индекса, NaN -> None, bool-колонки -> 1.0/0.0.
+
+    Args:
+        hist: DataFrame из ticker.history()
+        actions: Добавить колонки dividends и stock_splits
+    """
+    columns = {"date": format_dates(hist.index)}
+
+    for key, name in PRICE_COLUMNS:
+        values = np.round(_float_values(hist[name]), 2)
+        columns[key] = _with_nulls(values, values.tolist())
+
+    volume = _float_values(hist['Volume'])
+    columns["volume"] = _with_nulls(volume, np.nan_to_num(volume).astype(np.int64).tolist())
+
+    if actions:
+        for key, name in ACTION_COLUMNS:
+            if name in hist.columns:
+                values = _float_values(hist[name])
+                columns[key] = _with_nulls(values, values.tolist())
+            else:
+                columns[key] = [0.0] * len(hist)
+
+    return columns
+
+
+def history_records(hist, actions=False):
+    """Исторические данные списком баров [{"date": ..., "open": ..., ...}]"""
+    columns = history_columns(hist, actions)
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+@timed_serialization('history')
+def serialize_history(hist, fmt='records', actions=False):
+    """Исторические данные в формате 'records' (список баров) или 'columnar' (массив на колонку)"""
+    if fmt not in HISTORY_FORMATS:
+        raise ValueError(f"Unknown history format: {fmt}")
+    if hist is None or hist.empty:
+        if fmt == 'records':
+            return []
+        keys = ["date"] + [key for key, _ in PRICE_COLUMNS] + ["volume"]
+        if actions:
+            keys += [key for key, _ in ACTION_COLUMNS]
+        return {key: [] for key in keys}
+    if fmt == 'columnar':
+        return history_columns(hist, actions)
+    return history_records(hist, actions)
+
+
+def iter_history(hist, fmt='records', actions=False, chunk_rows=1000):
+    """
+    Исторические данные кусками по chunk_rows баров (для потоковой отдачи)
+
+    Yields:
+        Список записей: для 'records' - по записи на бар, для 'columnar' - одна
+        запись с колонками куска
+    """
+    if fmt not in HISTORY_FORMATS:
+        raise ValueError(f"Unknown history format: {fmt}")
+    if hist is None or hist.empty:
+        return
+    for start in range(0, len(hist), chunk_rows):
+        chunk = hist.iloc[start:start + chunk_rows]
+        if fmt == 'columnar':
+            yield [history_columns(chunk, actions)]
+        else:
+            yield history_records(chunk, actions)
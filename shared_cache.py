@@ -0,0 +1,160 @@
+# shared_cache.py
+import os
+import json
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+'''
+
+# Как часто (в записях) чистить истекшие и лишние записи
+PURGE_EVERY = 500
+
+
+class SharedCache:
+    """
+    TTL-кэш в SQLite-файле, общий для всех процессов (gunicorn-воркеров) на хосте.
+
+    Значения сериализуются pickle (DataFrame и словари - без промежуточного JSON),
+    каждая запись - отдельная транзакция INSERT OR REPLACE, поэтому читатели
+    видят либо старое, либо новое значение целиком. Файл пишут только
+    процессы этого сервиса - pickle из чужих источников не читается.
+
+    Файл и схема создаются при первом обращении, а не в конструкторе:
+    импорт модуля (инструменты, бенчмарки, тесты) ничего не пишет на диск.
+    """
+
+    def __init__(self, path, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Значение и его возраст в секундах: (value, age) или None
+
+        Записи старше своего срока (ttl + stale_ttl при записи) не возвращаются.
+        """
+        try:
+            row = self._connection().execute(
+                'SELECT value, stored_at FROM entries WHERE key = ? AND expires_at > ?',
+                (self._key(key), time.time())
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            self._count("hits")
+            return pickle.loads(row[0]), time.time() - row[1]
+        except Exception as e:
+            logger.error(f"Shared cache read failed for {key}: {str(e)}")
+            self._count("errors")
+            return None
+
+    def set(self, key, value, ttl, stale_ttl=0, age=0):
+        """Сохранить значение на ttl + stale_ttl секунд (age - сколько ему уже лет)"""
+        try:
+            now = time.time()
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)',
+                    (self._key(key), blob, now - age, now - age + ttl + stale_ttl)
+                )
+            self._count("writes")
+            self._maybe_purge()
+        except Exception as e:
+            logger.error(f"Shared cache write failed for {key}: {str(e)}")
+            self._count("errors")
+
+    def delete(self, key):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (self._key(key),))
+
+    def purge(self):
+        """Удалить истекшие записи и самые старые сверх max_entries"""
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            conn.execute(
+                'DELETE FROM entries WHERE key IN ('
+                'SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["entries"] = self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return stats
+
+    def _maybe_purge(self):
+        with self._lock:
+            self._writes += 1
+            if self._writes % PURGE_EVERY:
+                return
+        self.purge()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _connection(self):
+        """Соединение на поток; после fork (новый pid) открывается заново"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            self._ensure_schema()
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_schema(self):
+        """Каталог, файл и таблицы - один раз на процесс, при первом соединении"""
+        if self._ready:
+            return
+        with self._schema_lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+                conn.executescript(SCHEMA)
+            self._ready = True
+
+    @staticmethod
+    def _key(key):
+        return json.dumps(key, default=str)
+
+
+def _default_cache():
+    """Кэш процесса; путь пустой (YF_SHARED_CACHE_PATH='') - кэш выключен"""
+    path = os.environ.get('YF_SHARED_CACHE_PATH', os.path.join('data', 'shared_cache.sqlite'))
+    if not path:
+        return None
+    return SharedCache(path, max_entries=int(os.environ.get('YF_SHARED_CACHE_MAX_ENTRIES', 20000)))
+
+
+shared_cache = _default_cache()
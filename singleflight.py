@@ -0,0 +1,77 @@
+# singleflight.py
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вызовов.
+
+    Пока выполняется вызов с ключом key, остальные вызовы с тем же ключом
+    не идут в upstream, а ждут и получают тот же результат (или ту же ошибку).
+    Результат общий для всех ожидающих - его нельзя изменять на месте.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "errors": 0
+        }
+
+    def do(self, key, fn):
+        """Выполнить fn() один раз на все одновременные вызовы с ключом key"""
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._counters["executions"] += 1
+            else:
+                call.waiters += 1
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+            if call.waiters:
+                logger.info(f"Coalesced {call.waiters} callers into one upstream call for {key}")
+
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._calls)
+            return stats
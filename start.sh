@@ -9,5 +9,16 @@ fi
 
 echo "Starting server on port $PORT"
 
-# Запускаем gunicorn
-exec gunicorn --bind 0.0.0.0:$PORT --workers 1 --threads 2 --timeout 120 --log-level info server:app
\ No newline at end of file
+# Асинхронный режим (ASGI): один процесс держит сотни медленных запросов к Yahoo
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec uvicorn yfinance_asgi:app --host 0.0.0.0 --port $PORT --log-level info
+fi
+
+# Метрики нескольких воркеров (metrics.py): каталог очищается при каждом старте
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    rm -f "$PROMETHEUS_MULTIPROC_DIR"/*.db
+fi
+
+# Запускаем gunicorn (порт, воркеры и хуки - в gunicorn.conf.py)
+exec gunicorn -c gunicorn.conf.py yfinance_server:app
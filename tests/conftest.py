@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""
+Общая настройка тестов: модули сервера импортируются без общего кэша,
+хранилища цен, кассет и ограничения скорости upstream (как в benchmarks/run.py);
+там, где они нужны, тест создает их сам во временном каталоге.
+"""
+import os
+import sys
+
+os.environ['YF_SHARED_CACHE_PATH'] = ''
+os.environ['YF_PRICE_STORE_PATH'] = ''
+os.environ['YF_CASSETTE_MODE'] = ''
+os.environ['YF_PREWARM_SYMBOLS'] = ''
+os.environ.setdefault('YF_UPSTREAM_RATE', '1000000000')
+os.environ.setdefault('YF_UPSTREAM_BURST', '1000000000')
+os.environ.setdefault('YF_UPSTREAM_MAX_IN_FLIGHT', '1000')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import pytest
+
+import run
+import upstream
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def stub_ticker(monkeypatch):
+    """upstream.ticker -> StubTicker с синтетическими данными (без сети)"""
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: run.StubTicker(symbol))
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """Общий кэш upstream в отдельном SQLite-файле теста"""
+    cache = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    monkeypatch.setattr(upstream, 'shared_cache', cache)
+    return cache
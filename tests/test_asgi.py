@@ -0,0 +1,115 @@
+# tests/test_asgi.py
+import json
+import asyncio
+
+import pandas as pd
+import pytest
+
+import run
+import yfinance_asgi
+import api_routes
+import yfinance_server as server
+
+# Заголовки, которые в обоих режимах должны совпадать
+COMPARED_HEADERS = ('Content-Type', 'Content-Encoding', 'ETag', 'Cache-Control', 'Vary')
+
+
+@pytest.fixture(autouse=True)
+def stub_upstream(stub_ticker, monkeypatch):
+    bars = run.make_bars(300)
+    monkeypatch.setattr(api_routes, '_download', lambda symbols, period: pd.concat({s: bars for s in symbols}, axis=1))
+    monkeypatch.setattr(api_routes, '_fetch_quotes', lambda symbols: {})
+    monkeypatch.setattr(api_routes.handler, 'cache', run.NoCache())
+
+
+def asgi_request(method, path, body=None, headers=None):
+    """Запрос к ASGI-приложению: статус, заголовки (имена в нижнем регистре) и тело (bytes - как есть)"""
+    if body is not None and not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    messages = [{'type': 'http.request', 'body': body or b''}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    }
+    asyncio.run(yfinance_asgi.app(scope, receive, send))
+    start = sent[0]
+    return (start['status'], {name.decode(): value.decode() for name, value in start['headers']},
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+@pytest.mark.parametrize('path, body, headers', [
+    ('/api/stock', {'symbol': 'AAA'}, {}),
+    ('/api/stocks', {'symbols': ['AAA', 'BBB']}, {}),
+    ('/api/stocks', {'symbols': 'AAA,BBB', 'stream': True}, {}),
+    ('/api/history', {'symbol': 'AAA', 'period': '1y'}, {'Accept-Encoding': 'gzip'}),
+    ('/api/history', {'symbol': 'AAA', 'period': '1y'}, {'Accept': 'application/x-ndjson'}),
+    ('/api/history/batch', {'symbols': ['AAA', 'BBB'], 'period': '1y'}, {'Accept-Encoding': 'gzip'}),
+    ('/api/history/batch', {'symbols': ['AAA', 'BBB'], 'stream': 1}, {}),
+    ('/api/indicators', {'symbol': 'AAA', 'indicators': 'sma:20 rsi'}, {}),
+    ('/api/profile', {'symbol': 'AAA', 'sections': ['bogus']}, {}),
+    ('/api/stock', {}, {}),
+])
+def test_same_response_as_flask(path, body, headers):
+    expected = server.app.test_client().post(path, json=body, headers=headers)
+
+    status, received, content = asgi_request('POST', path, body, headers)
+
+    assert status == expected.status_code
+    assert {name: received.get(name.lower()) for name in COMPARED_HEADERS} == \
+        {name: expected.headers.get(name) for name in COMPARED_HEADERS}
+    assert content == expected.get_data()
+
+
+def test_profile_etag_and_max_age_follow_sections():
+    body = {'symbol': 'AAA', 'sections': ['company_info']}
+    expected = server.app.test_client().post('/api/profile', json=body)
+
+    status, headers, _ = asgi_request('POST', '/api/profile', body)
+
+    assert status == 200
+    assert headers['etag'] == expected.headers['ETag']
+    assert api_routes.route_max_age('/api/profile', body) == api_routes.SECTION_TTLS['company_info']
+
+
+def test_matching_etag_on_post_is_precondition_failed():
+    body = {'symbol': 'AAA', 'period': '1y'}
+    _, headers, _ = asgi_request('POST', '/api/history', body)
+    expected = server.app.test_client().post('/api/history', json=body, headers={'If-None-Match': headers['etag']})
+
+    status, headers, content = asgi_request('POST', '/api/history', body, {'If-None-Match': headers['etag']})
+
+    assert status == expected.status_code == 412
+    assert content == b''
+    assert headers['cache-control'] == 'private, no-cache'
+
+
+def test_unavailable_binary_format_is_not_acceptable(monkeypatch):
+    monkeypatch.setattr(api_routes.binary_formats, 'available', lambda name: False)
+
+    status, _, content = asgi_request('POST', '/api/financials', {'symbol': 'AAA'},
+                                      {'Accept': 'application/msgpack'})
+
+    assert status == 406
+    assert 'not available' in json.loads(content)["error"]
+
+
+def test_flask_only_routes_are_not_found():
+    assert asgi_request('GET', '/api/stats')[0] == 404
+
+
+@pytest.mark.parametrize('body', [b'{"symbol": ', b'["AAA"]'])
+def test_invalid_body_gets_same_error_as_flask(body):
+    expected = server.app.test_client().post('/api/stock', data=body, content_type='application/json')
+
+    status, _, content = asgi_request('POST', '/api/stock', body)
+
+    assert status == expected.status_code == 400
+    assert json.loads(content) == expected.get_json()
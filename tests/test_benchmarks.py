@@ -0,0 +1,75 @@
+# tests/test_benchmarks.py
+import os
+import json
+
+import pytest
+
+import run
+import json_provider
+
+
+@pytest.fixture(scope='module')
+def cases():
+    return run.build_cases()
+
+
+def test_every_case_runs(cases):
+    for name, fn in cases.items():
+        assert fn() is not None, name
+
+
+def test_baseline_cases_still_exist(cases):
+    with open(os.path.join(os.path.dirname(run.__file__), 'baseline.json')) as f:
+        baseline = json.load(f)
+
+    missing = set(baseline["cases"]) - set(cases)
+    if json_provider.orjson is None:
+        missing = {name for name in missing if not name.endswith('/orjson')}
+    assert not missing
+
+
+def test_measure_reports_timings_and_memory(monkeypatch):
+    monkeypatch.setattr(run, 'MIN_TIME', 0)
+    calls = []
+
+    result = run.measure(lambda: calls.append(bytearray(64 * 1024)))
+
+    assert result["rounds"] == run.MIN_ROUNDS
+    # Прогрев + замеры + отдельный вызов под tracemalloc
+    assert len(calls) == run.MIN_ROUNDS + 2
+    assert 0 <= result["min_ms"] <= result["median_ms"]
+    assert result["peak_kb"] >= 64
+
+
+@pytest.mark.parametrize('before, after, regressed', [
+    (1.0, 1.2, False),   # в пределах порога
+    (1.0, 1.5, True),
+    (0.01, 0.05, False),  # x5, но меньше NOISE_MS
+    (0.0, 0.1, True),
+])
+def test_compare_flags_regressions_above_threshold_and_noise(before, after, regressed):
+    baseline = {"cases": {"case": {"median_ms": before}}}
+
+    regressions = run.compare({"case": {"median_ms": after}, "new": {"median_ms": 1.0}}, baseline, 1.3)
+
+    assert [name for name, *_ in regressions] == (["case"] if regressed else [])
+
+
+def test_main_writes_report_and_exits_on_regression(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(run, 'MIN_TIME', 0)
+    monkeypatch.setattr(run, 'build_cases', lambda: {"fast": lambda: None, "other": lambda: None})
+    output = tmp_path / 'baseline.json'
+
+    monkeypatch.setattr(run.sys, 'argv', ['run.py', '--filter', 'fast', '--output', str(output)])
+    run.main()
+    report = json.loads(output.read_text())
+    assert list(report["cases"]) == ["fast"]
+
+    report["cases"]["fast"]["median_ms"] = 0
+    output.write_text(json.dumps(report))
+    monkeypatch.setattr(run, 'NOISE_MS', -1)
+    monkeypatch.setattr(run.sys, 'argv', ['run.py', '--compare', str(output)])
+    with pytest.raises(SystemExit) as exit_info:
+        run.main()
+    assert exit_info.value.code == 1
+    assert 'REGRESSION fast' in capsys.readouterr().out
@@ -0,0 +1,108 @@
+# tests/test_binary_formats.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import run
+import api_routes
+import binary_formats
+import yfinance_server as server
+from serializers import serialize_history
+
+
+def accept(header):
+    return parse_accept_header(header, MIMEAccept)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('application/vnd.apache.arrow.stream', 'arrow'),
+    ('application/msgpack', 'msgpack'),
+    ('application/json;q=0.5, application/vnd.apache.parquet', 'parquet'),
+    ('application/json, application/msgpack;q=0.9', None),
+    ('*/*', None),
+    ('', None),
+])
+def test_negotiate(header, expected):
+    assert binary_formats.negotiate(accept(header)) == expected
+
+
+@pytest.fixture
+def hist():
+    hist = run.make_bars(50)
+    hist.iloc[3, hist.columns.get_loc('Close')] = np.nan
+    return hist
+
+
+def test_history_frame_matches_json_columns(hist):
+    frame = binary_formats.history_frame(hist)
+    expected = serialize_history(hist, 'columnar', actions=True)
+
+    assert list(frame.columns) == list(expected)
+    assert frame["date"].dt.strftime('%Y-%m-%d').tolist() == expected["date"]
+    for key in expected:
+        if key != "date":
+            assert [None if pd.isna(v) else v for v in frame[key].tolist()] == expected[key]
+    assert frame["volume"].dtype == np.int64
+
+
+def test_msgpack_round_trip(hist):
+    msgpack = pytest.importorskip('msgpack')
+    frame = binary_formats.history_frame(hist)
+
+    decoded = msgpack.unpackb(binary_formats.encode(frame, 'msgpack', {"symbol": 'AAA'}))
+
+    assert decoded["metadata"] == {"symbol": 'AAA'}
+    assert decoded["columns"] == serialize_history(hist, 'columnar', actions=True)
+
+
+@pytest.mark.parametrize('name', ['arrow', 'parquet'])
+def test_arrow_and_parquet_round_trip(hist, name):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    frame = binary_formats.history_frame(hist)
+
+    data = binary_formats.encode(frame, name, {"symbol": 'AAA', "period": '1y'})
+
+    table = pq.read_table(io.BytesIO(data)) if name == 'parquet' else pa.ipc.open_stream(data).read_all()
+    assert table.schema.metadata[b'symbol'] == b'AAA'
+    assert table.schema.metadata[b'period'] == b'1y'
+    pd.testing.assert_frame_equal(table.to_pandas(), frame, check_dtype=False)
+
+
+def test_statements_frame_takes_latest_period():
+    statements = {"income_statement": run.make_statement(5, 4), "balance_sheet": None}
+
+    frame = binary_formats.statements_frame(statements)
+
+    latest = statements["income_statement"].iloc[:, 0]
+    assert frame["statement"].unique().tolist() == ["income_statement"]
+    assert frame["item"].tolist() == latest.index.astype(str).tolist()
+    np.testing.assert_array_equal(frame["value"], latest)
+    assert (frame["period"] == statements["income_statement"].columns[0]).all()
+    assert list(binary_formats.statements_frame({"cash_flow": pd.DataFrame()}).columns) == list(frame.columns)
+
+
+def test_parquet_response_is_attachment(stub_ticker, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(api_routes, 'fetch_history', lambda symbol, period, **view: run.make_bars(20))
+
+    response = server.app.test_client().post('/api/history', json={'symbol': 'AAA', 'period': '1y'},
+                                             headers={'Accept': 'application/vnd.apache.parquet'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.apache.parquet'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="AAA_1y_history.parquet"'
+    assert 'Accept' in response.headers['Vary']
+
+
+def test_unavailable_format_is_not_acceptable(stub_ticker, monkeypatch):
+    monkeypatch.setattr(binary_formats, 'available', lambda name: False)
+
+    response = server.app.test_client().post('/api/history', json={'symbol': 'AAA'},
+                                             headers={'Accept': 'application/vnd.apache.arrow.stream'})
+
+    assert response.status_code == 406
@@ -0,0 +1,103 @@
+# tests/test_cassette.py
+import time
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import cassette
+from cassette import Cassette, RecordingAdapter, ReplayAdapter, CassetteMiss, request_key
+
+CHART_URL = 'https://query2.finance.yahoo.com/v8/finance/chart/AAA'
+DAY = 86400
+
+
+def chart_url(start, end, **extra):
+    params = {"period1": int(start), "period2": int(end), "interval": "1d", "crumb": "abc", **extra}
+    return requests.Request('GET', CHART_URL, params=params).prepare().url
+
+
+class StaticAdapter(BaseAdapter):
+    """Сетевой адаптер-заглушка: один и тот же ответ на любой запрос"""
+
+    def __init__(self, status=200, body=b'{"chart": {"result": []}}'):
+        super().__init__()
+        self.status = status
+        self.body = body
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        return ReplayAdapter._build(request, self.status, 'OK', {'Content-Type': 'application/json'}, self.body)
+
+    def close(self):
+        pass
+
+
+def session_with(adapter):
+    session = requests.Session()
+    session.mount('https://', adapter)
+    return session
+
+
+def test_key_ignores_volatile_params_and_order():
+    first = request_key('get', 'https://example.com/q?b=2&a=1&crumb=x&_=1')
+    second = request_key('GET', 'https://example.com/q?a=1&b=2&crumb=y')
+    assert first == second == 'GET https://example.com/q?a=1&b=2'
+
+
+def test_range_to_now_matches_next_day():
+    # Запись вчера и воспроизведение сегодня: тот же год истории "до сейчас"
+    today = time.time()
+    midnight = today - today % DAY
+    recorded = request_key('GET', chart_url(midnight - DAY - 365 * DAY, today - DAY))
+    replayed = request_key('GET', chart_url(midnight - 365 * DAY, today))
+
+    assert recorded == replayed
+    assert 'period1=-365d' in replayed
+    assert 'period2=now' in replayed
+
+
+def test_range_in_past_is_stored_as_dates():
+    key = request_key('GET', chart_url(1704067200, 1719792000))
+    assert 'period1=2024-01-01' in key
+    assert 'period2=2024-07-01' in key
+
+
+def test_record_then_replay(tmp_path):
+    store = Cassette(str(tmp_path))
+    network = StaticAdapter(body='{"price": 1.5, "name": "Ä"}'.encode('utf-8'))
+    url = chart_url(time.time() - 30 * DAY, time.time())
+
+    recorded = session_with(RecordingAdapter(network, store)).get(url)
+    replayed = session_with(ReplayAdapter(store)).get(url.replace('crumb=abc', 'crumb=other'))
+
+    assert network.sent == 1
+    assert replayed.status_code == recorded.status_code == 200
+    assert replayed.json() == {"price": 1.5, "name": "Ä"}
+    assert replayed.headers['Content-Type'] == 'application/json'
+
+
+def test_throttled_response_is_not_recorded(tmp_path):
+    store = Cassette(str(tmp_path))
+    session_with(RecordingAdapter(StaticAdapter(status=429), store)).get(CHART_URL)
+
+    with pytest.raises(CassetteMiss):
+        session_with(ReplayAdapter(store)).get(CHART_URL)
+
+
+def test_replay_injects_errors(tmp_path):
+    store = Cassette(str(tmp_path))
+    session_with(RecordingAdapter(StaticAdapter(), store)).get(CHART_URL)
+
+    failing = session_with(ReplayAdapter(store, error_rate=1.0, error_status=503, seed=1))
+    assert failing.get(CHART_URL).status_code == 503
+
+
+def test_install_is_noop_without_mode(monkeypatch):
+    monkeypatch.setattr(cassette, 'MODE', '')
+    session = requests.Session()
+    adapter = session.get_adapter('https://example.com')
+
+    assert cassette.install(session, adapter) is session
+    assert session.get_adapter('https://example.com') is adapter
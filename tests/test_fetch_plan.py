@@ -0,0 +1,81 @@
+# tests/test_fetch_plan.py
+from collections import Counter
+
+import pytest
+
+import run
+import upstream
+from fetch_plan import FetchPlan
+from yfinance_handler import YFinanceHandler
+
+
+class CountingTicker:
+    """Обертка StubTicker, считающая обращения к каждому ресурсу (каждое - запрос к Yahoo)"""
+
+    def __init__(self, symbol, fail=()):
+        self.ticker = symbol
+        self.calls = Counter()
+        self._stub = run.StubTicker(symbol)
+        self._fail = fail
+
+    def __getattr__(self, name):
+        self.calls[name] += 1
+        if name in self._fail:
+            raise RuntimeError(f"{name} failed")
+        return getattr(self._stub, name)
+
+
+def test_shared_resource_is_fetched_once_per_request(monkeypatch):
+    ticker = CountingTicker('AAA')
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: ticker)
+    handler = YFinanceHandler(cache=run.NoCache())
+
+    # Четыре секции читают info
+    result = handler.get_ticker_info('AAA', sections=['company_info', 'current_trading', 'key_metrics', 'dividends'])
+
+    assert ticker.calls['info'] == 1
+    assert ticker.calls['dividends'] == 1
+    assert result["upstream"]["planned"] == ['info', 'dividends']
+    assert result["upstream"]["upstream_calls"] == 2
+
+
+def test_only_resources_of_requested_sections_are_fetched(monkeypatch):
+    ticker = CountingTicker('AAA')
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: ticker)
+
+    YFinanceHandler(cache=run.NoCache()).get_ticker_info('AAA', sections=['news'])
+
+    assert set(ticker.calls) == {'news'}
+
+
+def test_failed_resource_is_not_retried_within_plan():
+    ticker = CountingTicker('AAA', fail=('news',))
+    plan = FetchPlan(ticker, ['news', 'info'])
+
+    assert plan.get('news', None) is None
+    assert plan.get('news', []) == []
+    with pytest.raises(RuntimeError):
+        plan.get('news')
+
+    assert ticker.calls['news'] == 1
+    assert plan.failed('news') and not plan.failed('info')
+    assert plan.summary()["errors"] == {'news': 'news failed'}
+
+
+def test_resources_are_fetched_lazily():
+    ticker = CountingTicker('AAA')
+    plan = FetchPlan(ticker, ['info', 'news', 'info'])
+
+    assert plan.resources == ['info', 'news']
+    plan.get('info')
+
+    assert plan.fetched == ['info']
+    assert 'news' not in ticker.calls
+
+
+def test_unknown_resource_is_rejected():
+    with pytest.raises(ValueError):
+        FetchPlan(CountingTicker('AAA'), ['info', 'splits'])
+
+    with pytest.raises(KeyError):
+        FetchPlan(CountingTicker('AAA'), ['info']).get('news')
@@ -0,0 +1,144 @@
+# tests/test_governor.py
+import time
+
+import pytest
+
+import run
+import governor as governor_module
+import upstream
+import price_store
+import api_routes
+import yfinance_server as server
+from governor import UpstreamGovernor, UpstreamBusy
+from price_store import PriceStore
+
+
+class TooManyRequests(Exception):
+    def __init__(self):
+        super().__init__("429 Client Error: Too Many Requests")
+
+
+@pytest.fixture(autouse=True)
+def short_cooldown(monkeypatch):
+    monkeypatch.setattr(governor_module, 'COOLDOWN', 0.01)
+
+
+def make_governor(**kwargs):
+    options = {"rate": 10, "burst": 10, "max_in_flight": 4, "min_rate": 1, "queue_timeout": 0.5}
+    options.update(kwargs)
+    return UpstreamGovernor(**options)
+
+
+def throttled_request():
+    raise TooManyRequests()
+
+
+def throttle(governor):
+    with pytest.raises(TooManyRequests):
+        governor.run(throttled_request)
+
+
+def test_throttle_halves_rate_and_success_raises_it():
+    governor = make_governor()
+
+    throttle(governor)
+    assert governor.stats()["rate"] == 5
+    assert governor.stats()["throttled"] == 1
+
+    time.sleep(0.02)
+    governor.run(lambda: None)
+    assert governor.stats()["rate"] == pytest.approx(5 + governor_module.INCREASE * 10)
+
+
+def test_rate_does_not_go_below_min_rate():
+    governor = make_governor(rate=4, min_rate=1)
+    for _ in range(4):
+        throttle(governor)
+        time.sleep(0.05)
+    assert governor.stats()["rate"] == 1
+
+
+def test_reported_429_is_counted_once():
+    governor = make_governor()
+
+    def reported_then_raised():
+        # Хук HTTP-сессии уже сообщил о 429, затем yfinance поднял ошибку
+        governor.on_throttle()
+        raise TooManyRequests()
+
+    with pytest.raises(TooManyRequests):
+        governor.run(reported_then_raised)
+
+    assert governor.stats()["throttled"] == 1
+    assert governor.stats()["rate"] == 5
+
+
+def test_reported_429_with_successful_retry_keeps_lowered_rate():
+    governor = make_governor()
+
+    governor.run(governor.on_throttle)
+
+    assert governor.stats()["throttled"] == 1
+    assert governor.stats()["rate"] == 5
+
+
+def test_busy_when_no_slot_before_deadline():
+    governor = make_governor(max_in_flight=1)
+    governor.acquire()
+
+    with pytest.raises(UpstreamBusy):
+        governor.acquire(timeout=0.05)
+    assert governor.stats()["rejected"] == 1
+
+    governor.release()
+    governor.acquire(timeout=0.05)
+
+
+def test_nested_call_does_not_take_second_slot():
+    governor = make_governor(max_in_flight=1, queue_timeout=0.05)
+
+    assert governor.run(lambda: governor.run(lambda: 42)) == 42
+    assert governor.stats()["in_flight"] == 0
+
+
+def test_busy_upstream_returns_503_from_profile(stub_ticker, monkeypatch):
+    busy = make_governor(max_in_flight=0, queue_timeout=0)
+    monkeypatch.setattr(upstream, 'governor', busy)
+    monkeypatch.setattr(api_routes.handler, 'cache', run.NoCache())
+
+    response = server.app.test_client().post('/api/profile', json={'symbol': 'AAA', 'sections': ['company_info']})
+
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert busy.stats()["rejected"] >= 1
+
+
+def test_price_store_reads_do_not_take_governor_slot(stub_ticker, tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, 'price_store', PriceStore(str(tmp_path / 'prices.sqlite'), refresh_interval=3600))
+    busy = make_governor(max_in_flight=0, queue_timeout=0)
+
+    # Загрузка из Yahoo идет через регулятор
+    monkeypatch.setattr(upstream, 'governor', busy)
+    with pytest.raises(UpstreamBusy):
+        api_routes._fetch_base_history('AAA', 'max')
+
+    # Свежий ряд из SQLite отдается и при занятом регуляторе
+    monkeypatch.setattr(upstream, 'governor', make_governor())
+    stored = api_routes._fetch_base_history('AAA', 'max')
+    monkeypatch.setattr(upstream, 'governor', busy)
+    assert api_routes._fetch_base_history('AAA', 'max').equals(stored)
+    assert busy.stats()["rejected"] == 1
+
+
+def test_financial_summary_propagates_busy_and_uses_shared_info(stub_ticker, shared, monkeypatch):
+    busy = make_governor(max_in_flight=0, queue_timeout=0)
+    monkeypatch.setattr(upstream, 'governor', busy)
+    with pytest.raises(UpstreamBusy):
+        api_routes.handler.get_financial_summary('AAA')
+
+    shared.set(upstream._cache_key('AAA', 'info', ()), {'longName': 'Cached Inc.'}, 60)
+    summary = api_routes.handler.get_financial_summary('AAA')
+
+    assert summary["success"] is True
+    assert summary["summary"]["company"] == 'Cached Inc.'
+    assert busy.stats()["rejected"] == 1
@@ -0,0 +1,102 @@
+# tests/test_history_views.py
+import pandas as pd
+import pytest
+
+import run
+import history_views
+import price_store
+import api_routes
+from section_cache import SectionCache
+
+def recent_bars(rows):
+    bars = run.make_bars(rows)
+    bars.index = pd.bdate_range(end=pd.Timestamp.now(tz='America/New_York').normalize(), periods=rows,
+                                tz='America/New_York', name='Date')
+    return bars
+
+
+def split_factor(values):
+    factor = values.where(values > 0, 1.0).prod()
+    return 0.0 if factor == 1.0 else factor
+
+
+def reference_resample(hist, rule):
+    """Та же агрегация через groupby (медленно, но очевидно)"""
+    keys = hist.index.tz_localize(None).to_period(rule)
+    grouped = hist.groupby(keys)
+    frame = grouped.agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+                         'Volume': 'sum', 'Dividends': 'sum', 'Stock Splits': split_factor})
+    frame.index = grouped.apply(lambda group: group.index[0])
+    frame.index.name = hist.index.name
+    return frame[hist.columns]
+
+
+@pytest.mark.parametrize('rule', history_views.RESAMPLE_RULES)
+def test_resample_matches_groupby(rule):
+    hist = run.make_bars(900)
+    hist.loc[hist.index[100], 'Stock Splits'] = 2.0
+    hist.loc[hist.index[101], 'Stock Splits'] = 3.0
+
+    result = history_views.resample(hist, rule)
+
+    pd.testing.assert_frame_equal(result, reference_resample(hist, rule), check_freq=False)
+    assert result['Volume'].dtype == hist['Volume'].dtype
+
+
+def test_resample_rejects_unknown_rule():
+    with pytest.raises(ValueError):
+        history_views.resample(run.make_bars(10), 'D')
+
+
+def test_slice_dates_is_half_open():
+    hist = run.make_bars(30)
+    start, end = hist.index[5], hist.index[10]
+
+    sliced = history_views.slice_dates(hist, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+
+    assert sliced.index[0] == start
+    assert sliced.index[-1] == hist.index[9]
+
+
+def test_select_by_period():
+    hist = recent_bars(600)
+
+    assert len(history_views.select(hist, '5d')) == 5
+    assert len(history_views.select(hist, 'max')) == 600
+    year = history_views.select(hist, '1y')
+    assert year.index[0] >= pd.Timestamp.now(tz=hist.index.tz).normalize() - pd.DateOffset(years=1)
+    assert 250 <= len(year) <= 263
+
+
+@pytest.mark.parametrize('period, start, expected', [
+    ('1y', None, '1y'),
+    ('5d', None, '1mo'),
+    ('max', None, 'max'),
+    ('1mo', pd.Timestamp.now().normalize() - pd.Timedelta(days=20), '1mo'),
+    ('1mo', pd.Timestamp.now().normalize() - pd.DateOffset(years=2), '5y'),
+])
+def test_base_period_without_price_store(period, start, expected):
+    assert price_store.price_store is None
+    assert history_views.base_period(period, start) == expected
+
+
+def test_base_period_with_price_store_uses_same_ladder(monkeypatch):
+    monkeypatch.setattr(price_store, 'price_store', object())
+    assert history_views.base_period('5d') == '1mo'
+    assert history_views.base_period('1y') == '1y'
+
+
+def test_fetch_history_loads_covering_base_once(monkeypatch):
+    monkeypatch.setattr(history_views, 'base_cache', SectionCache(max_entries=16, default_ttl=60))
+    bars = recent_bars(300)
+    loads = []
+    monkeypatch.setattr(api_routes, '_fetch_base_history', lambda symbol, period: loads.append(period) or bars)
+
+    monthly = api_routes.fetch_history('AAA', '1y', resample='M')
+    weekly = api_routes.fetch_history('AAA', '6mo', resample='W')
+
+    assert loads == ['1y', '6mo']
+    pd.testing.assert_frame_equal(monthly, history_views.resample(history_views.select(bars, '1y'), 'M'))
+    assert len(weekly) == len(history_views.resample(history_views.select(bars, '6mo'), 'W'))
+    api_routes.fetch_history('AAA', '1y', resample='W')
+    assert loads == ['1y', '6mo']
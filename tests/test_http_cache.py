@@ -0,0 +1,107 @@
+# tests/test_http_cache.py
+import gzip
+
+import pytest
+from flask import Flask, jsonify, request
+
+import http_cache
+
+LARGE = {"values": list(range(2000))}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route('/data', methods=['GET', 'POST'])
+    def data():
+        return jsonify(LARGE)
+
+    @app.route('/small', methods=['GET'])
+    def small():
+        return jsonify({"ok": True})
+
+    @app.route('/tagged', methods=['GET'])
+    def tagged():
+        response = jsonify({"ok": True, "timestamp": request.args.get('t')})
+        response.set_etag('version-1')
+        return response
+
+    @app.route('/error', methods=['GET'])
+    def error():
+        return jsonify({"error": "boom"}), 500
+
+    @app.after_request
+    def finalize(response):
+        return http_cache.finalize(request, response, 60)
+
+    return app.test_client()
+
+
+def test_get_is_public_and_post_is_private(client):
+    assert client.get('/data').headers['Cache-Control'] == 'public, max-age=60'
+    assert client.post('/data').headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_if_none_match_returns_304_for_get(client):
+    tag = client.get('/data').headers['ETag']
+
+    response = client.get('/data', headers={'If-None-Match': tag})
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+
+
+def test_if_none_match_on_post_is_precondition_failed(client):
+    tag = client.post('/data').headers['ETag']
+
+    assert client.post('/data', headers={'If-None-Match': tag}).status_code == 412
+    assert client.post('/data', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_gzip_has_own_etag_that_still_validates(client):
+    plain = client.get('/data')
+    compressed = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    # Клиент с gzip-версией получает 304 и для несжатого запроса
+    assert client.get('/data', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 304
+
+
+def test_brotli_preferred_when_available(client):
+    if http_cache.brotli is None:
+        pytest.skip("brotli is not installed")
+    response = client.get('/data', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+
+
+def test_unsupported_encoding_is_not_used(client):
+    response = client.get('/data', headers={'Accept-Encoding': 'zstd'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_small_body_is_not_compressed(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag']
+
+
+def test_handler_etag_is_kept(client):
+    first = client.get('/tagged?t=1')
+    second = client.get('/tagged?t=2', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.headers['ETag'] == '"version-1"'
+    assert second.status_code == 304
+
+
+def test_errors_are_not_stored(client):
+    response = client.get('/error', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response.headers
+
+
+def test_star_matches_any_tag(client):
+    assert client.get('/data', headers={'If-None-Match': '*'}).status_code == 304
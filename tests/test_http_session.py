@@ -0,0 +1,114 @@
+# tests/test_http_session.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_session
+import upstream
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Keep-alive сервер: отвечает статусами из server.statuses по очереди, затем 200"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        statuses = self.server.statuses
+        status = statuses.pop(0) if statuses else 200
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/quote"
+
+
+def counters():
+    stats = http_session.stats()
+    return {name: stats[name] for name in ("requests", "connections_opened", "connections_reused", "retries")}
+
+
+def delta(before):
+    return {name: value - before[name] for name, value in counters().items()}
+
+
+def test_requests_reuse_keep_alive_connection(server):
+    session = http_session.create_session()
+    before = counters()
+
+    for _ in range(5):
+        assert session.get(url(server)).status_code == 200
+
+    assert delta(before) == {"requests": 5, "connections_opened": 1, "connections_reused": 4, "retries": 0}
+
+
+def test_server_error_is_retried(server):
+    server.statuses = [503, 502]
+    session = http_session.create_session(backoff_factor=0)
+    before = counters()
+
+    assert session.get(url(server)).status_code == 200
+
+    assert delta(before)["retries"] == 2
+    assert server.statuses == []
+
+
+def test_retries_stop_at_limit(server):
+    server.statuses = [500] * 5
+    session = http_session.create_session(max_retries=1, backoff_factor=0)
+
+    assert session.get(url(server)).status_code == 500
+    assert len(server.statuses) == 3
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(http_session.random, 'uniform', lambda low, high: (low, high))
+    retry = http_session.JitteredRetry(total=10, backoff_factor=0.5)
+
+    assert retry.get_backoff_time() == 0
+    for _ in range(3):
+        retry = retry.increment(method='GET', url='/')
+    assert retry.get_backoff_time() == (0, 2.0)
+
+    for _ in range(5):
+        retry = retry.increment(method='GET', url='/')
+    assert retry.get_backoff_time() == (0, http_session.BACKOFF_MAX)
+
+
+def test_session_is_shared_and_recreated_after_fork(monkeypatch):
+    monkeypatch.setattr(http_session, '_session', None)
+    session = http_session.get_session()
+
+    assert http_session.get_session() is session
+
+    monkeypatch.setattr(http_session.os, 'getpid', lambda: -1)
+    assert http_session.get_session() is not session
+
+
+def test_tickers_use_process_session(monkeypatch):
+    created = []
+    monkeypatch.setattr(upstream.yf, 'Ticker', lambda symbol, session=None: created.append(session))
+
+    upstream.ticker('AAA')
+    upstream.ticker('BBB')
+
+    assert created == [http_session.get_session()] * 2
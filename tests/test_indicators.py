@@ -0,0 +1,87 @@
+# tests/test_indicators.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+import indicators
+from section_cache import SectionCache
+from shared_cache import SharedCache
+
+
+def fresh_state_cache(backend=None):
+    return SectionCache(max_entries=100, default_ttl=indicators.STATE_TTL, backend=backend, namespace='indicators')
+
+
+@pytest.fixture(autouse=True)
+def state_cache(monkeypatch):
+    cache = fresh_state_cache()
+    monkeypatch.setattr(indicators, 'state_cache', cache)
+    return cache
+
+
+def full(indicator, bars):
+    outputs, _ = indicator.compute(bars)
+    return pd.DataFrame(outputs, index=bars.index)
+
+
+def assert_same(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    for column in expected.columns:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.mark.parametrize('spec', ['sma:20', 'ema:12', 'rsi:14', 'macd:12,26,9', 'bbands:20,2', 'atr:14'])
+def test_incremental_matches_full_compute(spec):
+    indicator = indicators.parse(spec)
+    bars = run.make_bars(400)
+
+    # Ряд растет по бару в день, последний бар внутри дня меняется
+    for end in range(300, 401):
+        day = bars.iloc[:end].copy()
+        day.iloc[-1, day.columns.get_loc('Close')] *= 1.01
+        indicators.calculate('AAA', indicator, day)
+    result = indicators.calculate('AAA', indicator, bars)
+
+    assert_same(result, full(indicator, bars))
+
+
+def test_price_adjustment_triggers_full_recompute():
+    indicator = indicators.parse('ema:20')
+    bars = run.make_bars(300)
+    indicators.calculate('AAA', indicator, bars.iloc[:-1])
+
+    adjusted = bars.copy()
+    adjusted[['Open', 'High', 'Low', 'Close']] *= 0.98
+
+    assert_same(indicators.calculate('AAA', indicator, adjusted), full(indicator, adjusted))
+
+
+def test_state_is_shared_through_backend(tmp_path, monkeypatch):
+    backend = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    indicator = indicators.parse('rsi:14')
+    bars = run.make_bars(300)
+
+    monkeypatch.setattr(indicators, 'state_cache', fresh_state_cache(backend))
+    indicators.calculate('AAA', indicator, bars.iloc[:-1])
+
+    # Другой воркер: пустая память, тот же общий кэш - полного пересчета нет
+    monkeypatch.setattr(indicators, 'state_cache', fresh_state_cache(backend))
+    computed = []
+    compute = indicator.compute
+    monkeypatch.setattr(indicator, 'compute', lambda frame: computed.append(len(frame)) or compute(frame))
+
+    result = indicators.calculate('AAA', indicator, bars)
+
+    assert computed == []
+    assert_same(result, full(indicator, bars))
+
+
+def test_window_returns_last_rows():
+    bars = run.make_bars(300)
+    result = indicators.calculate_all('AAA', [indicators.parse('sma:5'), indicators.parse('rsi')], bars, window=50)
+
+    assert len(result) == 50
+    assert result.index[-1] == bars.index[-1]
+    assert list(result.columns) == indicators.parse('sma:5').columns() + indicators.parse('rsi').columns()
@@ -0,0 +1,57 @@
+# tests/test_json_provider.py
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import json_provider
+
+PROVIDERS = ['default'] + (['orjson'] if json_provider.orjson is not None else [])
+
+
+@pytest.fixture(params=PROVIDERS)
+def provider(request):
+    app = Flask(__name__)
+    return json_provider.provider_class(request.param)(app)
+
+
+def test_nan_and_inf_become_null(provider):
+    payload = {
+        "float": float('nan'),
+        "inf": float('-inf'),
+        "float32": np.float32('nan'),
+        "float64": np.float64('inf'),
+        "array": np.array([1.0, np.nan]),
+        "nested": [{"value": float('nan')}, (np.float32(1.5),)]
+    }
+
+    assert json.loads(provider.dumps(payload)) == {
+        "float": None, "inf": None, "float32": None, "float64": None,
+        "array": [1.0, None], "nested": [{"value": None}, [1.5]]
+    }
+
+
+def test_numpy_and_pandas_values(provider):
+    payload = {
+        "int": np.int64(3),
+        "bool": np.bool_(True),
+        "date": pd.Timestamp('2024-06-28'),
+        "missing": pd.NaT,
+        "na": pd.NA
+    }
+
+    assert json.loads(provider.dumps(payload)) == {
+        "int": 3, "bool": True, "date": "2024-06-28T00:00:00", "missing": None, "na": None
+    }
+
+
+def test_finite_payload_is_encoded_once(monkeypatch):
+    walked = []
+    monkeypatch.setattr(json_provider, '_finite', lambda obj: walked.append(obj) or obj)
+    provider = json_provider.NumpyJSONProvider(Flask(__name__))
+
+    provider.dumps({"values": [1.0, 2.0], "name": "AAA"})
+
+    assert walked == []
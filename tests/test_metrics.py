@@ -0,0 +1,105 @@
+# tests/test_metrics.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import run
+import upstream
+import metrics
+import yfinance_server as server
+from section_cache import SectionCache
+from serializers import serialize_history
+
+pytestmark = pytest.mark.skipif(not metrics.ENABLED, reason="prometheus_client is not installed")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Воркер: пишет метрики в каталог PROMETHEUS_MULTIPROC_DIR и завершается
+WORKER = """
+import os
+import prometheus_client
+import metrics
+metrics.observe_request('/api/history', 'POST', 200, 0.2)
+prometheus_client.Gauge('yf_test_live', 'live gauge', multiprocess_mode='livesum').set(1)
+print(os.getpid())
+"""
+
+# Мастер: хук child_exit из gunicorn.conf.py для завершившегося воркера, затем /metrics
+MASTER = """
+import runpy
+import sys
+from types import SimpleNamespace
+import metrics
+conf = runpy.run_path('gunicorn.conf.py')
+conf['child_exit'](None, SimpleNamespace(pid=int(sys.argv[1])))
+sys.stdout.write(metrics.render()[0].decode())
+"""
+
+
+def run_process(script, multiproc_dir, *args):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(multiproc_dir))
+    result = subprocess.run([sys.executable, '-c', script, *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def test_child_exit_drops_live_values_and_keeps_counters(tmp_path):
+    pid = run_process(WORKER, tmp_path).strip()
+    assert os.path.exists(tmp_path / f'gauge_livesum_{pid}.db')
+
+    text = run_process(MASTER, tmp_path, pid)
+
+    assert not os.path.exists(tmp_path / f'gauge_livesum_{pid}.db')
+    # Накопленные значения завершившегося воркера остаются в сумме по процессам
+    assert 'yf_http_request_duration_seconds_count{method="POST",route="/api/history",status="200"} 1.0' in text
+    assert 'yf_test_live' not in text
+
+
+def sample(name, **labels):
+    return metrics.prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_latency_is_labelled_by_route_template(stub_ticker, monkeypatch):
+    monkeypatch.setattr(server.api_routes.handler, 'cache', run.NoCache())
+    labels = {"route": '/api/profile', "method": 'POST', "status": '200'}
+    before = sample('yf_http_request_duration_seconds_count', **labels)
+
+    server.app.test_client().post('/api/profile', json={'symbol': 'AAA', 'sections': ['news']})
+
+    assert sample('yf_http_request_duration_seconds_count', **labels) == before + 1
+    assert sample('yf_section_duration_seconds_count', section='news') >= 1
+
+
+def test_upstream_errors_are_counted_by_type():
+    before = sample('yf_upstream_errors_total', resource='test_resource', error='TimeoutError')
+
+    def failing():
+        raise TimeoutError('slow upstream')
+
+    with pytest.raises(TimeoutError):
+        upstream._observed('test_resource', failing)
+    upstream._observed('test_resource', lambda: None)
+
+    assert sample('yf_upstream_errors_total', resource='test_resource', error='TimeoutError') == before + 1
+    assert sample('yf_upstream_call_duration_seconds_count', resource='test_resource') >= 2
+
+
+def test_cache_lookups_are_counted_by_result():
+    cache = SectionCache(max_entries=4, namespace='test_metrics')
+    before = {result: sample('yf_cache_lookups_total', cache='test_metrics', result=result) for result in ('hit', 'miss')}
+
+    for _ in range(3):
+        cache.get_or_load('key', lambda: {"value": 1}, ttl=60)
+
+    assert sample('yf_cache_lookups_total', cache='test_metrics', result='miss') == before['miss'] + 1
+    assert sample('yf_cache_lookups_total', cache='test_metrics', result='hit') == before['hit'] + 2
+
+
+def test_serialization_is_timed():
+    before = sample('yf_serialization_duration_seconds_count', kind='history')
+
+    serialize_history(run.make_bars(10), 'columnar')
+
+    assert sample('yf_serialization_duration_seconds_count', kind='history') == before + 1
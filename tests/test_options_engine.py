@@ -0,0 +1,133 @@
+# tests/test_options_engine.py
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+import upstream
+import api_routes
+import options_engine
+from section_cache import SectionCache
+
+EXPIRATIONS = ('2024-07-19', '2024-07-26', '2024-08-16', '2024-09-20')
+
+
+@pytest.fixture(autouse=True)
+def chain_cache(monkeypatch):
+    cache = SectionCache(max_entries=64)
+    monkeypatch.setattr(options_engine, 'chain_cache', cache)
+    return cache
+
+
+def make_chain():
+    side = run.make_option_side(200)
+    side.loc[::7, 'openInterest'] = np.nan
+    return pd.concat([side.assign(type='calls'), side.assign(type='puts')], ignore_index=True)
+
+
+def reference_filter(chain, spot, contract_type=None, strike_min=None, strike_max=None,
+                     moneyness_min=None, moneyness_max=None, min_open_interest=None):
+    """Построчная фильтрация цепочки (эталон для filter_chain)"""
+    rows = []
+    for _, row in chain.iterrows():
+        moneyness = row['strike'] / spot
+        open_interest = 0 if pd.isna(row['openInterest']) else row['openInterest']
+        if ((contract_type is None or row['type'] == contract_type)
+                and (strike_min is None or row['strike'] >= strike_min)
+                and (strike_max is None or row['strike'] <= strike_max)
+                and (moneyness_min is None or moneyness >= moneyness_min)
+                and (moneyness_max is None or moneyness <= moneyness_max)
+                and (min_open_interest is None or open_interest >= min_open_interest)):
+            rows.append(row.name)
+    return chain.loc[rows]
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {"contract_type": 'puts'},
+    {"strike_min": 100, "strike_max": 180.5},
+    {"moneyness_min": 0.9, "moneyness_max": 1.1, "contract_type": 'calls'},
+    {"min_open_interest": 20000},
+    {"strike_min": 150, "moneyness_max": 1.2, "min_open_interest": 1},
+])
+def test_filter_chain_matches_row_by_row_reference(filters):
+    chain = make_chain()
+
+    result = options_engine.filter_chain(chain, 150.0, **filters)
+
+    expected = reference_filter(chain, 150.0, **filters)
+    assert result.index.tolist() == expected.index.tolist()
+    assert result['moneyness'].tolist() == np.round(expected['strike'].to_numpy() / 150.0, 4).tolist()
+
+
+def test_filter_chain_without_spot_ignores_moneyness():
+    chain = make_chain()
+
+    result = options_engine.filter_chain(chain, None, moneyness_min=2, strike_max=100)
+
+    assert result.index.tolist() == chain.index[chain['strike'] <= 100].tolist()
+    assert 'moneyness' not in result.columns
+
+
+def test_select_expirations():
+    assert options_engine.select_expirations(EXPIRATIONS, expiry_from='2024-07-20', limit=2) == ['2024-07-26', '2024-08-16']
+    assert options_engine.select_expirations(EXPIRATIONS, ['2024-09-20', '2024-07-19']) == ['2024-07-19', '2024-09-20']
+    with pytest.raises(ValueError, match='2024-07-20'):
+        options_engine.select_expirations(EXPIRATIONS, ['2024-07-20'])
+
+
+class ChainTicker(run.StubTicker):
+    """Ticker, у которого цепочка даты hang не приходит, пока не выставлен release, а fail - ошибка"""
+
+    def __init__(self, symbol, hang=None, fail=None):
+        super().__init__(symbol, option_rows=100)
+        self.options = EXPIRATIONS
+        self.release = threading.Event()
+        self._hang = hang
+        self._fail = fail
+
+    def option_chain(self, expiration):
+        if expiration == self._hang:
+            self.release.wait(5)
+        if expiration == self._fail:
+            raise RuntimeError('no chain')
+        return super().option_chain(expiration)
+
+
+def test_slow_expiry_times_out_without_failing_others():
+    ticker = ChainTicker('AAA', hang='2024-08-16')
+    try:
+        chains, errors = options_engine.fetch_chains(ticker, list(EXPIRATIONS), timeout=0.2)
+    finally:
+        ticker.release.set()
+
+    assert sorted(chains) == ['2024-07-19', '2024-07-26', '2024-09-20']
+    assert errors == {'2024-08-16': 'Timed out after 0.2s'}
+
+
+def test_failed_expiry_is_reported_and_not_cached(chain_cache):
+    ticker = ChainTicker('AAA', fail='2024-07-26')
+
+    chains, errors = options_engine.fetch_chains(ticker, ['2024-07-19', '2024-07-26'])
+
+    assert list(chains) == ['2024-07-19']
+    assert errors == {'2024-07-26': 'no chain'}
+    assert chain_cache.get(('AAA', '2024-07-19')) is not None
+    assert chain_cache.get(('AAA', '2024-07-26')) is None
+
+
+def test_options_payload_counts_filtered_contracts(monkeypatch):
+    ticker = ChainTicker('AAA')
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: ticker)
+
+    result = api_routes.build_options_payload('AAA', contract_type='calls', max_expirations=2, strike_min=200)
+
+    assert result["selected"] == ['2024-07-19', '2024-07-26']
+    assert result["underlying_price"] == run.make_info()['currentPrice']
+    # option_rows=100: по 50 страйков 50..300 на сторону, из них 20 - от 200
+    assert result["contracts"] == {"total": 2 * 100, "returned": 2 * 20}
+    for date in result["selected"]:
+        assert list(result["data"][date]) == ['calls']
+        assert all(record["strike"] >= 200 for record in result["data"][date]["calls"])
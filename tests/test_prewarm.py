@@ -0,0 +1,37 @@
+# tests/test_prewarm.py
+import run
+import upstream
+import api_routes
+from section_cache import SectionCache
+from yfinance_handler import YFinanceHandler
+
+
+class InfoTicker(run.StubTicker):
+    """StubTicker, считающий обращения к info (каждое - запрос к Yahoo)"""
+
+    def __init__(self, symbol):
+        super().__init__(symbol)
+        self.info_calls = 0
+
+    @property
+    def info(self):
+        self.info_calls += 1
+        return run.make_info()
+
+    @info.setter
+    def info(self, value):
+        pass
+
+
+def test_prewarmed_info_serves_profile_without_upstream_call(shared, monkeypatch):
+    ticker = InfoTicker('AAA')
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: ticker)
+    handler = YFinanceHandler(cache=SectionCache(max_entries=16))
+
+    api_routes._prewarm_info('AAA')
+    assert ticker.info_calls == 1
+
+    result = handler.get_ticker_info('AAA', sections=['company_info', 'current_trading'])
+
+    assert result["data"]["company_info"]["name"] == run.make_info()['longName']
+    assert ticker.info_calls == 1
@@ -0,0 +1,171 @@
+# tests/test_price_store.py
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+from price_store import PriceStore, PERIOD_OFFSETS
+
+
+class BarsTicker:
+    """Ticker над заданным рядом баров: отдает срез по period или start и запоминает запросы"""
+
+    def __init__(self, symbol, bars):
+        self.ticker = symbol
+        self.bars = bars
+        self.calls = []
+
+    def history(self, period=None, start=None, end=None, interval='1d', **kwargs):
+        self.calls.append({"period": period, "start": start, "end": end})
+        index = self.bars.index
+        if start is not None:
+            bars = self.bars[index >= pd.Timestamp(start, tz=index.tz)]
+            return bars[bars.index < pd.Timestamp(end, tz=index.tz)] if end is not None else bars
+        if period == 'max':
+            return self.bars
+        return self.bars[index >= pd.Timestamp.now(tz='UTC').normalize() - PERIOD_OFFSETS[period]]
+
+
+def recent_bars(rows):
+    """Бары, заканчивающиеся сегодня (иначе периоды вроде 1y окажутся пустыми)"""
+    bars = run.make_bars(rows)
+    bars.index = pd.bdate_range(end=pd.Timestamp.now(tz='America/New_York').normalize(), periods=rows,
+                                tz='America/New_York', name='Date')
+    return bars
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PriceStore(str(tmp_path / 'data' / 'prices.sqlite'), refresh_interval=0)
+
+
+def test_no_file_until_first_request(tmp_path):
+    store = PriceStore(str(tmp_path / 'data' / 'prices.sqlite'))
+    assert not os.path.exists(tmp_path / 'data')
+
+    store.history(BarsTicker('AAA', recent_bars(30)), '1mo')
+    assert os.path.exists(tmp_path / 'data' / 'prices.sqlite')
+
+
+def test_repeat_request_within_refresh_interval_skips_upstream(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.sqlite'), refresh_interval=3600)
+    ticker = BarsTicker('AAA', recent_bars(400))
+
+    first = store.history(ticker, '1y')
+    second = store.history(ticker, '1y')
+
+    assert len(ticker.calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    np.testing.assert_allclose(first['Close'].to_numpy(), ticker.history('1y')['Close'].to_numpy())
+
+
+def test_delta_fetch_appends_new_bars(store):
+    bars = recent_bars(300)
+    ticker = BarsTicker('AAA', bars.iloc[:-1])
+    store.history(ticker, 'max')
+
+    ticker.bars = bars
+    hist = store.history(ticker, 'max')
+
+    # Второй запрос - только хвост от предпоследнего сохраненного бара
+    assert ticker.calls[-1]["start"] is not None
+    assert ticker.calls[-1]["period"] is None
+    assert len(hist) == len(bars)
+    assert hist['Close'].iloc[-1] == pytest.approx(bars['Close'].iloc[-1])
+
+
+def test_adjustment_refetches_and_replaces_series(store):
+    bars = recent_bars(300)
+    ticker = BarsTicker('AAA', bars)
+    store.history(ticker, 'max')
+
+    # Дивиденд на последнем баре: Yahoo пересчитывает все прошлые цены
+    adjusted = bars.copy()
+    adjusted.loc[adjusted.index[:-1], ['Open', 'High', 'Low', 'Close']] *= 0.98
+    adjusted.loc[adjusted.index[-1], 'Dividends'] = 1.5
+    ticker.bars = adjusted
+    hist = store.history(ticker, 'max')
+
+    assert ticker.calls[-1]["period"] == 'max'
+    assert len(hist) == len(adjusted)
+    np.testing.assert_allclose(hist['Close'].to_numpy(), adjusted['Close'].to_numpy())
+    assert hist['Dividends'].iloc[-1] == 1.5
+
+
+def test_shorter_fetch_does_not_truncate_longer_series(store):
+    bars = recent_bars(600)
+    ticker = BarsTicker('AAA', bars)
+    store.history(ticker, 'max')
+
+    # Другой процесс (свое хранилище над тем же файлом) загружает 1mo с нуля
+    other = PriceStore(store.path, refresh_interval=0)
+    other._full_fetch(ticker, 'AAA', '1d', other._period_start('1mo'), period='1mo')
+
+    assert len(store.read('AAA')) == len(bars)
+    assert store._load_meta('AAA', '1d')["covered_from"] == 0
+
+
+def test_longer_period_extends_coverage(store):
+    bars = recent_bars(600)
+    ticker = BarsTicker('AAA', bars)
+
+    assert len(store.history(ticker, '1mo')) == len(ticker.history('1mo'))
+    assert len(store.history(ticker, '2y')) == len(ticker.history('2y'))
+    assert len(store.history(ticker, '1mo')) == len(ticker.history('1mo'))
+
+
+def test_longer_period_fetches_only_missing_head(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.sqlite'), refresh_interval=3600)
+    bars = recent_bars(600)
+    ticker = BarsTicker('AAA', bars)
+    month = store.history(ticker, '1mo')
+
+    hist = store.history(ticker, '2y')
+
+    # Начало ряда - до первого сохраненного бара включительно, без повторной загрузки хвоста
+    head = ticker.calls[-1]
+    assert head["period"] is None
+    assert pd.Timestamp(head["end"], tz=bars.index.tz) == month.index[0].normalize() + pd.Timedelta(days=1)
+    expected = ticker.history(period='2y')
+    assert hist.index.equals(expected.index)
+    np.testing.assert_allclose(hist['Close'].to_numpy(), expected['Close'].to_numpy())
+    assert store._load_meta('AAA', '1d')["covered_from"] == store._period_start('2y')
+
+
+def test_adjusted_head_refetches_whole_period(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.sqlite'), refresh_interval=3600)
+    bars = recent_bars(600)
+    ticker = BarsTicker('AAA', bars)
+    store.history(ticker, '1mo')
+
+    adjusted = bars.copy()
+    adjusted[['Open', 'High', 'Low', 'Close']] *= 0.5
+    adjusted.loc[adjusted.index[-1], 'Stock Splits'] = 2.0
+    ticker.bars = adjusted
+    hist = store.history(ticker, '1y')
+
+    assert ticker.calls[-1]["end"] is None
+    np.testing.assert_allclose(hist['Close'].to_numpy(), ticker.history(period='1y')['Close'].to_numpy())
+
+
+def test_concurrent_requests_fetch_series_once(tmp_path):
+    store = PriceStore(str(tmp_path / 'prices.sqlite'), refresh_interval=3600)
+    ticker = BarsTicker('AAA', recent_bars(300))
+    fetch = ticker.history
+
+    def slow_history(**kwargs):
+        time.sleep(0.05)
+        return fetch(**kwargs)
+
+    ticker.history = slow_history
+    threads = [threading.Thread(target=store.history, args=(ticker, '1y')) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ticker.calls) == 1
@@ -0,0 +1,109 @@
+# tests/test_profiling.py
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import run
+import upstream
+import profiling
+import yfinance_server as server
+
+TOKEN = 'secret'
+
+
+def busy_loop(seconds=0.05):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def profile(fn, interval=0.001):
+    with profiling.SamplingProfiler('test', interval=interval) as profiler:
+        fn()
+    return profiler
+
+
+def test_speedscope_profile_per_thread_with_valid_frames():
+    def request():
+        with ThreadPoolExecutor(1, thread_name_prefix='yf-section') as pool:
+            pool.submit(profiling.bind(busy_loop)).result()
+        busy_loop()
+    profiler = profile(request)
+
+    document = profiler.speedscope()
+
+    assert document["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    frames = document["shared"]["frames"]
+    profiles = {item["name"]: item for item in document["profiles"]}
+    assert 'request' in profiles and any(name.startswith('yf-section') for name in profiles)
+    for item in profiles.values():
+        assert item["type"] == "sampled" and item["unit"] == "milliseconds"
+        assert len(item["samples"]) == len(item["weights"]) > 0
+        assert item["endValue"] == pytest.approx(sum(item["weights"]))
+        assert all(0 <= index < len(frames) for stack in item["samples"] for index in stack)
+    assert {"name": "busy_loop", "file": "tests/test_profiling.py", "line": busy_loop.__code__.co_firstlineno} in frames
+    json.dumps(document)
+
+
+def test_unbound_pool_task_is_not_sampled():
+    def request():
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(busy_loop).result()
+    profiler = profile(request)
+
+    assert set(profiler.samples) == {'request'}
+
+
+def test_collapsed_counts_every_sample():
+    profiler = profile(busy_loop)
+
+    lines = profiler.collapsed().splitlines()
+
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == profiler.summary()["samples"]
+    assert all(line.startswith('request;') for line in lines)
+    assert any('busy_loop (tests/test_profiling.py:' in line for line in lines)
+
+
+def test_upstream_time_is_categorized():
+    profiler = profile(lambda: upstream._observed('info', lambda: time.sleep(0.05)))
+
+    breakdown = profiler.breakdown()
+
+    assert breakdown["upstream"] > breakdown["python"]
+    assert set(breakdown) == {"upstream", "json", "wait", "dataframe", "python"}
+
+
+def test_save_load_and_prune(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_KEEP', 2)
+    directory = str(tmp_path)
+    ids = [profile(busy_loop).save(directory)["id"] for _ in range(3)]
+
+    kept = sorted(profile_id for profile_id in ids if profiling.load(profile_id, directory=directory) is not None)
+
+    # Остаются последние по id (время сохранения, затем случайная часть)
+    assert kept == sorted(ids)[1:]
+    assert len(list(tmp_path.iterdir())) == 4
+    assert json.loads(profiling.load(kept[0], directory=directory))["name"] == 'test'
+    assert profiling.load(kept[0], 'collapsed', directory=directory).startswith('request;')
+    assert profiling.load('../' + kept[0], directory=directory) is None
+
+
+def test_profiled_request_saves_speedscope(stub_ticker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', TOKEN)
+    monkeypatch.setattr(server.api_routes.handler, 'cache', run.NoCache())
+    client = server.app.test_client()
+    body = {'symbol': 'AAA', 'sections': ['company_info'], 'profile': 1}
+
+    assert client.post('/api/profile', json=body).status_code == 403
+
+    response = client.post('/api/profile', json=body, headers={'X-Profile-Token': TOKEN})
+
+    assert response.status_code == 200
+    assert 'total;dur=' in response.headers['Server-Timing']
+    saved = client.get(f"/api/profiles/{response.headers['X-Profile-Id']}", headers={'X-Profile-Token': TOKEN})
+    assert saved.status_code == 200
+    assert saved.get_json()["name"] == 'POST /api/profile'
+    assert client.get(f"/api/profiles/{response.headers['X-Profile-Id']}").status_code == 403
@@ -0,0 +1,123 @@
+# tests/test_quotes.py
+import json
+
+import pandas as pd
+import pytest
+import requests
+import yfinance as yf
+from requests.adapters import BaseAdapter
+
+import run
+import upstream
+import api_routes
+import yfinance_server as server
+from cassette import ReplayAdapter
+
+
+class FakeYfData:
+    """Клиент yfinance: запоминает запросы, отвечает заданным JSON или ошибкой"""
+
+    calls = []
+    response = None
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def get_raw_json(self, url, params=None, timeout=None):
+        FakeYfData.calls.append((url, params, self.session))
+        if isinstance(FakeYfData.response, Exception):
+            raise FakeYfData.response
+        return FakeYfData.response
+
+
+@pytest.fixture
+def yf_data(monkeypatch):
+    FakeYfData.calls = []
+    FakeYfData.response = None
+    monkeypatch.setattr(api_routes, 'YfData', FakeYfData)
+    return FakeYfData
+
+
+def test_quotes_go_through_yfinance_client(yf_data, shared):
+    yf_data.response = {"quoteResponse": {"result": [
+        {"symbol": "aaa", "regularMarketPrice": 10.0},
+        {"symbol": "BBB", "regularMarketPrice": 20.0}
+    ]}}
+
+    quotes = api_routes._fetch_quotes(['AAA', 'BBB'])
+
+    assert quotes == {"AAA": {"symbol": "aaa", "regularMarketPrice": 10.0},
+                      "BBB": {"symbol": "BBB", "regularMarketPrice": 20.0}}
+    # cookie и crumb добавляет клиент yfinance на общей сессии, а не сервер
+    url, params, session = yf_data.calls[0]
+    assert url == api_routes.QUOTE_URL
+    assert params["symbols"] == "AAA,BBB"
+    assert 'crumb' not in params
+    assert session is api_routes.http_session.get_session()
+
+
+def test_quote_failure_returns_empty(yf_data):
+    yf_data.response = RuntimeError("401 Unauthorized: Invalid Crumb")
+
+    assert api_routes._fetch_quotes(['CCC']) == {}
+
+
+def test_stocks_fill_missing_quotes_from_cached_info(yf_data, shared, monkeypatch):
+    yf_data.response = {"quoteResponse": {"result": [
+        {"symbol": "AAA", "regularMarketPrice": 10.0, "longName": "Alpha", "currency": "USD"}
+    ]}}
+    bars = run.make_bars(5)
+    monkeypatch.setattr(api_routes, '_download', lambda symbols, period: pd.concat({s: bars for s in symbols}, axis=1))
+    shared.set(upstream._cache_key('BBB', 'info', ()), {"longName": "Beta", "currency": "EUR", "marketCap": 5}, 60)
+
+    response = server.app.test_client().post('/api/stocks', json={'symbols': ['AAA', 'BBB', 'CCC']})
+
+    data = response.get_json()["data"]
+    assert data["AAA"]["price"] == 10.0
+    assert data["AAA"]["name"] == "Alpha"
+    # Нет в ответе котировок: название и валюта - из info в общем кэше, цена - из баров
+    assert data["BBB"]["name"] == "Beta"
+    assert data["BBB"]["currency"] == "EUR"
+    assert data["BBB"]["marketCap"] == 5
+    assert data["BBB"]["price"] == pytest.approx(float(bars['Close'].iloc[-1]))
+    assert data["CCC"]["name"] is None
+    assert data["CCC"]["price"] == pytest.approx(float(bars['Close'].iloc[-1]))
+
+
+class YahooAdapter(BaseAdapter):
+    """Адаптер сессии вместо сети: cookie, crumb и ответ на batch-котировки"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def send(self, request, **kwargs):
+        self.urls.append(request.url)
+        if 'getcrumb' in request.url:
+            body = b'test-crumb'
+        elif 'finance/quote' in request.url:
+            body = json.dumps({"quoteResponse": {"result": [{"symbol": "AAA", "regularMarketPrice": 1.0}]}}).encode()
+        else:
+            body = b''
+        return ReplayAdapter._build(request, 200, 'OK', {'Content-Type': 'application/json'}, body)
+
+    def close(self):
+        pass
+
+
+def test_quote_request_carries_crumb_through_session_adapters(tmp_path, monkeypatch):
+    # Настоящий клиент yfinance: запросы идут через адаптеры сессии (там же - кассеты)
+    yf.set_tz_cache_location(str(tmp_path))
+    session = requests.Session()
+    adapter = YahooAdapter()
+    session.mount('https://', adapter)
+    monkeypatch.setattr(api_routes.http_session, 'get_session', lambda: session)
+    yf_data = api_routes.YfData()
+    monkeypatch.setattr(yf_data, '_session', yf_data._session)
+    monkeypatch.setattr(yf_data, '_crumb', None)
+    monkeypatch.setattr(yf_data, '_cookie', None)
+
+    assert api_routes._fetch_quotes(['AAA']) == {"AAA": {"symbol": "AAA", "regularMarketPrice": 1.0}}
+    quote_urls = [url for url in adapter.urls if 'finance/quote' in url]
+    assert len(quote_urls) == 1
+    assert 'crumb=test-crumb' in quote_urls[0]
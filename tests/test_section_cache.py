@@ -0,0 +1,68 @@
+# tests/test_section_cache.py
+import numpy as np
+
+import run
+import upstream
+from section_cache import SectionCache
+from shared_cache import SharedCache
+from yfinance_handler import YFinanceHandler
+
+
+def test_get_reads_backend_written_by_other_worker(tmp_path):
+    backend = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    SectionCache(backend=backend, namespace='test').set('key', {"value": 1})
+
+    other = SectionCache(backend=backend, namespace='test')
+
+    assert other.get('key') == {"value": 1}
+    assert other.stats()["shared_hits"] == 1
+    # Скопировано в память: повторное чтение - без второго уровня
+    assert other.get('key') == {"value": 1}
+    assert other.stats()["shared_hits"] == 1
+
+
+def test_get_ignores_backend_entry_older_than_ttl(tmp_path):
+    backend = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    backend.set(('test', 'key'), {"value": 1}, 60, age=30)
+
+    assert SectionCache(backend=backend, namespace='test').get('key', ttl=10) is None
+
+
+def test_size_counts_array_memory():
+    arrays = {"outputs": {"sma": np.zeros(100_000)}, "state": {"sum": 1.0}}
+    cache = SectionCache(max_bytes=10 ** 9)
+
+    assert cache._estimate_size(arrays) >= 800_000
+
+
+class NewsTicker(run.StubTicker):
+    """Ticker с заданной лентой новостей (или ошибкой), считающий обращения к ней"""
+
+    def __init__(self, symbol, news):
+        super().__init__(symbol)
+        self._news = news
+        self.news_calls = 0
+
+    @property
+    def news(self):
+        self.news_calls += 1
+        if isinstance(self._news, Exception):
+            raise self._news
+        return self._news
+
+    @news.setter
+    def news(self, value):
+        pass
+
+
+def test_empty_section_is_cached_but_failed_one_is_not(monkeypatch):
+    tickers = {'EMPTY': NewsTicker('EMPTY', []), 'FAIL': NewsTicker('FAIL', RuntimeError('upstream down'))}
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: tickers[symbol])
+    handler = YFinanceHandler(cache=SectionCache(max_entries=16))
+
+    for _ in range(2):
+        assert handler.get_ticker_info('EMPTY', sections=["news"])["data"]["news"] == []
+        assert handler.get_ticker_info('FAIL', sections=["news"])["data"]["news"] == []
+
+    assert tickers['EMPTY'].news_calls == 1
+    assert tickers['FAIL'].news_calls == 2
@@ -0,0 +1,168 @@
+# tests/test_serializers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import run
+from serializers import frame_to_dict, serialize_table, serialize_history, iter_history
+
+
+def reference_convert_df_to_dict(df):
+    """Прежний поячеечный YFinanceHandler._convert_df_to_dict (эталон для frame_to_dict)"""
+    if df is None or df.empty:
+        return {}
+
+    result = {}
+    for col in df.columns:
+        result[col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col)] = {}
+        for idx in df.index:
+            value = df.loc[idx, col]
+            # Обрабатываем NaN значения
+            if pd.isna(value):
+                value = None
+            elif isinstance(value, (int, float)):
+                value = float(value)
+            result[col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col)][str(idx)] = value
+    return result
+
+
+def reference_table(df):
+    """Записи таблицы поячеечно: NaN/NaT -> None, даты - ISO-строки, целые и bool - как есть"""
+    records = []
+    for _, row in df.iterrows():
+        record = {}
+        for name in df.columns:
+            value = row[name]
+            if isinstance(value, pd.Timestamp) and not pd.isna(value):
+                value = (value.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ') if value.tz is not None
+                         else value.strftime('%Y-%m-%dT%H:%M:%S'))
+            elif pd.isna(value):
+                value = None
+            elif isinstance(value, np.generic):
+                value = value.item()
+            record[str(name)] = value
+        records.append(record)
+    return records
+
+
+def typed(value):
+    """Значение вместе с типом, который увидит JSON (NumPy-скаляры - как Python-объекты)"""
+    if isinstance(value, dict):
+        return {key: typed(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [typed(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    return type(value).__name__, value
+
+
+def mixed_frame():
+    index = pd.date_range('2024-01-01', periods=4, name='Date')
+    return pd.DataFrame({
+        'float': [1.5, np.nan, 2.0, -0.25],
+        'int': np.array([1, 2, 3, 4], dtype='int64'),
+        'bool': [True, False, True, False],
+        'object': ['x', None, 3, 2.5],
+        'date': pd.to_datetime(['2024-01-01', None, '2024-01-03', '2024-01-04']),
+        'mixed': [1, 'a', np.nan, True]
+    }, index=index)
+
+
+def nested_from_columnar(result):
+    return {col: dict(zip(result["index"], values))
+            for col, values in zip(result["columns"], zip(*result["values"]))}
+
+
+@pytest.mark.parametrize('df', [
+    run.make_statement(40, 4),
+    run.make_statement(40, 8).T,
+    mixed_frame(),
+    mixed_frame().T,
+    pd.DataFrame()
+], ids=['statement', 'dates_in_index', 'mixed_dtypes', 'mixed_transposed', 'empty'])
+def test_frame_to_dict_matches_cell_by_cell_reference(df):
+    expected = typed(reference_convert_df_to_dict(df))
+
+    assert typed(frame_to_dict(df, 'nested')) == expected
+    columnar = frame_to_dict(df, 'columnar')
+    assert typed(nested_from_columnar(columnar) if columnar else {}) == expected
+
+
+def test_frame_to_dict_keeps_column_order():
+    df = run.make_statement(5, 8)
+
+    result = frame_to_dict(df, 'columnar')
+
+    assert list(frame_to_dict(df, 'nested')) == result["columns"]
+    assert result["columns"][0] == df.columns[0].strftime('%Y-%m-%d')
+
+
+def test_serialize_table_matches_row_by_row_reference():
+    df = mixed_frame().reset_index()
+    df['date_utc'] = df['date'].dt.tz_localize('America/New_York')
+
+    expected = typed(reference_table(df))
+
+    assert typed(serialize_table(df, 'records')) == expected
+    columns = serialize_table(df, 'columnar')
+    assert typed([dict(zip(columns, row)) for row in zip(*columns.values())]) == expected
+
+
+def reference_history(hist):
+    """Прежний построчный обход hist.iterrows() из _get_historical_prices"""
+    return [{
+        "date": index.strftime('%Y-%m-%d'),
+        "open": round(row['Open'], 2),
+        "high": round(row['High'], 2),
+        "low": round(row['Low'], 2),
+        "close": round(row['Close'], 2),
+        "volume": int(row['Volume']),
+        "dividends": float(row.get('Dividends', 0)),
+        "stock_splits": float(row.get('Stock Splits', 0))
+    } for index, row in hist.iterrows()]
+
+
+def test_serialize_history_matches_iterrows_reference():
+    hist = run.make_bars(300)
+    # Значения на границе округления: round(np.float64(2.675), 2) == 2.68, а не 2.67, как у float
+    hist.iloc[:3, hist.columns.get_loc('Close')] = [2.675, 1.005, 0.125]
+
+    expected = typed(reference_history(hist))
+
+    assert typed(serialize_history(hist, 'records', actions=True)) == expected
+    columns = serialize_history(hist, 'columnar', actions=True)
+    assert typed([dict(zip(columns, row)) for row in zip(*columns.values())]) == expected
+
+
+def test_serialize_history_nan_becomes_none():
+    hist = run.make_bars(5)
+    hist.iloc[1, hist.columns.get_loc('Close')] = np.nan
+    hist.iloc[2, hist.columns.get_loc('Volume')] = np.nan
+
+    columns = serialize_history(hist, 'columnar')
+
+    assert list(columns) == ["date", "open", "high", "low", "close", "volume"]
+    assert columns["close"][1] is None
+    assert columns["volume"][2] is None
+    assert all(isinstance(v, int) for pos, v in enumerate(columns["volume"]) if pos != 2)
+
+
+def test_serialize_history_empty():
+    assert serialize_history(pd.DataFrame(), 'records') == []
+    assert serialize_history(None, 'columnar', actions=True) == {
+        key: [] for key in ("date", "open", "high", "low", "close", "volume", "dividends", "stock_splits")
+    }
+
+
+@pytest.mark.parametrize('fmt', ['records', 'columnar'])
+def test_iter_history_chunks_join_to_whole(fmt):
+    hist = run.make_bars(25)
+
+    chunks = list(iter_history(hist, fmt, chunk_rows=10))
+
+    if fmt == 'records':
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        assert sum(chunks, []) == serialize_history(hist, fmt)
+    else:
+        joined = {key: sum((chunk[0][key] for chunk in chunks), []) for key in chunks[0][0]}
+        assert joined == serialize_history(hist, fmt)
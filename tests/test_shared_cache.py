@@ -0,0 +1,113 @@
+# tests/test_shared_cache.py
+import os
+import sys
+import subprocess
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+import run
+import upstream
+from shared_cache import SharedCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Другой воркер: пишет значения в общий файл и читает записанное тестом
+WORKER = """
+import sys
+sys.path.insert(0, 'benchmarks')
+import run
+from shared_cache import SharedCache
+cache = SharedCache(sys.argv[1])
+cache.set(('upstream', 'AAA', 'financials', ()), run.make_statement(5, 4), 60)
+print(cache.get('from parent')[0])
+"""
+
+
+def run_worker(path):
+    result = subprocess.run([sys.executable, '-c', WORKER, str(path)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def test_entries_are_shared_between_processes(tmp_path):
+    path = tmp_path / 'shared_cache.sqlite'
+    cache = SharedCache(str(path))
+    cache.set('from parent', {"value": 1}, 60)
+
+    assert run_worker(path) == "{'value': 1}"
+
+    frame, age = cache.get(('upstream', 'AAA', 'financials', ()))
+    assert isinstance(frame, pd.DataFrame) and frame.shape == (5, 4)
+    assert 0 <= age < 60
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="fork is not available")
+def test_forked_worker_opens_own_connection(tmp_path):
+    cache = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    cache.set('before fork', 1, 60)
+
+    def child():
+        # Соединение родителя после fork не используется (открывается заново по pid)
+        cache.set('from child', cache.get('before fork')[0] + 1, 60)
+
+    process = multiprocessing.get_context('fork').Process(target=child)
+    process.start()
+    process.join(10)
+
+    assert process.exitcode == 0
+    assert cache.get('from child')[0] == 2
+
+
+def test_expired_entry_is_not_returned(tmp_path):
+    cache = SharedCache(str(tmp_path / 'shared_cache.sqlite'))
+    cache.set('fresh', 1, 60, age=30)
+    cache.set('expired', 2, 60, age=61)
+    cache.set('stale', 3, 60, stale_ttl=60, age=90)
+
+    assert cache.get('fresh')[0] == 1
+    assert cache.get('expired') is None
+    # В пределах stale_ttl запись отдается, а возраст говорит читателю, что она устарела
+    value, age = cache.get('stale')
+    assert value == 3 and age >= 90
+
+
+def test_purge_drops_expired_and_oldest_over_limit(tmp_path):
+    cache = SharedCache(str(tmp_path / 'shared_cache.sqlite'), max_entries=2)
+    cache.set('expired', 0, 10, age=20)
+    for n, age in enumerate((3, 2, 1)):
+        cache.set(f"key{n}", n, 60, age=age)
+
+    cache.purge()
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get('key0') is None
+    assert [cache.get(f"key{n}")[0] for n in (1, 2)] == [1, 2]
+
+
+def test_cached_call_is_served_to_other_worker(tmp_path, monkeypatch):
+    path = str(tmp_path / 'shared_cache.sqlite')
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return run.make_info()
+
+    for _ in range(2):
+        # Каждый "воркер" - своё подключение к тому же файлу
+        monkeypatch.setattr(upstream, 'shared_cache', SharedCache(path))
+        assert upstream.cached_call('aaa', 'info', (), fetch)["longName"] == 'Synthetic Corp'
+
+    assert len(calls) == 1
+    assert upstream.peek('AAA', 'info', ())["longName"] == 'Synthetic Corp'
+
+
+def test_failed_call_is_not_cached(shared):
+    def failing():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        upstream.cached_call('AAA', 'info', (), failing)
+
+    assert upstream.peek('AAA', 'info', ()) is None
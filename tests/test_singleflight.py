@@ -0,0 +1,114 @@
+# tests/test_singleflight.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream
+from governor import governor
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.001)
+
+
+def run_concurrently(flight, fn, do=None, callers=CALLERS):
+    """
+    callers одновременных вызовов flight.do('key', fn) (или do(fn)); fn ждет,
+    пока все остальные вызовы не присоединятся к первому
+
+    Returns:
+        Список (результат или ошибка) по вызовам
+    """
+    release = threading.Event()
+
+    def blocking():
+        release.wait(5)
+        return fn()
+
+    do = do or (lambda fn: flight.do('key', fn))
+
+    def caller():
+        try:
+            return do(blocking)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(caller) for _ in range(callers)]
+        wait_for(lambda: flight.stats()["coalesced"] >= callers - 1)
+        release.set()
+        return [future.result() for future in futures]
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+
+    results = run_concurrently(flight, lambda: executions.append(1) or {"value": 1})
+
+    assert len(executions) == 1
+    assert all(result is results[0] for result in results)
+    stats = flight.stats()
+    assert (stats["calls"], stats["executions"], stats["coalesced"], stats["in_flight"]) == (CALLERS, 1, CALLERS - 1, 0)
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    error = RuntimeError('upstream failed')
+
+    def failing():
+        raise error
+
+    results = run_concurrently(flight, failing)
+
+    assert all(result is error for result in results)
+    assert flight.stats()["errors"] == 1
+    # Ошибка не запоминается: следующий вызов выполняется заново
+    assert flight.do('key', lambda: 2) == 2
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+
+    assert [flight.do('key', lambda: n) for n in range(3)] == [0, 1, 2]
+    assert flight.stats()["executions"] == 3
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    started = threading.Barrier(2, timeout=5)
+
+    def fetch(value):
+        # Оба вызова должны быть в работе одновременно
+        started.wait()
+        return value
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(flight.do, ('AAA', 'info'), lambda: fetch(1))
+        second = pool.submit(flight.do, ('BBB', 'info'), lambda: fetch(2))
+        assert (first.result(), second.result()) == (1, 2)
+
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_upstream_call_coalesces_and_takes_one_governor_slot(monkeypatch):
+    flight = SingleFlight()
+    monkeypatch.setattr(upstream, '_flight', flight)
+    admitted = governor.stats()["admitted"]
+    executions = []
+
+    results = run_concurrently(
+        flight,
+        lambda: executions.append(1) or {"symbol": 'AAA'},
+        do=lambda fn: upstream.call('aaa', 'info', (), fn)
+    )
+
+    assert results == [{"symbol": 'AAA'}] * CALLERS
+    assert len(executions) == 1
+    assert governor.stats()["admitted"] == admitted + 1
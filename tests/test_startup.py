@@ -0,0 +1,58 @@
+# tests/test_startup.py
+import os
+import runpy
+import threading
+
+import prewarm
+import yfinance_server as server
+from shared_cache import SharedCache
+
+GUNICORN_CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+def scheduler_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'yf-prewarm-scheduler']
+
+
+def test_shared_cache_file_created_on_first_use(tmp_path):
+    cache = SharedCache(str(tmp_path / 'data' / 'shared_cache.sqlite'))
+    assert not os.path.exists(tmp_path / 'data')
+
+    cache.set('key', 1, 60)
+    assert cache.get('key')[0] == 1
+    assert os.path.exists(tmp_path / 'data' / 'shared_cache.sqlite')
+
+
+def test_prewarm_starts_with_first_request_once(monkeypatch):
+    scheduler = prewarm.PrewarmScheduler(['AAA'])
+    scheduler.add('noop', 3600, lambda symbol: None)
+    monkeypatch.setattr(prewarm, 'scheduler', scheduler)
+    assert scheduler_threads() == []
+
+    client = server.app.test_client()
+    client.get('/health')
+    client.get('/health')
+    server.start_background_tasks()
+    try:
+        assert len(scheduler_threads()) == 1
+    finally:
+        scheduler.stop()
+
+
+def test_gunicorn_preloads_app_and_starts_prewarm_in_worker(monkeypatch):
+    scheduler = prewarm.PrewarmScheduler(['AAA'])
+    scheduler.add('noop', 3600, lambda symbol: None)
+    monkeypatch.setattr(prewarm, 'scheduler', scheduler)
+    monkeypatch.setenv('PORT', '9000')
+
+    conf = runpy.run_path(GUNICORN_CONF)
+    assert conf['preload_app'] is True
+    assert conf['bind'] == '0.0.0.0:9000'
+    # Импорт приложения в мастере (preload) фоновых потоков не создает
+    assert scheduler_threads() == []
+
+    conf['post_fork'](None, None)
+    try:
+        assert len(scheduler_threads()) == 1
+    finally:
+        scheduler.stop()
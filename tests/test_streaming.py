@@ -0,0 +1,83 @@
+# tests/test_streaming.py
+import json
+
+import pandas as pd
+import pytest
+
+import run
+import api_routes
+import yfinance_server as server
+
+
+@pytest.fixture
+def client(stub_ticker, monkeypatch):
+    bars = run.make_bars(300)
+    monkeypatch.setattr(api_routes, '_download', lambda symbols, period: pd.concat({s: bars for s in symbols}, axis=1))
+    monkeypatch.setattr(api_routes, '_fetch_quotes', lambda symbols: {})
+    monkeypatch.setattr(api_routes.handler, 'cache', run.NoCache())
+    # Бары заглушки заканчиваются в прошлом: period отсчитывается от сегодняшнего дня и их бы отрезал
+    monkeypatch.setattr(api_routes, 'fetch_history', lambda symbol, period, **view: bars.iloc[-252:])
+    return server.app.test_client()
+
+
+def read_ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('fmt', ['records', 'columnar'])
+def test_history_stream_joins_to_regular_response(client, monkeypatch, fmt):
+    monkeypatch.setattr(api_routes, 'STREAM_CHUNK_ROWS', 100)
+    body = {'symbol': 'AAA', 'period': '1y', 'format': fmt}
+    expected = client.post('/api/history', json=body).get_json()["data"]
+
+    lines = read_ndjson(client.post('/api/history', json={**body, 'stream': True}))
+
+    assert expected
+    if fmt == 'records':
+        assert lines == expected
+    else:
+        # По записи с колонками на кусок из STREAM_CHUNK_ROWS баров
+        assert [len(line["date"]) for line in lines] == [100, 100, 52]
+        assert {key: sum((line[key] for line in lines), []) for key in expected} == expected
+
+
+def test_accept_header_requests_stream(client):
+    body = {'symbol': 'AAA', 'period': '1y'}
+
+    by_flag = client.post('/api/history', json={**body, 'stream': 'true'})
+    by_accept = client.post('/api/history', json=body, headers={'Accept': 'application/x-ndjson'})
+
+    assert read_ndjson(by_accept) == read_ndjson(by_flag)
+
+
+def test_batch_stream_has_record_per_symbol(client):
+    body = {'symbols': ['AAA', 'BBB'], 'period': '1y'}
+    expected = client.post('/api/history/batch', json=body).get_json()["data"]
+
+    lines = read_ndjson(client.post('/api/history/batch', json={**body, 'stream': 1}))
+
+    assert {line["symbol"]: line["data"] for line in lines} == expected
+
+
+def test_profile_stream_yields_header_sections_and_summary(client):
+    lines = read_ndjson(client.post('/api/profile', json={
+        'symbol': 'AAA', 'sections': ['company_info', 'news'], 'stream': True
+    }))
+
+    assert lines[0]["success"] is True and lines[0]["symbol"] == 'AAA'
+    assert sorted(line["section"] for line in lines[1:-1]) == ['company_info', 'news']
+    assert set(lines[-1]) == {"timings_ms", "upstream"}
+
+
+def test_error_while_streaming_ends_with_error_line(client, monkeypatch):
+    def failing(*args, **kwargs):
+        yield [{"symbol": 'AAA'}]
+        raise RuntimeError('upstream went away')
+    monkeypatch.setattr(api_routes, 'iter_history', failing)
+
+    lines = read_ndjson(client.post('/api/history', json={'symbol': 'AAA', 'stream': True}))
+
+    assert lines == [{"symbol": 'AAA'}, {"error": 'upstream went away'}]
@@ -0,0 +1,110 @@
+# tests/test_yfinance_handler.py
+import threading
+
+import pytest
+
+import run
+import upstream
+import api_routes
+from yfinance_handler import YFinanceHandler
+
+
+class BarrierTicker(run.StubTicker):
+    """
+    StubTicker, у которого news и calendar ждут друг друга на барьере:
+    обе секции получают данные, только если загружаются одновременно
+    """
+
+    def __init__(self, symbol):
+        self._barrier = threading.Barrier(2, timeout=5)
+        super().__init__(symbol)
+
+    @property
+    def news(self):
+        self._barrier.wait()
+        return self._news
+
+    @news.setter
+    def news(self, value):
+        self._news = value
+
+    @property
+    def calendar(self):
+        self._barrier.wait()
+        return self._calendar
+
+    @calendar.setter
+    def calendar(self, value):
+        self._calendar = value
+
+
+@pytest.fixture
+def handler():
+    return YFinanceHandler(cache=run.NoCache())
+
+
+def test_sections_are_fetched_concurrently(handler, monkeypatch):
+    monkeypatch.setattr(upstream, 'ticker', BarrierTicker)
+
+    result = handler.get_ticker_info('AAA', sections=['earnings', 'news'])
+
+    assert result["data"]["news"]
+    assert result["data"]["earnings"]["next_earnings_date"]
+    assert result["upstream"]["errors"] == {}
+
+
+def test_concurrent_and_sequential_results_match(handler, monkeypatch):
+    ticker = run.StubTicker('AAA')
+    monkeypatch.setattr(upstream, 'ticker', lambda symbol: ticker)
+
+    concurrent = handler.get_ticker_info('AAA')
+    sequential = handler.get_ticker_info('AAA', concurrent=False)
+
+    # Сравнение через JSON: в таблицах есть NaN, а NaN != NaN
+    assert list(concurrent["data"]) == list(sequential["data"])
+    assert api_routes.json.dumps(concurrent["data"]) == api_routes.json.dumps(sequential["data"])
+
+
+def test_failed_section_does_not_break_others(handler, stub_ticker, monkeypatch):
+    def broken(plan):
+        raise RuntimeError('section failed')
+    monkeypatch.setattr(handler, '_get_recent_news', broken)
+
+    result = handler.get_ticker_info('AAA', sections=['company_info', 'news'])
+
+    assert result["success"] is True
+    assert result["data"]["news"] == []
+    assert result["data"]["company_info"]["name"] == run.make_info()['longName']
+
+
+def test_fields_project_response_and_plan(handler, stub_ticker):
+    result = handler.get_ticker_info('AAA', fields=['company_info.name', 'company_info.missing.key', 'news'])
+
+    assert result["data"]["company_info"] == {"name": run.make_info()['longName'], "missing": {"key": None}}
+    assert len(result["data"]["news"]) == 5
+    assert list(result["data"]) == ['company_info', 'news']
+    assert result["upstream"]["planned"] == ['info', 'news']
+
+
+def test_explicit_section_is_kept_whole_next_to_fields(handler, stub_ticker):
+    full = handler.get_ticker_info('AAA', sections=['key_metrics'])["data"]["key_metrics"]
+
+    result = handler.get_ticker_info('AAA', sections=['key_metrics'], fields=['company_info.sector'])
+
+    assert result["data"]["key_metrics"] == full
+    assert result["data"]["company_info"] == {"sector": run.make_info().get('sector')}
+
+
+def test_stream_projects_each_section(handler, stub_ticker):
+    records = list(handler.iter_ticker_info('AAA', fields=['company_info.name', 'news']))
+
+    sections = {record["section"]: record["data"] for record in records if "section" in record}
+    assert sections["company_info"] == {"name": run.make_info()['longName']}
+    assert len(sections["news"]) == 5
+
+
+def test_unknown_section_is_an_error(handler, stub_ticker):
+    result = handler.get_ticker_info('AAA', fields=['company_info.name', 'bogus.key'])
+
+    assert result == {"success": False, "error": "Unknown sections: bogus", "symbol": 'AAA'}
+    assert api_routes.parse_profile_request({'sections': 'news,bogus'}) == (None, "Unknown sections: bogus")
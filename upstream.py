@@ -0,0 +1,120 @@
+# upstream.py
+import time
+import logging
+
+import yfinance as yf
+
+import http_session
+import metrics
+from governor import governor
+from singleflight import SingleFlight
+from shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Общий для процесса слой объединения одинаковых запросов к Yahoo
+_flight = SingleFlight()
+
+# TTL ресурсов в общем (межпроцессном) кэше, секунды
+RESOURCE_TTLS = {
+    "info": 15,
+    "quotes": 15,
+    "options": 300,
+    "download": 60,
+    "financials": 12 * 3600,
+    "balance_sheet": 12 * 3600,
+    "cashflow": 12 * 3600
+}
+DEFAULT_TTL = 60
+
+
+def ticker(symbol):
+    """yf.Ticker на общей сессии процесса (пул соединений, cookie/crumb, повторы)"""
+    return yf.Ticker(symbol, session=http_session.get_session())
+
+
+def call(symbol, resource, params, fn):
+    """
+    Выполнить запрос к upstream через общий single-flight и регулятор скорости
+
+    Объединенные запросы занимают у регулятора одно разрешение; если его не
+    удалось получить вовремя - governor.UpstreamBusy.
+
+    Args:
+        symbol: Тикер (или несколько тикеров через запятую)
+        resource: Имя ресурса ('info', 'history', 'financials', ...)
+        params: Hashable-параметры, влияющие на результат (например, (period,))
+        fn: Функция без аргументов, выполняющая сам запрос
+    """
+    return _flight.do((symbol.upper(), resource, params), lambda: governor.run(lambda: _observed(resource, fn)))
+
+
+def cached_call(symbol, resource, params, fn, ttl=None):
+    """
+    То же, что call, но сначала смотрит в общий для воркеров кэш (shared_cache)
+
+    Свежий результат записывается в кэш на ttl секунд (по умолчанию из
+    RESOURCE_TTLS), поэтому другой воркер не пойдет за ним в Yahoo повторно.
+    Ошибки не кэшируются.
+    """
+    if shared_cache is not None:
+        hit = shared_cache.get(_cache_key(symbol, resource, params))
+        metrics.cache_lookup("upstream", "miss" if hit is None else "shared")
+        if hit is not None:
+            return hit[0]
+    return refresh(symbol, resource, params, fn, ttl)
+
+
+def peek(symbol, resource, params):
+    """Значение ресурса из общего кэша без запроса к upstream (None, если его там нет)"""
+    if shared_cache is None:
+        return None
+    hit = shared_cache.get(_cache_key(symbol, resource, params))
+    return hit[0] if hit is not None else None
+
+
+def refresh(symbol, resource, params, fn, ttl=None):
+    """Запросить ресурс в обход кэша и записать результат туда, где его ищет cached_call"""
+    ttl = RESOURCE_TTLS.get(resource, DEFAULT_TTL) if ttl is None else ttl
+    value = call(symbol, resource, params, fn)
+    if shared_cache is not None:
+        shared_cache.set(_cache_key(symbol, resource, params), value, ttl)
+    return value
+
+
+class GovernedTicker:
+    """
+    yf.Ticker для локального хранилища цен: через call (single-flight и
+    регулятор) идут только сетевые загрузки ticker.history(), а чтения
+    хранилищем своего SQLite разрешений у регулятора не занимают
+    """
+
+    def __init__(self, ticker):
+        self._ticker = ticker
+        self.ticker = ticker.ticker
+
+    def history(self, **kwargs):
+        params = tuple(sorted(kwargs.items()))
+        return call(self.ticker, 'history', params, lambda: self._ticker.history(**kwargs))
+
+
+def _cache_key(symbol, resource, params):
+    return ("upstream", symbol.upper(), resource, params)
+
+
+def _observed(resource, fn):
+    """Вызов upstream с записью длительности и ошибок в метрики ресурса"""
+    started = time.perf_counter()
+    error = None
+    try:
+        return fn()
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        metrics.observe_upstream(resource, time.perf_counter() - started, error)
+
+
+def stats():
+    """Счётчики объединённых (coalesced) вызовов"""
+    return _flight.stats()
@@ -0,0 +1,247 @@
+# yfinance_asgi.py
+import io
+import os
+import sys
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from werkzeug.wrappers import Request, Response
+import yfinance as yf
+
+import api_routes
+import prewarm
+import http_cache
+from governor import governor
+
+# Настройка логирования (как в yfinance_server)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+# Сколько запросов обрабатывается одновременно; остальные ждут в очереди
+MAX_CONCURRENCY = int(os.environ.get('YF_ASGI_MAX_CONCURRENCY', 256))
+
+# Потоки для маршрутов API (загрузка из кэша или Yahoo, сериализация). Должно быть
+# не меньше YF_UPSTREAM_MAX_IN_FLIGHT: иначе регулятор upstream не получит столько
+# одновременных запросов, сколько разрешает; потоки сверх него обслуживают ответы
+# из кэша, пока остальные ждут Yahoo
+UPSTREAM_WORKERS = int(os.environ.get('YF_ASGI_UPSTREAM_WORKERS', 64))
+
+# Сколько секунд запрос может ждать свободного слота, прежде чем получит 503
+QUEUE_TIMEOUT = float(os.environ.get('YF_ASGI_QUEUE_TIMEOUT', 30))
+
+executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix='yf-asgi')
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS')
+]
+
+
+async def _blocking(fn, *args):
+    """Выполнить блокирующий вызов yfinance в ограниченном пуле потоков"""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def _json(payload, status=200, headers=None):
+    """JSON-ответ тем же провайдером, что и у Flask-приложения"""
+    response = api_routes.json.response(payload)
+    response.status_code = status
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+def _render(result):
+    """Результат маршрута api_routes: Response или (payload, status[, headers]), как у view Flask"""
+    if isinstance(result, Response):
+        return result
+    return _json(*result)
+
+
+async def health(req, data):
+    """Health check endpoint"""
+    return _json({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "mode": "asgi"
+    })
+
+
+async def index(req, data):
+    """Root endpoint"""
+    return _json({
+        "service": "YFinance API Server",
+        "version": "1.0.1",
+        "status": "running",
+        "mode": "asgi",
+        "yfinance_version": yf.__version__
+    })
+
+
+ROUTES = {
+    ('GET', '/health'): health,
+    ('GET', '/'): index
+}
+ROUTES.update({('POST', path): route for path, route in api_routes.ROUTES.items()})
+
+# Маршруты без ограничения конкурентности (не ходят в upstream)
+UNLIMITED_ROUTES = {health, index}
+
+
+def _environ(scope):
+    """WSGI-окружение запроса: werkzeug Request разбирает Accept, Accept-Encoding и If-None-Match так же, как Flask"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO()
+    }
+    for name, value in scope.get('headers', ()):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class YFinanceASGI:
+    """
+    Асинхронный (ASGI) режим сервера с теми же контрактами API, что и у Flask:
+    /api/stock, /api/stocks, /api/history, /api/history/batch, /api/profile,
+    /api/financials, /api/options и /api/indicators - включая NDJSON-поток
+    (stream / Accept: application/x-ndjson), бинарные форматы по Accept (406,
+    если формат недоступен), ETag/304, gzip/brotli и Cache-Control
+    (http_cache.finalize). Служебные маршруты Flask (/api/stats, /metrics,
+    /api/profiles/<id>) и профилирование запросов здесь не обслуживаются - 404.
+
+    Блокирующие вызовы yfinance выполняются в пуле из UPSTREAM_WORKERS потоков,
+    число одновременно обрабатываемых запросов ограничено MAX_CONCURRENCY;
+    ожидание слота дольше QUEUE_TIMEOUT секунд - 503.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, queue_timeout=QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        req = Request(_environ(scope))
+        if req.method == 'OPTIONS':
+            await self._send(send, req, _json({}))
+            return
+
+        route = ROUTES.get((req.method, scope['path']))
+        if route is None:
+            await self._send(send, req, _json({"error": "Not found"}, 404))
+            return
+
+        data, error = api_routes.parse_body(await self._read_body(receive))
+        if error:
+            await self._send(send, req, _json({"error": error}, 400))
+            return
+
+        if route in UNLIMITED_ROUTES:
+            await self._respond(send, req, scope['path'], data, await route(req, data))
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            await self._send(send, req, _json({"error": "Server is busy, retry later"}, 503,
+                                              {'Retry-After': str(int(self.queue_timeout))}))
+            return
+
+        # Слот занят до конца отправки: потоковый ответ обращается к upstream по мере чтения
+        try:
+            response = _render(await _blocking(route, req, data))
+            if prewarm.scheduler.enabled and response.status_code < 400:
+                prewarm.scheduler.record(api_routes.request_symbols(data))
+            await self._respond(send, req, scope['path'], data, response)
+        finally:
+            self._semaphore.release()
+
+    async def _respond(self, send, req, path, data, response):
+        """ETag/304, сжатие и Cache-Control - тем же http_cache.finalize, что и во Flask"""
+        max_age = api_routes.route_max_age(path, data)
+        response = await _blocking(http_cache.finalize, req, response, max_age)
+        await self._send(send, req, response)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                logger.info(
+                    f"YFinance ASGI server starting: max concurrency {self.max_concurrency}, "
+                    f"upstream workers {UPSTREAM_WORKERS}"
+                )
+                if UPSTREAM_WORKERS < governor.max_in_flight:
+                    logger.warning(
+                        f"YF_ASGI_UPSTREAM_WORKERS ({UPSTREAM_WORKERS}) is below YF_UPSTREAM_MAX_IN_FLIGHT "
+                        f"({governor.max_in_flight}): upstream concurrency is limited by the worker pool"
+                    )
+                api_routes.start_background_tasks()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    @staticmethod
+    async def _send(send, req, response):
+        # Заголовки - как их отдал бы Flask (у 304 без Content-Type и Content-Length)
+        headers = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in response.get_wsgi_headers(req.environ).items()
+        ] + CORS_HEADERS
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        if not response.is_streamed:
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+            return
+        chunks = iter(response.iter_encoded())
+        while True:
+            chunk = await _blocking(next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+app = YFinanceASGI()
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8000))
+    logger.info(f"Starting YFinance ASGI server on port {port}")
+
+    uvicorn.run(app, host='0.0.0.0', port=port)
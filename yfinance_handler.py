@@ -1,61 +1,290 @@
 # yfinance_handler.py
-import yfinance as yf
+import os
+import time
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import upstream
+import metrics
+import profiling
+from section_cache import SectionCache
+from shared_cache import shared_cache
+from fetch_plan import FetchPlan
+from governor import UpstreamBusy
+from serializers import frame_to_dict, serialize_history, format_dates, FRAME_FORMATS
 
 logger = logging.getLogger(__name__)
 
+# Секции get_ticker_info и методы, которые их строят
+SECTION_METHODS = {
+    "company_info": "_get_company_overview",
+    "current_trading": "_get_trading_info",
+    "financial_statements": "_get_financial_statements",
+    "key_metrics": "_get_key_metrics",
+    "earnings": "_get_earnings_data",
+    "dividends": "_get_dividends_data",
+    "analyst_recommendations": "_get_analyst_data",
+    "institutional_holders": "_get_institutional_data",
+    "historical_data": "_get_historical_prices",
+    "options": "_get_options_data",
+    "news": "_get_recent_news"
+}
+
+# Ресурсы yfinance, которые нужны каждой секции (см. fetch_plan.RESOURCE_FETCHERS)
+SECTION_RESOURCES = {
+    "company_info": ("info",),
+    "current_trading": ("info",),
+    "financial_statements": (
+        "financials", "quarterly_financials", "balance_sheet",
+        "quarterly_balance_sheet", "cashflow", "quarterly_cashflow"
+    ),
+    "key_metrics": ("info",),
+    "earnings": ("quarterly_earnings", "earnings", "calendar"),
+    "dividends": ("info", "dividends"),
+    "analyst_recommendations": ("recommendations", "info", "earnings_estimate", "revenue_estimate"),
+    "institutional_holders": ("major_holders", "institutional_holders", "mutualfund_holders"),
+    "historical_data": ("history",),
+    "options": ("options", "option_chain"),
+    "news": ("news",)
+}
+
+# Параметры запроса, от которых зависит содержимое секции (входят в ключ кэша)
+SECTION_PARAMS = {
+    "financial_statements": ("frame_format",),
+    "earnings": ("frame_format",),
+    "analyst_recommendations": ("frame_format",),
+    "historical_data": ("period",)
+}
+
+# TTL секций в секундах: котировки и новости живут недолго, отчетность - долго
+SECTION_TTLS = {
+    "company_info": 6 * 3600,
+    "current_trading": 15,
+    "financial_statements": 12 * 3600,
+    "key_metrics": 300,
+    "earnings": 3600,
+    "dividends": 6 * 3600,
+    "analyst_recommendations": 3600,
+    "institutional_holders": 12 * 3600,
+    "historical_data": 300,
+    "options": 60,
+    "news": 120
+}
+
+# Общий ограниченный пул для параллельной загрузки секций
+SECTION_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('YF_SECTION_WORKERS', 8)),
+    thread_name_prefix='yf-section'
+)
+
 class YFinanceHandler:
-    def __init__(self):
-        self.cache = {}
-        self.cache_duration = 60  # секунды
+    def __init__(self, cache=None):
+        self.cache_duration = 60  # секунды, TTL по умолчанию
+        self.cache = cache or SectionCache(
+            max_entries=int(os.environ.get('YF_CACHE_MAX_ENTRIES', 2048)),
+            max_bytes=int(os.environ.get('YF_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            default_ttl=self.cache_duration,
+            backend=shared_cache
+        )
     
-    def get_ticker_info(self, symbol, period='1y'):
+    def get_ticker_info(self, symbol, period='1y', concurrent=True, frame_format='nested', sections=None, fields=None,
+                        profile=False):
         """
         Получить полную финансовую информацию по тикеру
         
         Args:
             symbol: Тикер компании (например, 'AAPL')
             period: Период для исторических данных (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)
+            concurrent: Загружать секции параллельно в общем пуле SECTION_EXECUTOR
+            frame_format: Формат таблиц отчетности - 'nested' или 'columnar'
+            sections: Список секций (по умолчанию все); ресурсы остальных секций не запрашиваются
+            fields: Список полей вида 'section' или 'section.key.subkey'; ответ урезается
+                до этих полей, а секции берутся из их префиксов
+            profile: Снять профиль вызова (profiling.SamplingProfiler); в ответе
+                появится "profile" с id сохраненного профиля и разбивкой времени
         
         Returns:
-            Словарь со всей доступной финансовой информацией
+            Словарь со всей доступной финансовой информацией; в upstream.fetched -
+            ресурсы Yahoo, к которым действительно обращались
         """
+        if profile:
+            with profiling.SamplingProfiler(f"get_ticker_info {symbol}") as profiler:
+                result = self.get_ticker_info(symbol, period, concurrent, frame_format, sections, fields)
+            result["profile"] = profiler.save()
+            return result
+        
         try:
-            ticker = yf.Ticker(symbol)
+            if frame_format not in FRAME_FORMATS:
+                raise ValueError(f"Unknown frame format: {frame_format}")
+            names = self._resolve_sections(sections, fields)
+            
+            started = time.perf_counter()
+            plan = self._make_plan(symbol, names, {"period": period, "frame_format": frame_format})
+            
+            # Собираем все данные (через кэш секций)
+            if concurrent:
+                futures = {
+                    name: SECTION_EXECUTOR.submit(profiling.bind(self._timed_section), plan, symbol, name)
+                    for name in names
+                }
+                results = {name: self._section_result(name, future) for name, future in futures.items()}
+            else:
+                results = {
+                    name: self._timed_section(plan, symbol, name)
+                    for name in names
+                }
+            plan.log(symbol)
             
-            # Собираем все данные
+            data = {name: value for name, (value, _) in results.items()}
             result = {
                 "success": True,
                 "symbol": symbol,
                 "timestamp": datetime.now().isoformat(),
-                "data": {
-                    "company_info": self._get_company_overview(ticker),
-                    "current_trading": self._get_trading_info(ticker),
-                    "financial_statements": self._get_financial_statements(ticker),
-                    "key_metrics": self._get_key_metrics(ticker),
-                    "earnings": self._get_earnings_data(ticker),
-                    "dividends": self._get_dividends_data(ticker),
-                    "analyst_recommendations": self._get_analyst_data(ticker),
-                    "institutional_holders": self._get_institutional_data(ticker),
-                    "historical_data": self._get_historical_prices(ticker, period),
-                    "options": self._get_options_data(ticker),
-                    "news": self._get_recent_news(ticker)
-                }
+                "data": self._project_fields(data, fields) if fields else data,
+                "timings_ms": {name: elapsed for name, (_, elapsed) in results.items()}
             }
+            result["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 1)
+            result["upstream"] = plan.summary()
             
             return result
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error fetching complete info for {symbol}: {str(e)}")
             return {"success": False, "error": str(e), "symbol": symbol}
     
-    def _get_company_overview(self, ticker):
+    def iter_ticker_info(self, symbol, period='1y', frame_format='nested', sections=None, fields=None):
+        """
+        То же, что get_ticker_info, но по одной записи на секцию по мере готовности
+        
+        Yields:
+            {"symbol", "timestamp"}, затем {"section", "data", "elapsed_ms"} для каждой
+            секции и в конце {"timings_ms", "upstream"}; при ошибке - {"success": False, "error"}
+        """
+        try:
+            if frame_format not in FRAME_FORMATS:
+                raise ValueError(f"Unknown frame format: {frame_format}")
+            names = self._resolve_sections(sections, fields)
+            
+            started = time.perf_counter()
+            plan = self._make_plan(symbol, names, {"period": period, "frame_format": frame_format})
+        except UpstreamBusy:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching complete info for {symbol}: {str(e)}")
+            yield {"success": False, "error": str(e), "symbol": symbol}
+            return
+        
+        yield {"success": True, "symbol": symbol, "timestamp": datetime.now().isoformat()}
+        
+        futures = {
+            SECTION_EXECUTOR.submit(profiling.bind(self._timed_section), plan, symbol, name): name
+            for name in names
+        }
+        timings = {}
+        for future in as_completed(futures):
+            name = futures[future]
+            value, elapsed = self._section_result(name, future)
+            timings[name] = elapsed
+            if fields:
+                value = self._project_fields({name: value}, fields).get(name)
+            yield {"section": name, "data": value, "elapsed_ms": elapsed}
+        plan.log(symbol)
+        
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        yield {"timings_ms": timings, "upstream": plan.summary()}
+    
+    def _resolve_sections(self, sections=None, fields=None):
+        """Список секций для запроса: явный, по префиксам fields или все"""
+        names = list(sections or [])
+        for field in fields or []:
+            names.append(field.split('.', 1)[0])
+        if not names:
+            return list(SECTION_METHODS)
+        
+        unknown = [name for name in names if name not in SECTION_METHODS]
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(dict.fromkeys(unknown))}")
+        # Порядок секций - как в полном ответе
+        return [name for name in SECTION_METHODS if name in names]
+    
+    def _project_fields(self, data, fields):
+        """Оставить в данных только перечисленные поля ('section' или 'section.key.subkey')"""
+        projected = {}
+        for field in fields:
+            path = field.split('.')
+            value = data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        
+        # Секции, запрошенные явно (без полей), остаются целиком
+        for name, value in data.items():
+            if not any(field.split('.', 1)[0] == name for field in fields):
+                projected[name] = value
+        return projected
+    
+    def _make_plan(self, symbol, sections, params):
+        """План запросов: объединение ресурсов всех запрошенных секций"""
+        resources = [resource for name in sections for resource in SECTION_RESOURCES[name]]
+        return FetchPlan(upstream.ticker(symbol), resources, params)
+    
+    def _timed_section(self, plan, symbol, name):
+        """Секция и время её получения в миллисекундах"""
+        started = time.perf_counter()
+        value = self._get_cached_section(plan, symbol, name)
+        elapsed = time.perf_counter() - started
+        metrics.observe_section(name, elapsed)
+        return value, round(elapsed * 1000, 1)
+    
+    def _section_result(self, name, future):
+        """Результат секции из пула; ошибка одной секции не роняет остальные"""
+        try:
+            return future.result()
+        except UpstreamBusy:
+            raise
+        except Exception as e:
+            logger.error(f"Error in section {name}: {str(e)}")
+            return ({} if name not in ("historical_data", "news") else []), None
+    
+    def _get_cached_section(self, plan, symbol, name):
+        """Секция из кэша; при промахе строится по общему плану запроса"""
+        params = tuple(plan.params.get(param) for param in SECTION_PARAMS.get(name, ()))
+        value, _ = self.cache.get_or_load(
+            (symbol.upper(), name, params),
+            lambda: self._load_section(plan, name),
+            ttl=SECTION_TTLS.get(name, self.cache_duration),
+            # Фоновое обновление идёт по собственному плану, а не по плану исходного запроса
+            refresh=lambda: self._load_section(self._make_plan(symbol, (name,), plan.params), name),
+            # Кэшируются все успешные результаты, в том числе пустые (нет дивидендов, опционов)
+            store_if=lambda result: result[1]
+        )
+        return value
+    
+    def _load_section(self, plan, name):
+        """
+        Секция и признак успеха (value, ok): ok=False, если какой-то ресурс секции
+        не загрузился - тогда пустое значение означает ошибку, а не отсутствие данных
+        """
+        value = getattr(self, SECTION_METHODS[name])(plan)
+        return value, not any(plan.failed(resource) for resource in SECTION_RESOURCES[name])
+    
+    def cache_stats(self):
+        """Счётчики кэша секций для подбора его размера"""
+        return self.cache.stats()
+    
+    def _get_company_overview(self, plan):
         """Базовая информация о компании"""
         try:
-            info = ticker.info
+            info = plan.get("info")
             return {
                 "name": info.get('longName', info.get('shortName')),
                 "sector": info.get('sector'),
@@ -69,6 +298,8 @@ class YFinanceHandler:
                 "description": info.get('longBusinessSummary'),
                 "officers": self._get_company_officers(info)
             }
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in company overview: {str(e)}")
             return {}
@@ -87,10 +318,10 @@ class YFinanceHandler:
                 })
         return officers
     
-    def _get_trading_info(self, ticker):
+    def _get_trading_info(self, plan):
         """Текущая торговая информация"""
         try:
-            info = ticker.info
+            info = plan.get("info")
             return {
                 "current_price": info.get('currentPrice', info.get('regularMarketPrice')),
                 "previous_close": info.get('previousClose'),
@@ -114,30 +345,35 @@ class YFinanceHandler:
                 "quote_type": info.get('quoteType'),
                 "exchange_timezone": info.get('exchangeTimezoneName')
             }
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in trading info: {str(e)}")
             return {}
     
-    def _get_financial_statements(self, ticker):
+    def _get_financial_statements(self, plan):
         """Финансовые отчеты"""
         try:
+            orient = plan.params.get("frame_format", "nested")
             financials = {
-                "income_statement": self._convert_df_to_dict(ticker.financials),
-                "quarterly_income_statement": self._convert_df_to_dict(ticker.quarterly_financials),
-                "balance_sheet": self._convert_df_to_dict(ticker.balance_sheet),
-                "quarterly_balance_sheet": self._convert_df_to_dict(ticker.quarterly_balance_sheet),
-                "cash_flow": self._convert_df_to_dict(ticker.cashflow),
-                "quarterly_cash_flow": self._convert_df_to_dict(ticker.quarterly_cashflow)
+                "income_statement": self._convert_df_to_dict(plan.get("financials"), orient),
+                "quarterly_income_statement": self._convert_df_to_dict(plan.get("quarterly_financials"), orient),
+                "balance_sheet": self._convert_df_to_dict(plan.get("balance_sheet"), orient),
+                "quarterly_balance_sheet": self._convert_df_to_dict(plan.get("quarterly_balance_sheet"), orient),
+                "cash_flow": self._convert_df_to_dict(plan.get("cashflow"), orient),
+                "quarterly_cash_flow": self._convert_df_to_dict(plan.get("quarterly_cashflow"), orient)
             }
             return financials
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in financial statements: {str(e)}")
             return {}
     
-    def _get_key_metrics(self, ticker):
+    def _get_key_metrics(self, plan):
         """Ключевые финансовые метрики"""
         try:
-            info = ticker.info
+            info = plan.get("info")
             return {
                 "valuation_metrics": {
                     "pe_ratio": info.get('trailingPE'),
@@ -179,35 +415,40 @@ class YFinanceHandler:
                     "cash_per_share": info.get('totalCashPerShare')
                 }
             }
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in key metrics: {str(e)}")
             return {}
     
-    def _get_earnings_data(self, ticker):
+    def _get_earnings_data(self, plan):
         """Данные о прибыли"""
         try:
+            orient = plan.params.get("frame_format", "nested")
             earnings_data = {
                 "earnings_dates": [],
-                "quarterly_earnings": self._convert_df_to_dict(ticker.quarterly_earnings) if hasattr(ticker, 'quarterly_earnings') else {},
-                "yearly_earnings": self._convert_df_to_dict(ticker.earnings) if hasattr(ticker, 'earnings') else {}
+                "quarterly_earnings": self._convert_df_to_dict(plan.get("quarterly_earnings", None), orient),
+                "yearly_earnings": self._convert_df_to_dict(plan.get("earnings", None), orient)
             }
             
             # Получаем календарь прибыли
-            if hasattr(ticker, 'calendar') and ticker.calendar is not None:
-                cal = ticker.calendar
+            cal = plan.get("calendar", None)
+            if cal is not None:
                 if isinstance(cal, pd.DataFrame) and not cal.empty:
                     earnings_data["next_earnings_date"] = cal.to_dict('records')
                 
             return earnings_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in earnings data: {str(e)}")
             return {}
     
-    def _get_dividends_data(self, ticker):
+    def _get_dividends_data(self, plan):
         """Данные о дивидендах"""
         try:
-            info = ticker.info
-            dividends = ticker.dividends
+            info = plan.get("info")
+            dividends = plan.get("dividends")
             
             dividend_data = {
                 "dividend_rate": info.get('dividendRate'),
@@ -222,20 +463,22 @@ class YFinanceHandler:
             
             # История дивидендов
             if not dividends.empty:
-                for date, amount in dividends.items():
-                    dividend_data["dividend_history"].append({
-                        "date": date.strftime('%Y-%m-%d'),
-                        "amount": float(amount)
-                    })
+                dividend_data["dividend_history"] = [
+                    {"date": date, "amount": amount}
+                    for date, amount in zip(format_dates(dividends.index), dividends.to_numpy(dtype=float).tolist())
+                ]
             
             return dividend_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in dividends data: {str(e)}")
             return {}
     
-    def _get_analyst_data(self, ticker):
+    def _get_analyst_data(self, plan):
         """Рекомендации аналитиков"""
         try:
+            orient = plan.params.get("frame_format", "nested")
             analyst_data = {
                 "recommendations": [],
                 "price_targets": {},
@@ -246,8 +489,8 @@ class YFinanceHandler:
             }
             
             # Рекомендации
-            if hasattr(ticker, 'recommendations') and ticker.recommendations is not None:
-                recs = ticker.recommendations
+            recs = plan.get("recommendations", None)
+            if recs is not None:
                 if not recs.empty:
                     recent_recs = recs.tail(10)  # Последние 10 рекомендаций
                     for idx, row in recent_recs.iterrows():
@@ -260,7 +503,7 @@ class YFinanceHandler:
                         })
             
             # Целевые цены
-            info = ticker.info
+            info = plan.get("info")
             analyst_data["price_targets"] = {
                 "current": info.get('currentPrice'),
                 "target_high": info.get('targetHighPrice'),
@@ -271,19 +514,19 @@ class YFinanceHandler:
             }
             
             # Оценки прибыли
-            if hasattr(ticker, 'earnings_estimate'):
-                analyst_data["earnings_estimates"] = self._convert_df_to_dict(ticker.earnings_estimate)
+            analyst_data["earnings_estimates"] = self._convert_df_to_dict(plan.get("earnings_estimate", None), orient)
             
             # Оценки выручки
-            if hasattr(ticker, 'revenue_estimate'):
-                analyst_data["revenue_estimates"] = self._convert_df_to_dict(ticker.revenue_estimate)
+            analyst_data["revenue_estimates"] = self._convert_df_to_dict(plan.get("revenue_estimate", None), orient)
             
             return analyst_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in analyst data: {str(e)}")
             return {}
     
-    def _get_institutional_data(self, ticker):
+    def _get_institutional_data(self, plan):
         """Данные об институциональных держателях"""
         try:
             institutional_data = {
@@ -293,15 +536,15 @@ class YFinanceHandler:
             }
             
             # Основные держатели
-            if hasattr(ticker, 'major_holders') and ticker.major_holders is not None:
-                mh = ticker.major_holders
+            mh = plan.get("major_holders", None)
+            if mh is not None:
                 if not mh.empty:
                     for idx, row in mh.iterrows():
                         institutional_data["major_holders"][row[1]] = row[0]
             
             # Институциональные держатели
-            if hasattr(ticker, 'institutional_holders') and ticker.institutional_holders is not None:
-                ih = ticker.institutional_holders
+            ih = plan.get("institutional_holders", None)
+            if ih is not None:
                 if not ih.empty:
                     for idx, row in ih.iterrows():
                         institutional_data["institutional_holders"].append({
@@ -313,8 +556,8 @@ class YFinanceHandler:
                         })
             
             # Держатели взаимных фондов
-            if hasattr(ticker, 'mutualfund_holders') and ticker.mutualfund_holders is not None:
-                mfh = ticker.mutualfund_holders
+            mfh = plan.get("mutualfund_holders", None)
+            if mfh is not None:
                 if not mfh.empty:
                     for idx, row in mfh.iterrows():
                         institutional_data["mutualfund_holders"].append({
@@ -326,35 +569,23 @@ class YFinanceHandler:
                         })
             
             return institutional_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in institutional data: {str(e)}")
             return {}
     
-    def _get_historical_prices(self, ticker, period='1y'):
-        """Исторические цены"""
+    def _get_historical_prices(self, plan):
+        """Исторические цены (период берется из параметров плана)"""
         try:
-            hist = ticker.history(period=period)
-            historical_data = []
-            
-            if not hist.empty:
-                for index, row in hist.iterrows():
-                    historical_data.append({
-                        "date": index.strftime('%Y-%m-%d'),
-                        "open": round(row['Open'], 2),
-                        "high": round(row['High'], 2),
-                        "low": round(row['Low'], 2),
-                        "close": round(row['Close'], 2),
-                        "volume": int(row['Volume']),
-                        "dividends": float(row.get('Dividends', 0)),
-                        "stock_splits": float(row.get('Stock Splits', 0))
-                    })
-            
-            return historical_data
+            return serialize_history(plan.get("history"), actions=True)
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in historical prices: {str(e)}")
             return []
     
-    def _get_options_data(self, ticker):
+    def _get_options_data(self, plan):
         """Данные об опционах"""
         try:
             options_data = {
@@ -363,13 +594,13 @@ class YFinanceHandler:
             }
             
             # Получаем даты экспирации
-            if hasattr(ticker, 'options'):
-                options_data["expiration_dates"] = list(ticker.options)
+            expirations = plan.get("options", None)
+            if expirations is not None:
+                options_data["expiration_dates"] = list(expirations)
                 
                 # Получаем цепочку опционов для ближайшей даты
                 if options_data["expiration_dates"]:
-                    nearest_date = options_data["expiration_dates"][0]
-                    opt = ticker.option_chain(nearest_date)
+                    opt = plan.get("option_chain")
                     
                     # Calls
                     if hasattr(opt, 'calls') and not opt.calls.empty:
@@ -380,17 +611,20 @@ class YFinanceHandler:
                         options_data["options_chain"]["puts"] = opt.puts.head(10).to_dict('records')
             
             return options_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in options data: {str(e)}")
             return {}
     
-    def _get_recent_news(self, ticker):
+    def _get_recent_news(self, plan):
         """Последние новости"""
         try:
             news_data = []
             
-            if hasattr(ticker, 'news'):
-                for item in ticker.news[:5]:  # Последние 5 новостей
+            news = plan.get("news", None)
+            if news is not None:
+                for item in news[:5]:  # Последние 5 новостей
                     news_data.append({
                         "title": item.get('title'),
                         "publisher": item.get('publisher'),
@@ -403,29 +637,16 @@ class YFinanceHandler:
                     })
             
             return news_data
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error in news data: {str(e)}")
             return []
     
-    def _convert_df_to_dict(self, df):
-        """Конвертировать DataFrame в словарь для JSON"""
-        if df is None or df.empty:
-            return {}
-        
+    def _convert_df_to_dict(self, df, orient='nested'):
+        """Конвертировать DataFrame в словарь для JSON ('nested' или 'columnar')"""
         try:
-            # Конвертируем индекс в строку для JSON совместимости
-            result = {}
-            for col in df.columns:
-                result[col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col)] = {}
-                for idx in df.index:
-                    value = df.loc[idx, col]
-                    # Обрабатываем NaN значения
-                    if pd.isna(value):
-                        value = None
-                    elif isinstance(value, (int, float)):
-                        value = float(value)
-                    result[col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col)][str(idx)] = value
-            return result
+            return frame_to_dict(df, orient)
         except Exception as e:
             logger.error(f"Error converting dataframe: {str(e)}")
             return {}
@@ -433,8 +654,8 @@ class YFinanceHandler:
     def get_financial_summary(self, symbol):
         """Получить краткую финансовую сводку"""
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            ticker = upstream.ticker(symbol)
+            info = upstream.cached_call(symbol, 'info', (), lambda: ticker.info)
             
             return {
                 "success": True,
@@ -453,6 +674,8 @@ class YFinanceHandler:
                 }
             }
             
+        except UpstreamBusy:
+            raise
         except Exception as e:
             logger.error(f"Error getting summary for {symbol}: {str(e)}")
             return {"success": False, "error": str(e)}
\ No newline at end of file
@@ -1,12 +1,28 @@
 # yfinance_server.py
 import os
 import sys
+import time
 import logging
-from flask import Flask, request, jsonify
+import functools
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
 import yfinance as yf
 
+import upstream
+import http_session
+import metrics
+import profiling
+from shared_cache import shared_cache
+import options_engine
+import indicators
+import history_views
+import prewarm
+import http_cache
+import api_routes
+from api_routes import handler, start_background_tasks
+from governor import governor
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -16,10 +32,67 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = api_routes.json
 CORS(app)
 
 logger.info("YFinance server starting...")
 
+def profiled(view):
+    """
+    Профилирование запроса по флагу profile=1 (в query или JSON) с токеном
+    в заголовке X-Profile-Token; разбивка времени - в Server-Timing, профиль
+    сохраняется и доступен через /api/profiles/<id>
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        flag = request.args.get('profile', data.get('profile') if isinstance(data, dict) else None)
+        if not flag or str(flag).lower() in ('0', 'false'):
+            return view(*args, **kwargs)
+        if not profiling.check_token(request.headers.get('X-Profile-Token')):
+            return jsonify({"error": "Profiling is not allowed"}), 403
+        
+        with profiling.SamplingProfiler(f"{request.method} {request.path}") as profiler:
+            response = app.make_response(view(*args, **kwargs))
+            # Тело формируется здесь же, чтобы время JSON-кодирования попало в профиль
+            response.get_data()
+        summary = profiler.save()
+        response.headers['X-Profile-Id'] = summary["id"]
+        response.headers['Server-Timing'] = profiling.server_timing(summary)
+        return response
+    return wrapper
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.before_request
+def ensure_background_tasks():
+    """Запуск без post_fork (flask run, сторонний WSGI-сервер) - прогрев стартует с первым запросом"""
+    start_background_tasks()
+
+@app.after_request
+def record_request(response):
+    """Латентность запроса по шаблону маршрута (а не по пути - чтобы не плодить серии)"""
+    started = g.pop('started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    if prewarm.scheduler.enabled and response.status_code < 400:
+        prewarm.scheduler.record(api_routes.request_symbols(request.get_json(silent=True)))
+    return response
+
+@app.after_request
+def conditional_response(response):
+    """ETag и 304 по If-None-Match, Cache-Control по TTL данных маршрута, gzip/brotli"""
+    route = request.url_rule.rule if request.url_rule is not None else None
+    max_age = api_routes.route_max_age(route, request.get_json(silent=True))
+    # Профилированный ответ уникален (X-Profile-Id, Server-Timing)
+    if 'X-Profile-Id' in response.headers:
+        max_age = None
+        response.headers['Cache-Control'] = 'no-store'
+    return http_cache.finalize(request, response, max_age)
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -38,147 +111,105 @@ def index():
         "yfinance_version": yf.__version__
     }), 200
 
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Upstream request statistics"""
+    return jsonify({
+        "upstream": upstream.stats(),
+        "http": http_session.stats(),
+        "governor": governor.stats(),
+        "section_cache": handler.cache_stats(),
+        "option_cache": options_engine.chain_cache.stats(),
+        "indicator_cache": indicators.state_cache.stats(),
+        "history_cache": history_views.base_cache.stats(),
+        "prewarm": prewarm.scheduler.stats() if prewarm.scheduler.enabled else None,
+        "shared_cache": shared_cache.stats() if shared_cache is not None else None
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Metrics in Prometheus text format"""
+    if not metrics.ENABLED:
+        return jsonify({"error": "prometheus_client is not installed"}), 503
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_saved_profile(profile_id):
+    """Saved request profile (speedscope JSON or collapsed stacks)"""
+    if not profiling.check_token(request.headers.get('X-Profile-Token')):
+        return jsonify({"error": "Profiling is not allowed"}), 403
+    fmt = request.args.get('format', 'speedscope')
+    if fmt not in profiling.PROFILE_FORMATS:
+        return jsonify({"error": f"Unknown profile format: {fmt}"}), 400
+    
+    content = profiling.load(profile_id, fmt)
+    if content is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(content, mimetype='application/json' if fmt == 'speedscope' else 'text/plain')
+
+def _dispatch(route):
+    """Маршрут API из api_routes; тело запроса разбирается так же, как в ASGI-режиме"""
+    data, error = api_routes.parse_body(request.get_data())
+    if error:
+        return jsonify({"error": error}), 400
+    return route(request, data)
+
 @app.route('/api/stock', methods=['POST'])
+@profiled
 def get_stock():
     """Get stock information"""
-    try:
-        data = request.json or {}
-        symbol = data.get('symbol')
-        
-        if not symbol:
-            return jsonify({"error": "Symbol is required"}), 400
-        
-        logger.info(f"Fetching data for symbol: {symbol}")
-        
-        # Получаем данные через yfinance
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-        
-        # Базовая информация
-        result = {
-            "success": True,
-            "symbol": symbol,
-            "data": {
-                "price": info.get('currentPrice', info.get('regularMarketPrice')),
-                "previousClose": info.get('previousClose'),
-                "marketCap": info.get('marketCap'),
-                "name": info.get('longName', info.get('shortName')),
-                "currency": info.get('currency'),
-                "exchange": info.get('exchange')
-            }
-        }
-        
-        return jsonify(result), 200
-        
-    except Exception as e:
-        logger.error(f"Error fetching stock data: {str(e)}")
-        return jsonify({
-            "error": str(e),
-            "symbol": symbol
-        }), 500
+    return _dispatch(api_routes.get_stock)
 
 @app.route('/api/history', methods=['POST'])
+@profiled
 def get_history():
     """Get historical data"""
-    try:
-        data = request.json or {}
-        symbol = data.get('symbol')
-        period = data.get('period', '1mo')
-        
-        if not symbol:
-            return jsonify({"error": "Symbol is required"}), 400
-        
-        logger.info(f"Fetching history for {symbol}, period: {period}")
-        
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period)
-        
-        # Конвертируем в список
-        history_data = []
-        for index, row in hist.iterrows():
-            history_data.append({
-                "date": index.strftime('%Y-%m-%d'),
-                "open": round(row['Open'], 2),
-                "high": round(row['High'], 2),
-                "low": round(row['Low'], 2),
-                "close": round(row['Close'], 2),
-                "volume": int(row['Volume'])
-            })
-        
-        return jsonify({
-            "success": True,
-            "symbol": symbol,
-            "period": period,
-            "data": history_data
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error fetching history: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    return _dispatch(api_routes.get_history)
+
+@app.route('/api/stocks', methods=['POST'])
+@profiled
+def get_stocks():
+    """Get stock information for a list of symbols"""
+    return _dispatch(api_routes.get_stocks)
+
+@app.route('/api/history/batch', methods=['POST'])
+@profiled
+def get_history_batch():
+    """Get historical data for a list of symbols"""
+    return _dispatch(api_routes.get_history_batch)
+
+@app.route('/api/profile', methods=['POST'])
+@profiled
+def get_profile():
+    """Get full ticker profile (all sections of YFinanceHandler)"""
+    return _dispatch(api_routes.get_profile)
+
+@app.route('/api/options', methods=['POST'])
+@profiled
+def get_options():
+    """Get option chains for all (or selected) expirations with server-side filtering"""
+    return _dispatch(api_routes.get_options)
+
+@app.route('/api/indicators', methods=['POST'])
+@profiled
+def get_indicators():
+    """Get technical indicators computed over cached daily history"""
+    return _dispatch(api_routes.get_indicators)
 
 @app.route('/api/financials', methods=['POST'])
+@profiled
 def get_financials():
     """Get financial statements"""
-    try:
-        data = request.json or {}
-        symbol = data.get('symbol')
-        
-        if not symbol:
-            return jsonify({"error": "Symbol is required"}), 400
-        
-        logger.info(f"Fetching financials for {symbol}")
-        
-        ticker = yf.Ticker(symbol)
-        
-        # Получаем финансовые данные
-        financials = ticker.financials
-        balance_sheet = ticker.balance_sheet
-        cash_flow = ticker.cashflow
-        
-        # Конвертируем первую колонку каждого отчета
-        result = {
-            "success": True,
-            "symbol": symbol,
-            "data": {
-                "income_statement": {},
-                "balance_sheet": {},
-                "cash_flow": {}
-            }
-        }
-        
-        # Income Statement
-        if financials is not None and not financials.empty:
-            latest_date = financials.columns[0]
-            for idx in financials.index:
-                result["data"]["income_statement"][idx] = float(financials.loc[idx, latest_date]) if not pd.isna(financials.loc[idx, latest_date]) else None
-        
-        # Balance Sheet
-        if balance_sheet is not None and not balance_sheet.empty:
-            latest_date = balance_sheet.columns[0]
-            for idx in balance_sheet.index:
-                result["data"]["balance_sheet"][idx] = float(balance_sheet.loc[idx, latest_date]) if not pd.isna(balance_sheet.loc[idx, latest_date]) else None
-        
-        # Cash Flow
-        if cash_flow is not None and not cash_flow.empty:
-            latest_date = cash_flow.columns[0]
-            for idx in cash_flow.index:
-                result["data"]["cash_flow"][idx] = float(cash_flow.loc[idx, latest_date]) if not pd.isna(cash_flow.loc[idx, latest_date]) else None
-        
-        return jsonify(result), 200
-        
-    except Exception as e:
-        logger.error(f"Error fetching financials: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    return _dispatch(api_routes.get_financials)
 
 if __name__ == '__main__':
-    # Добавим pandas для financials
-    import pandas as pd
-    
     port = int(os.environ.get('PORT', 8000))
     logger.info(f"Starting YFinance server on port {port}")
-    
+    start_background_tasks()
+
     app.run(
         host='0.0.0.0',
         port=port,
         debug=False
-    )
\ No newline at end of file
+    )